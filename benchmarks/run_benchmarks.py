@@ -0,0 +1,469 @@
+"""
+Benchmark the stages of the simulation pipeline.
+
+Each stage is timed separately against the bundled meteo data and against
+synthetic multi-year data, which repeats the bundled data. The results are
+printed as a table and saved as JSON, so that they can be compared between
+commits:
+
+    python benchmarks/run_benchmarks.py --output benchmarks/results/new.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+
+Run it from the root of the repository, where the meteo_data_source
+directory is.
+"""
+
+import argparse
+import atexit
+import gc
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from tabulate import tabulate
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.plot.aggregate_monthly_data import aggregate_monthly_data
+from home_energy_flow.plot.flow_accumulator import FlowAccumulator
+from home_energy_flow.production import compute_production, meteo_load
+from home_energy_flow.production.datamodels import Azimuth, Slope
+from home_energy_flow.production.meteo_columns import (
+    VALUE_COLUMNS,
+    MeteoColumns,
+    MeteoDataset,
+)
+from home_energy_flow.production.meteo_datamodels import SolarRadiationData
+from home_energy_flow.production.orientation_index import OrientationIndex
+from home_energy_flow.production.pv_system import Modules, PVSystem
+from home_energy_flow.storage import compute_storage
+
+# Stages that build pydantic objects per hour are skipped above this number of
+# hours, because they need several GB of memory for the synthetic data.
+DEFAULT_LEGACY_MAX_HOURS = 400_000
+
+PV_SYSTEM = PVSystem(
+    modules=[Modules(slope=Slope(value=30), azimuth=Azimuth.SOUTH(), kWP=0.445, n=15)],
+    performance_ratio=0.8,
+)
+REGULAR_CONSUMPTION_KWH = 1500.0
+HEATPUMP_SYSTEM = HeatPumpSystem(
+    yearly_electricity_consumption_kWh=3500.0,
+    heating_turnoff_temp=13.0,
+    heating_times=[(0, 24)],
+)
+STORAGE_KWH = 20.0
+MAIN_YEAR = 2023
+
+
+@dataclass
+class BenchmarkResult:
+    stage: str
+    data: str
+    hours: int
+    repeats: int
+    best_seconds: float
+    mean_seconds: float
+    hours_per_second: float
+    peak_memory_bytes: int
+
+
+class BenchmarkData:
+    """The meteo data of one benchmark, with lazily built inputs of the stages."""
+
+    def __init__(self, name: str, datasets: list[MeteoDataset]) -> None:
+        self.name = name
+        self.datasets = datasets
+        self.columns = datasets[0].columns
+        self.hours = len(self.columns)
+        self._solar_data: list[SolarRadiationData] | None = None
+
+    def solar_data(self) -> list[SolarRadiationData]:
+        """The pydantic data of the orientations used by the PV system."""
+        if self._solar_data is None:
+            index = OrientationIndex(self.datasets)
+            used = {index.dataset_index(module) for module in PV_SYSTEM.modules}
+            self._solar_data = [
+                self.datasets[i].to_solar_radiation_data() for i in sorted(used)
+            ]
+        return self._solar_data
+
+    def production(self) -> np.ndarray:
+        return compute_production.compute_production_array(PV_SYSTEM, self.datasets)[1]
+
+    def consumption(self) -> tuple[np.ndarray, np.ndarray]:
+        regular = consumption_profiles.typical_consumption_array(
+            self.columns.axis, REGULAR_CONSUMPTION_KWH
+        )
+        heatpump = consumption_profiles.heatpump_consumption_array(
+            self.columns.axis, self.columns.T2m, HEATPUMP_SYSTEM
+        )
+        return regular, heatpump
+
+
+def synthetic_datasets(datasets: list[MeteoDataset], scale: int) -> list[MeteoDataset]:
+    """
+    Repeat the data scale times on a continuous time axis.
+
+    The times continue hour by hour after the end of the bundled data, the
+    values are the bundled values repeated.
+    """
+    num_hours = len(datasets[0].columns) * scale
+    start = datasets[0].columns.time[0]
+    time = start + np.arange(num_hours).astype("timedelta64[h]")
+    return [
+        MeteoDataset(
+            inputs=dataset.inputs,
+            columns=MeteoColumns(
+                time=time,
+                **{
+                    name: np.tile(getattr(dataset.columns, name), scale)
+                    for name in VALUE_COLUMNS
+                },
+            ),
+        )
+        for dataset in datasets
+    ]
+
+
+# Each stage gets the benchmark data and returns the function to time.
+StageSetup = Callable[[BenchmarkData], Callable[[], object]]
+
+
+def _load_json(data: BenchmarkData) -> Callable[[], object]:
+    return lambda: [
+        meteo_load.load_solar_radiation_data(file) for file in meteo_load.METEO_FILES
+    ]
+
+
+def _load_columns_cold(data: BenchmarkData) -> Callable[[], object]:
+    return lambda: [
+        meteo_load.load_meteo_dataset(file, use_cache=False)
+        for file in meteo_load.METEO_FILES
+    ]
+
+
+def _load_columns_trusted(data: BenchmarkData) -> Callable[[], object]:
+    return lambda: [
+        meteo_load.load_meteo_dataset(file, use_cache=False, trusted=True)
+        for file in meteo_load.METEO_FILES
+    ]
+
+
+def _load_columns_cached(data: BenchmarkData) -> Callable[[], object]:
+    cache_dir = Path(tempfile.mkdtemp(prefix="home_energy_flow_bench_"))
+    atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    for file in meteo_load.METEO_FILES:
+        meteo_load.load_meteo_dataset(file, cache_dir=cache_dir)
+    return lambda: [
+        meteo_load.load_meteo_dataset(file, cache_dir=cache_dir)
+        for file in meteo_load.METEO_FILES
+    ]
+
+
+def _production(data: BenchmarkData) -> Callable[[], object]:
+    solar_data = data.solar_data()
+    return lambda: compute_production.compute_production(PV_SYSTEM, solar_data)
+
+
+def _production_array(data: BenchmarkData) -> Callable[[], object]:
+    return lambda: compute_production.compute_production_array(PV_SYSTEM, data.datasets)
+
+
+def _typical_consumption(data: BenchmarkData) -> Callable[[], object]:
+    entries = data.solar_data()[0].outputs.hourly
+    return lambda: consumption_profiles.generate_typical_consumption_profile(
+        entries, REGULAR_CONSUMPTION_KWH
+    )
+
+
+def _typical_consumption_array(data: BenchmarkData) -> Callable[[], object]:
+    return lambda: consumption_profiles.typical_consumption_array(
+        data.columns.axis, REGULAR_CONSUMPTION_KWH
+    )
+
+
+def _heatpump_consumption(data: BenchmarkData) -> Callable[[], object]:
+    entries = data.solar_data()[0].outputs.hourly
+    return lambda: consumption_profiles.generate_heatpump_consumption_profile(
+        entries, HEATPUMP_SYSTEM
+    )
+
+
+def _heatpump_consumption_array(data: BenchmarkData) -> Callable[[], object]:
+    return lambda: consumption_profiles.heatpump_consumption_array(
+        data.columns.axis, data.columns.T2m, HEATPUMP_SYSTEM
+    )
+
+
+def _storage(data: BenchmarkData) -> Callable[[], object]:
+    production = data.production().tolist()
+    regular, heatpump = data.consumption()
+    consumption = (regular + heatpump).tolist()
+    return lambda: compute_storage.compute_production_consumption(
+        production, consumption, storage_kWh=STORAGE_KWH
+    )
+
+
+def _storage_array(data: BenchmarkData) -> Callable[[], object]:
+    production = data.production()
+    regular, heatpump = data.consumption()
+    consumption = regular + heatpump
+    return lambda: compute_storage.simulate_storage(
+        production, consumption, storage_kWh=STORAGE_KWH
+    )
+
+
+def _flow_series(data: BenchmarkData) -> dict[str, np.ndarray]:
+    production = data.production()
+    regular, heatpump = data.consumption()
+    consumption = regular + heatpump
+    flows = compute_storage.simulate_storage(
+        production, consumption, storage_kWh=STORAGE_KWH
+    )
+    return {
+        "production": production,
+        "regular_consumption": regular,
+        "heatpump_consumption": heatpump,
+        "consumption": consumption,
+        "energy_buy": flows.energy_buy,
+        "energy_sell": flows.energy_sell,
+        "self_usage": flows.self_usage,
+    }
+
+
+def _aggregation(data: BenchmarkData) -> Callable[[], object]:
+    times = data.columns.axis.to_times()
+    series = [values.tolist() for values in _flow_series(data).values()]
+    return lambda: aggregate_monthly_data(times, *series)
+
+
+def _aggregation_accumulator(data: BenchmarkData) -> Callable[[], object]:
+    series = _flow_series(data)
+
+    def run() -> object:
+        accumulator = FlowAccumulator(bucket="month")
+        accumulator.add(data.columns.time, series)
+        return accumulator.to_monthly_data()
+
+    return run
+
+
+def _main(data: BenchmarkData) -> Callable[[], object]:
+    from home_energy_flow.main import main
+
+    return lambda: main(
+        year=MAIN_YEAR,
+        pv_system=PV_SYSTEM,
+        regular_consumption_kWh=REGULAR_CONSUMPTION_KWH,
+        heatpump_system=HEATPUMP_SYSTEM,
+        storage_kWh=STORAGE_KWH,
+        sinks=[],
+    )
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    setup: StageSetup
+    # Whether the stage builds pydantic objects or lists per hour.
+    legacy: bool = False
+    # Whether the stage reads the bundled JSON files, it only runs on them.
+    reads_files: bool = False
+    # Whether the stage only simulates MAIN_YEAR of the bundled data.
+    main_year_only: bool = False
+
+    def hours(self, data: BenchmarkData) -> int:
+        """Number of hours of meteo data processed by one run of the stage."""
+        if self.reads_files:
+            return data.hours * len(meteo_load.METEO_FILES)
+        if self.main_year_only:
+            return len(data.columns.select_year(MAIN_YEAR))
+        return data.hours
+
+
+STAGES = [
+    Stage("load_solar_radiation_data", _load_json, legacy=True, reads_files=True),
+    Stage("load_meteo_dataset (no cache)", _load_columns_cold, reads_files=True),
+    Stage("load_meteo_dataset (trusted)", _load_columns_trusted, reads_files=True),
+    Stage("load_meteo_dataset (cached)", _load_columns_cached, reads_files=True),
+    Stage("compute_production", _production, legacy=True),
+    Stage("compute_production_array", _production_array),
+    Stage("generate_typical_consumption_profile", _typical_consumption, legacy=True),
+    Stage("typical_consumption_array", _typical_consumption_array),
+    Stage("generate_heatpump_consumption_profile", _heatpump_consumption, legacy=True),
+    Stage("heatpump_consumption_array", _heatpump_consumption_array),
+    Stage("compute_production_consumption", _storage, legacy=True),
+    Stage("simulate_storage", _storage_array),
+    Stage("aggregate_monthly_data", _aggregation, legacy=True),
+    Stage("FlowAccumulator", _aggregation_accumulator),
+    Stage("main (one year)", _main, main_year_only=True),
+]
+
+
+def measure(run: Callable[[], object], repeats: int) -> tuple[list[float], int]:
+    """
+    Time the repeats of run, then measure its peak memory in one more run.
+
+    The memory is measured separately, because tracemalloc slows down the
+    allocations and would distort the timings.
+    """
+    seconds = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmarks(
+    scales: list[int],
+    repeats: int,
+    stage_filter: str | None = None,
+    legacy_max_hours: int = DEFAULT_LEGACY_MAX_HOURS,
+) -> list[BenchmarkResult]:
+    bundled = meteo_load.get_meteo_datasets_per_orientation()
+    stages = [
+        stage for stage in STAGES if stage_filter is None or stage_filter in stage.name
+    ]
+    results = []
+    for scale in scales:
+        if scale == 1:
+            data = BenchmarkData("bundled", bundled)
+        else:
+            data = BenchmarkData(
+                f"synthetic x{scale}", synthetic_datasets(bundled, scale)
+            )
+        for stage in stages:
+            if (stage.reads_files or stage.main_year_only) and scale != 1:
+                continue
+            hours = stage.hours(data)
+            if stage.legacy and hours > legacy_max_hours:
+                print(f"Skipping {stage.name} on {data.name}", file=sys.stderr)
+                continue
+            print(f"Running {stage.name} on {data.name}", file=sys.stderr)
+            seconds, peak = measure(stage.setup(data), repeats)
+            results.append(
+                BenchmarkResult(
+                    stage=stage.name,
+                    data=data.name,
+                    hours=hours,
+                    repeats=repeats,
+                    best_seconds=min(seconds),
+                    mean_seconds=sum(seconds) / len(seconds),
+                    hours_per_second=hours / min(seconds),
+                    peak_memory_bytes=peak,
+                )
+            )
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(
+    results: list[BenchmarkResult], previous: list[BenchmarkResult] | None = None
+) -> None:
+    previous_by_key = {(result.stage, result.data): result for result in previous or []}
+    rows = []
+    for result in results:
+        row = [
+            result.stage,
+            result.data,
+            result.hours,
+            f"{result.best_seconds * 1000:.2f}",
+            f"{result.hours_per_second:,.0f}",
+            f"{result.peak_memory_bytes / 1024**2:.1f}",
+        ]
+        if previous is not None:
+            old = previous_by_key.get((result.stage, result.data))
+            row.append(f"{old.best_seconds / result.best_seconds:.2f}x" if old else "-")
+        rows.append(row)
+    headers = ["Stage", "Data", "Hours", "Best ms", "Hours/s", "Peak MiB"]
+    if previous is not None:
+        headers.append("Speedup")
+    print(tabulate(rows, headers=headers, stralign="right"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10],
+        help="1 for the bundled data, N for synthetic data of N times its length",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--stage", help="Only run stages containing this text")
+    parser.add_argument(
+        "--legacy-max-hours",
+        type=int,
+        default=DEFAULT_LEGACY_MAX_HOURS,
+        help="Skip stages with pydantic objects per hour on longer data",
+    )
+    parser.add_argument("--output", type=Path, help="Save the results as JSON")
+    parser.add_argument(
+        "--compare", type=Path, help="JSON results of an earlier run to compare to"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(
+        args.scales, args.repeats, args.stage, args.legacy_max_hours
+    )
+
+    previous = None
+    if args.compare is not None:
+        with open(args.compare) as file:
+            previous = [
+                BenchmarkResult(**result) for result in json.load(file)["results"]
+            ]
+    print_results(results, previous)
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "date": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "machine": platform.machine(),
+                    "results": [asdict(result) for result in results],
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
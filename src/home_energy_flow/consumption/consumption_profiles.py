@@ -1,8 +1,64 @@
 from collections import defaultdict
 from typing import List
 
+import numpy as np
 from pydantic import BaseModel
+
+from home_energy_flow.consumption.load_profiles import (
+    StandardLoadProfile,
+    load_profile_for_columns,
+)
+from home_energy_flow.production.meteo_columns import MeteoColumns
 from home_energy_flow.production.meteo_datamodels import TimeSeriesEntry
+from home_energy_flow.production.time_axis import TimeAxis, combine_time
+from home_energy_flow.profile_cache import ProfileCache, default_cache, model_key
+
+
+# Average consumption patterns, simplified example
+# Higher consumption in the morning and evening, lower consumption during the night.
+# See load_profiles for the "Standardlastprofile Strom H0" from BDEW.
+TYPICAL_DAILY_PROFILE_FIRST_HALF = [
+    0.08,
+    0.07,
+    0.06,
+    0.05,
+    0.04,
+    0.04,
+    0.05,
+    0.07,
+    0.10,
+    0.12,
+    0.13,
+    0.10,
+]
+TYPICAL_DAILY_PROFILE_SECOND_HALF = [
+    0.09,
+    0.08,
+    0.06,
+    0.06,
+    0.07,
+    0.09,
+    0.13,
+    0.16,
+    0.15,
+    0.12,
+    0.10,
+    0.09,  # 12:00 - 23:00
+]
+TYPICAL_DAILY_PROFILE = (
+    TYPICAL_DAILY_PROFILE_FIRST_HALF + TYPICAL_DAILY_PROFILE_SECOND_HALF
+)
+
+
+def scaled_typical_daily_profile() -> list[float]:
+    """The typical daily profile scaled so it adds up to 1 (1 kWh total per day)."""
+    profile_sum = sum(TYPICAL_DAILY_PROFILE)
+    return [x / profile_sum for x in TYPICAL_DAILY_PROFILE]
+
+
+def typical_consumption_weights(hour_of_day: np.ndarray) -> np.ndarray:
+    """Value of the scaled typical daily profile for each hour of the day."""
+    return np.asarray(scaled_typical_daily_profile())[hour_of_day]
 
 
 def generate_typical_consumption_profile(
@@ -15,133 +71,301 @@ def generate_typical_consumption_profile(
 
     Args:
         entries:
-            Timepoints for each hour of the year.
+            Timepoints, e.g. for each hour of one or several years.
         yearly_consumption_kWh:
             Total desired consumption in kWh for the year.
 
     Returns:
          List of consumption values (in kWh) corresponding to each time entry.
-         The sum of all values in the list will be equal to the yearly_consumption_kWh.
-    """
-
-    # Average consumption patterns, simplified example
-    # Higher consumption in the morning and evening, lower consumption during the night.
-    # TODO(Malte, 11/24): Replace this with a "Standardlastprofile Strom H0" from BDEW
-    typical_daily_profile_first_half = [
-        0.08,
-        0.07,
-        0.06,
-        0.05,
-        0.04,
-        0.04,
-        0.05,
-        0.07,
-        0.10,
-        0.12,
-        0.13,
-        0.10,
-    ]
-    typical_daily_profile_second_half = [
-        0.09,
-        0.08,
-        0.06,
-        0.06,
-        0.07,
-        0.09,
-        0.13,
-        0.16,
-        0.15,
-        0.12,
-        0.10,
-        0.09,  # 12:00 - 23:00
-    ]
-    typical_daily_profile = (
-        typical_daily_profile_first_half + typical_daily_profile_second_half
-    )
-
-    # Scale this daily profile so it adds up to 1 (this assumes 1 kWh total per day)
-    profile_sum = sum(typical_daily_profile)
-    scaled_daily_profile = [x / profile_sum for x in typical_daily_profile]
-
-    # Generate hourly profile for the whole year (8760 hours in a non-leap year)
-    hours_in_year = 8760
-    if len(entries) != hours_in_year:
-        raise ValueError(f"Expected {hours_in_year} entries, but got {len(entries)}")
+         The values of the entries of each calendar year sum up to the
+         yearly_consumption_kWh. This holds for leap years and sub-hourly
+         entries as well.
+    """
+    scaled_daily_profile = scaled_typical_daily_profile()
 
-    # Repeat the daily pattern across the whole year
+    # Repeat the daily pattern across all entries, grouped by calendar year
     consumption_profile = []
-    for i, entry in enumerate(entries):
-        # Determine the hour of the day
-        hour_of_day = entry.time.hour
-        # Use the corresponding value from the daily profile
-        scaled_value = scaled_daily_profile[hour_of_day]
+    profile_per_year: dict[int, list[float]] = defaultdict(list)
+    for entry in entries:
+        # Use the value of the daily profile for the hour of the day
+        scaled_value = scaled_daily_profile[entry.time.hour]
         consumption_profile.append(scaled_value)
+        profile_per_year[entry.time.year].append(scaled_value)
 
-    # Calculate total hourly consumption factor to scale it up to match the yearly consumption
-    total_profile_sum = sum(consumption_profile)
-    scaling_factor = yearly_consumption_kWh / total_profile_sum
+    # Calculate the scaling factor per year to match the yearly consumption
+    scaling_factors = {
+        year: yearly_consumption_kWh / sum(values)
+        for year, values in profile_per_year.items()
+    }
 
     # Apply the scaling factor to get the scaled consumption profile
     scaled_consumption_profile = [
-        value * scaling_factor for value in consumption_profile
+        value * scaling_factors[entry.time.year]
+        for entry, value in zip(entries, consumption_profile)
     ]
 
     return scaled_consumption_profile
 
 
+def _group_indices(keys: np.ndarray) -> list[np.ndarray]:
+    """The indices of each distinct key, in ascending order within each group."""
+    if len(keys) == 0:
+        return []
+    order = np.argsort(keys, kind="stable")
+    boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+    return np.split(order, boundaries)
+
+
+def typical_consumption_array(
+    time_axis: TimeAxis, yearly_consumption_kWh: float
+) -> np.ndarray:
+    """
+    Array version of generate_typical_consumption_profile with the same values.
+
+    Args:
+        time_axis:
+            The times, e.g. the axis of the meteo columns.
+        yearly_consumption_kWh:
+            Total desired consumption in kWh for each calendar year.
+    """
+    weights = typical_consumption_weights(time_axis.hour)
+    scaling_factors = np.empty(len(weights))
+    for in_year in _group_indices(time_axis.year):
+        # Sum up in the order of the times, like the list version
+        scaling_factors[in_year] = yearly_consumption_kWh / sum(
+            weights[in_year].tolist()
+        )
+    return weights * scaling_factors
+
+
 class HeatPumpSystem(BaseModel):
     yearly_electricity_consumption_kWh: float
     heating_turnoff_temp: float = 15.0
     heating_times: list[tuple[int, int]] = [(8, 18)]
 
 
+def heatpump_scaling_factor(
+    heatpump_system: HeatPumpSystem, total_temp_diff: float
+) -> float:
+    """Factor from the temperature differences of a year to its consumption in kWh."""
+    return (
+        heatpump_system.yearly_electricity_consumption_kWh / total_temp_diff
+        if total_temp_diff > 0
+        else 0
+    )
+
+
+def heating_hours(heatpump_system: HeatPumpSystem) -> int:
+    """Number of active heating hours per day."""
+    return sum(end - start for start, end in heatpump_system.heating_times)
+
+
+def heating_hour_table(heatpump_system: HeatPumpSystem) -> np.ndarray:
+    """Whether each hour of the day, from 0 to 23, lies within the heating times."""
+    hour_of_day = np.arange(24)
+    mask = np.zeros(24, dtype=bool)
+    for start, end in heatpump_system.heating_times:
+        mask |= (start <= hour_of_day) & (hour_of_day < end)
+    return mask
+
+
+def heating_hour_mask(
+    hour_of_day: np.ndarray, heatpump_system: HeatPumpSystem
+) -> np.ndarray:
+    """Whether each hour of the day lies within one of the heating times."""
+    return heating_hour_table(heatpump_system)[hour_of_day]
+
+
+def heatpump_consumption_array(
+    time_axis: TimeAxis, T2m: np.ndarray, heatpump_system: HeatPumpSystem
+) -> np.ndarray:
+    """
+    Array version of generate_heatpump_consumption_profile with the same values.
+
+    The temperature differences are summed up per day with one bincount, in
+    the order of the times, and the heating hours are looked up in a table of
+    the 24 hours of the day. Each time step gets its share of the heating
+    hour, so time steps shorter than an hour, e.g. 15 minutes, give the same
+    yearly consumption.
+
+    Args:
+        time_axis:
+            The times, e.g. the axis of the meteo columns.
+        T2m:
+            Outside temperature at each time in degree Celsius.
+        heatpump_system:
+            The heat pump system.
+    """
+    days, day_of_time = np.unique(time_axis.day_index, return_inverse=True)
+    daily_temp_diff = np.bincount(
+        day_of_time,
+        weights=np.maximum(heatpump_system.heating_turnoff_temp - T2m, 0.0),
+        minlength=len(days),
+    )
+
+    # Scale each calendar year to the yearly consumption
+    year_of_day = days.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64)
+    daily_consumption_kWh = np.empty(len(days))
+    for in_year in _group_indices(year_of_day):
+        scaling_factor = heatpump_scaling_factor(
+            heatpump_system, sum(daily_temp_diff[in_year].tolist())
+        )
+        daily_consumption_kWh[in_year] = daily_temp_diff[in_year] * scaling_factor
+
+    # Distribute the daily consumption equally across the heating hours
+    hours = heating_hours(heatpump_system)
+    profile = np.zeros(len(day_of_time))
+    if hours > 0:
+        is_heating = heating_hour_mask(time_axis.hour, heatpump_system)
+        profile[is_heating] = (
+            daily_consumption_kWh[day_of_time[is_heating]]
+            / hours
+            * time_axis.step_hours
+        )
+    return profile
+
+
+def heatpump_consumption_batch(
+    time_axis: TimeAxis,
+    T2m: np.ndarray,
+    heatpump_system: HeatPumpSystem,
+    heating_turnoff_temp: np.ndarray,
+) -> np.ndarray:
+    """
+    heatpump_consumption_array for many heating turnoff temperatures at once.
+
+    The temperature differences of each day are summed up for all turnoff
+    temperatures with one reduceat, since the times are sorted. The results
+    are equal to heatpump_consumption_array up to floating point rounding.
+
+    Args:
+        heating_turnoff_temp:
+            The turnoff temperatures, shape (batch,). The turnoff temperature
+            of the heatpump_system is ignored.
+
+    Returns:
+        Array of shape (batch, number of times).
+    """
+    turnoff = np.asarray(heating_turnoff_temp, dtype=np.float64)
+    day_index = time_axis.day_index
+    day_starts = np.flatnonzero(np.diff(day_index, prepend=day_index[:1] - 1))
+    day_of_time = np.cumsum(np.diff(day_index, prepend=day_index[:1]) != 0)
+    profile = np.zeros((len(turnoff), len(day_index)))
+    hours = heating_hours(heatpump_system)
+    if len(day_index) == 0 or hours == 0:
+        return profile
+    daily_temp_diff = np.add.reduceat(
+        np.maximum(turnoff[:, np.newaxis] - T2m, 0.0), day_starts, axis=-1
+    )
+
+    # Scale each calendar year to the yearly consumption
+    year_of_day = time_axis.year[day_starts]
+    daily_consumption_kWh = np.empty_like(daily_temp_diff)
+    for in_year in _group_indices(year_of_day):
+        total = daily_temp_diff[:, in_year].sum(axis=-1, keepdims=True)
+        daily_consumption_kWh[:, in_year] = np.divide(
+            daily_temp_diff[:, in_year]
+            * heatpump_system.yearly_electricity_consumption_kWh,
+            total,
+            out=np.zeros((len(turnoff), len(in_year))),
+            where=total > 0,
+        )
+
+    # Distribute the daily consumption equally across the heating hours
+    is_heating = heating_hour_mask(time_axis.hour, heatpump_system)
+    profile[:, is_heating] = (
+        daily_consumption_kWh[:, day_of_time[is_heating]] / hours * time_axis.step_hours
+    )
+    return profile
+
+
 def generate_heatpump_consumption_profile(
     entries: List[TimeSeriesEntry],
     heatpump_system: HeatPumpSystem,
 ) -> List[float]:
-    # Prepare a dictionary to accumulate daily consumption needs based on temperature difference
-    daily_temp_diff: dict[tuple[int, int, int], float] = defaultdict(float)
-    hourly_consumption_profile = []
+    """
+    Generate the hourly electricity consumption of a heat pump.
 
-    # Group entries by day and calculate the mean temperature difference for each day
-    for entry in entries:
-        day_key = (entry.time.year, entry.time.month, entry.time.day)
-        temp_diff = max(
-            heatpump_system.heating_turnoff_temp - entry.T2m, 0
-        )  # Ensure consumption is positive (no heating when outside is warmer)
-        daily_temp_diff[day_key] += temp_diff
-
-    # Calculate total daily temp differences and scale to the total yearly consumption
-    total_temp_diff = sum(daily_temp_diff.values())
-    scaling_factor = (
-        heatpump_system.yearly_electricity_consumption_kWh / total_temp_diff
-        if total_temp_diff > 0
-        else 0
+    The consumption of each day is proportional to the sum of the hourly
+    differences between the heating turnoff temperature and the outside
+    temperature. It is scaled so that each calendar year consumes the yearly
+    consumption and distributed equally across the heating hours of the day.
+
+    Args:
+        entries:
+            Hourly meteo data, e.g. for one or several years.
+        heatpump_system:
+            The heat pump system.
+
+    Returns:
+        List of consumption values (in kWh) corresponding to each entry.
+    """
+    fields = np.array(
+        [
+            (entry.time.year, entry.time.month, entry.time.day, entry.time.hour)
+            for entry in entries
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    years, months, days, hours = fields.T
+    time = combine_time(years, months, days, hours, minutes=np.zeros_like(hours))
+    T2m = np.array([entry.T2m for entry in entries], dtype=np.float64)
+    return heatpump_consumption_array(TimeAxis(time), T2m, heatpump_system).tolist()
+
+
+def typical_consumption_for_columns(
+    columns: MeteoColumns,
+    yearly_consumption_kWh: float,
+    cache: ProfileCache | None = None,
+) -> np.ndarray:
+    """
+    Memoized typical_consumption_array of the times of meteo columns.
+
+    The profile is cached in the given cache, by default in
+    profile_cache.default_cache, and must not be modified.
+    """
+    cache = default_cache if cache is None else cache
+    return cache.get_or_compute(
+        [columns],
+        ("typical", yearly_consumption_kWh),
+        lambda: typical_consumption_array(columns.axis, yearly_consumption_kWh),
     )
 
-    # Apply the scaling factor to get the daily consumption in kWh
-    daily_consumption_kWh = {
-        day: temp_diff * scaling_factor for day, temp_diff in daily_temp_diff.items()
-    }
 
-    # Create an hourly consumption profile based on heating times
-    for entry in entries:
-        day_key = (entry.time.year, entry.time.month, entry.time.day)
-        consumption_for_day = daily_consumption_kWh.get(day_key, 0)
+def regular_consumption_for_columns(
+    columns: MeteoColumns,
+    yearly_consumption_kWh: float,
+    load_profile: StandardLoadProfile | None = None,
+    cache: ProfileCache | None = None,
+) -> np.ndarray:
+    """
+    The regular consumption of meteo columns, memoized.
 
-        # Calculate the number of active heating hours for the day
-        heating_hours = sum(end - start for start, end in heatpump_system.heating_times)
+    Uses the standard load profile if given, e.g. load_profiles.H0, and the
+    typical daily profile otherwise.
+    """
+    if load_profile is None:
+        return typical_consumption_for_columns(columns, yearly_consumption_kWh, cache)
+    return load_profile_for_columns(
+        columns, load_profile, yearly_consumption_kWh, cache
+    )
 
-        # If the current hour is within the heating period, allocate consumption equally across those hours
-        hour_of_day = entry.time.hour
-        is_heating_hour = any(
-            start <= hour_of_day < end for start, end in heatpump_system.heating_times
-        )
 
-        if is_heating_hour and heating_hours > 0:
-            # Distribute the daily consumption across the heating hours
-            hourly_consumption_profile.append(consumption_for_day / heating_hours)
-        else:
-            hourly_consumption_profile.append(0.0)
+def heatpump_consumption_for_columns(
+    columns: MeteoColumns,
+    heatpump_system: HeatPumpSystem,
+    cache: ProfileCache | None = None,
+) -> np.ndarray:
+    """
+    Memoized heatpump_consumption_array of meteo columns.
 
-    return hourly_consumption_profile
+    Sweeps over e.g. storage sizes reuse the profile of each heat pump system
+    instead of generating it again. The profile is cached in the given cache,
+    by default in profile_cache.default_cache, and must not be modified.
+    """
+    cache = default_cache if cache is None else cache
+    return cache.get_or_compute(
+        [columns],
+        ("heatpump", model_key(heatpump_system)),
+        lambda: heatpump_consumption_array(columns.axis, columns.T2m, heatpump_system),
+    )
@@ -0,0 +1,311 @@
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from home_energy_flow.production.meteo_columns import MeteoColumns
+from home_energy_flow.production.time_axis import TimeAxis
+from home_energy_flow.profile_cache import ProfileCache, default_cache
+
+# Indices of the first two axes of the tables of StandardLoadProfile.
+SEASONS = ("winter", "summer", "transition")
+DAY_TYPES = ("workday", "saturday", "sunday")
+
+QUARTER_HOURS_PER_DAY = 96
+
+# Approximation of the BDEW standard load profile H0 for households, as
+# average power in W per 1000 kWh of yearly consumption for each hour of the
+# day, by season and day type. The published table has quarter-hourly values,
+# load it with StandardLoadProfile.from_csv for exact results.
+H0_APPROXIMATE_HOURLY_W: dict[str, dict[str, list[float]]] = {
+    "winter": {
+        "workday": [67, 52, 46, 43, 43, 47, 66, 98, 112, 112, 110, 114,
+                    131, 126, 111, 104, 111, 143, 179, 186, 170, 150, 127, 95],
+        "saturday": [77, 60, 51, 47, 46, 48, 57, 78, 108, 131, 141, 148,
+                     160, 152, 137, 128, 131, 157, 183, 184, 168, 152, 132, 103],
+        "sunday": [83, 64, 54, 49, 47, 47, 51, 64, 94, 130, 153, 167,
+                   180, 160, 136, 126, 128, 150, 176, 178, 164, 146, 123, 96],
+    },
+    "summer": {
+        "workday": [72, 56, 48, 44, 43, 45, 60, 86, 98, 100, 101, 106,
+                    120, 117, 104, 97, 98, 108, 120, 126, 131, 140, 128, 98],
+        "saturday": [80, 63, 53, 48, 46, 46, 52, 70, 97, 117, 126, 132,
+                     141, 133, 118, 109, 108, 114, 124, 128, 131, 138, 127, 102],
+        "sunday": [86, 67, 56, 50, 47, 46, 48, 58, 84, 114, 133, 145,
+                   158, 140, 118, 108, 107, 114, 125, 129, 131, 136, 122, 96],
+    },
+    "transition": {
+        "workday": [70, 54, 47, 44, 43, 46, 63, 92, 105, 106, 106, 110,
+                    126, 122, 108, 100, 104, 126, 150, 156, 150, 145, 128, 96],
+        "saturday": [78, 62, 52, 48, 46, 47, 54, 74, 102, 124, 134, 140,
+                     150, 142, 128, 118, 120, 136, 154, 156, 150, 145, 130, 102],
+        "sunday": [84, 66, 55, 50, 47, 46, 50, 61, 89, 122, 143, 156,
+                   169, 150, 127, 117, 118, 132, 150, 154, 148, 141, 122, 96],
+    },
+}  # fmt: skip
+
+
+def dynamization_factor(day_of_year: np.ndarray) -> np.ndarray:
+    """
+    The BDEW dynamization factor of the H0 profile.
+
+    Args:
+        day_of_year:
+            Day of the year, from 1 to 366.
+    """
+    t = np.asarray(day_of_year, dtype=np.float64)
+    return -3.92e-10 * t**4 + 3.2e-7 * t**3 - 7.02e-5 * t**2 + 2.1e-3 * t + 1.24
+
+
+def season_of(month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """
+    Index into SEASONS of dates.
+
+    Winter lasts from 1 November to 20 March, summer from 15 May to 14
+    September, the other days belong to the transition periods.
+    """
+    month_day = np.asarray(month) * 100 + np.asarray(day)
+    return np.where(
+        (month_day >= 1101) | (month_day <= 320),
+        0,
+        np.where((month_day >= 515) & (month_day <= 914), 1, 2),
+    )
+
+
+def day_type_of(day_index: np.ndarray) -> np.ndarray:
+    """
+    Index into DAY_TYPES of days since 1970-01-01.
+
+    Public holidays are not considered, they count as the day of the week.
+    """
+    # 1970-01-01 was a Thursday, weekday 0 is a Monday
+    weekday = (np.asarray(day_index) + 3) % 7
+    return np.where(weekday == 5, 1, np.where(weekday == 6, 2, 0))
+
+
+@dataclass(frozen=True, eq=False)
+class StandardLoadProfile:
+    """
+    A standard load profile such as the BDEW H0 profile.
+
+    The profile is a table of the average power of each quarter hour of the
+    day, by season and day type. Expanding it to a year is a lookup of the
+    table rows of all days at once, see expand_load_profile.
+    """
+
+    name: str
+    # Average power in W per 1000 kWh of yearly consumption, shape
+    # (len(SEASONS), len(DAY_TYPES), QUARTER_HOURS_PER_DAY).
+    table_W: np.ndarray
+    # Whether the values of each day are multiplied by dynamization_factor.
+    dynamization: bool = False
+
+    def __post_init__(self) -> None:
+        expected = (len(SEASONS), len(DAY_TYPES), QUARTER_HOURS_PER_DAY)
+        if self.table_W.shape != expected:
+            raise ValueError(
+                f"The table of a load profile must have the shape {expected}"
+            )
+
+    @classmethod
+    def from_hourly(
+        cls,
+        name: str,
+        hourly_W: dict[str, dict[str, list[float]]],
+        dynamization: bool = False,
+    ) -> "StandardLoadProfile":
+        """
+        Create a profile from 24 hourly values per season and day type.
+
+        Each hourly value is used for the four quarter hours of the hour.
+        """
+        table = np.array(
+            [
+                [hourly_W[season][day_type] for day_type in DAY_TYPES]
+                for season in SEASONS
+            ],
+            dtype=np.float64,
+        )
+        return cls(name, np.repeat(table, 4, axis=-1), dynamization)
+
+    @classmethod
+    def from_csv(
+        cls, name: str, path: Path, dynamization: bool = False
+    ) -> "StandardLoadProfile":
+        """
+        Load a profile from a CSV file in the layout of the BDEW tables.
+
+        The file has a header row and one row per quarter hour of the day. The
+        first column is the time, followed by the values of the seasons
+        winter, summer and transition, each for saturday, sunday and workday.
+        Decimal commas are accepted.
+        """
+        with open(path, newline="") as file:
+            lines = file.read().splitlines()
+        # The BDEW tables use semicolons, as they use decimal commas
+        delimiter = ";" if lines and lines[0].count(";") > lines[0].count(",") else ","
+        rows = list(csv.reader(lines, delimiter=delimiter))
+        values = np.array(
+            [
+                [float(value.replace(",", ".")) for value in row[1:10]]
+                for row in rows[1:]
+            ],
+            dtype=np.float64,
+        )
+        if values.shape != (QUARTER_HOURS_PER_DAY, 9):
+            raise ValueError(
+                f"Expected {QUARTER_HOURS_PER_DAY} rows with 9 values in {path}"
+            )
+        # Columns are seasons x (saturday, sunday, workday)
+        table = values.T.reshape(len(SEASONS), 3, QUARTER_HOURS_PER_DAY)[:, [2, 0, 1]]
+        return cls(name, table, dynamization)
+
+    def daily_table_W(self, time_axis: TimeAxis) -> np.ndarray:
+        """
+        The quarter-hourly values of the days of the times.
+
+        Args:
+            time_axis:
+                One time per day, e.g. the midnights of a year.
+
+        Returns:
+            Array of shape (days, QUARTER_HOURS_PER_DAY).
+        """
+        rows = self.table_W[
+            season_of(time_axis.month, time_axis.day), day_type_of(time_axis.day_index)
+        ]
+        if self.dynamization:
+            rows = rows * dynamization_factor(time_axis.day_of_year + 1)[:, np.newaxis]
+        return rows
+
+
+H0 = StandardLoadProfile.from_hourly("H0", H0_APPROXIMATE_HOURLY_W, dynamization=True)
+
+
+def _check_resolution(resolution_minutes: float) -> None:
+    if (
+        resolution_minutes <= 0
+        or resolution_minutes % 15 != 0
+        or 1440 % resolution_minutes != 0
+    ):
+        raise ValueError(
+            f"A load profile cannot be expanded to steps of {resolution_minutes:g}"
+            " minutes, the resolution must be a multiple of 15 minutes dividing a"
+            " day"
+        )
+
+
+def resolution_minutes(time_axis: TimeAxis) -> int:
+    """
+    The length of the time steps of an axis in minutes, for expand_load_profile.
+
+    Raises a ValueError if the quarter-hourly tables cannot be expanded to the
+    steps, i.e. if they are not a multiple of 15 minutes dividing a day.
+    """
+    minutes = time_axis.step_hours * 60
+    _check_resolution(minutes)
+    return int(minutes)
+
+
+def expand_load_profile(
+    profile: StandardLoadProfile,
+    year: int,
+    resolution_minutes: int = 60,
+    cache: ProfileCache | None = None,
+) -> np.ndarray:
+    """
+    The share of the yearly consumption in each time step of a year.
+
+    The expanded profiles are cached per profile, year and resolution, by
+    default in profile_cache.default_cache, and must not be modified.
+
+    Args:
+        profile:
+            The standard load profile.
+        year:
+            The calendar year, leap years have 366 days.
+        resolution_minutes:
+            Length of the time steps, a multiple of 15 minutes dividing a day.
+
+    Returns:
+        One value per time step from the start of the year, summing up to 1.
+    """
+    _check_resolution(resolution_minutes)
+
+    def compute() -> np.ndarray:
+        days = np.arange(
+            np.datetime64(f"{year}-01-01"),
+            np.datetime64(f"{year + 1}-01-01"),
+            dtype="datetime64[D]",
+        )
+        quarter_hours = profile.daily_table_W(TimeAxis(days)).reshape(-1)
+        steps = quarter_hours.reshape(-1, resolution_minutes // 15).sum(axis=-1)
+        return steps / steps.sum()
+
+    cache = default_cache if cache is None else cache
+    return cache.get_or_compute(
+        [profile], ("load_profile", year, resolution_minutes), compute
+    )
+
+
+def load_profile_array(
+    time_axis: TimeAxis,
+    profile: StandardLoadProfile,
+    yearly_consumption_kWh: float,
+    cache: ProfileCache | None = None,
+) -> np.ndarray:
+    """
+    The consumption of a standard load profile at each time.
+
+    Each time gets the value of the step of the expanded profile it falls
+    into, at the resolution of the times. As by typical_consumption_array, the
+    values of each calendar year are scaled to sum up to the yearly
+    consumption, also if the times cover only part of the year.
+
+    Args:
+        time_axis:
+            The regular times, e.g. the axis of the meteo columns. Their
+            step_hours must be a multiple of 15 minutes dividing a day.
+        profile:
+            The standard load profile, e.g. H0.
+        yearly_consumption_kWh:
+            Total consumption in kWh for each calendar year.
+        cache:
+            Cache of the expanded profiles, see expand_load_profile.
+    """
+    time = time_axis.time.astype("datetime64[m]")
+    resolution = resolution_minutes(time_axis)
+    consumption = np.empty(len(time))
+    for year in time_axis.years():
+        in_year = time_axis.year_slice(year)
+        shares = expand_load_profile(profile, year, resolution, cache)
+        year_start = np.datetime64(f"{year}-01-01", "m")
+        steps = (time[in_year] - year_start).astype(np.int64) // resolution
+        values = shares[steps]
+        consumption[in_year] = values * (yearly_consumption_kWh / values.sum())
+    return consumption
+
+
+def load_profile_for_columns(
+    columns: MeteoColumns,
+    profile: StandardLoadProfile,
+    yearly_consumption_kWh: float,
+    cache: ProfileCache | None = None,
+) -> np.ndarray:
+    """
+    Memoized load_profile_array of the times of meteo columns.
+
+    The profile is cached in the given cache, by default in
+    profile_cache.default_cache, and must not be modified.
+    """
+    # Check the resolution before computing the profile inside the cache
+    resolution_minutes(columns.axis)
+    cache = default_cache if cache is None else cache
+    return cache.get_or_compute(
+        [columns, profile],
+        ("load_profile", yearly_consumption_kWh),
+        lambda: load_profile_array(
+            columns.axis, profile, yearly_consumption_kWh, cache
+        ),
+    )
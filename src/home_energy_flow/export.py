@@ -0,0 +1,184 @@
+import csv
+import gzip
+from pathlib import Path
+from typing import Any, Protocol
+
+import numpy as np
+
+from home_energy_flow.storage.compute_storage import StorageFlows
+
+# The hourly series written per scenario, after the scenario index and time.
+HOURLY_COLUMNS = (
+    "production_kWh",
+    "consumption_kWh",
+    "self_usage_kWh",
+    "energy_buy_kWh",
+    "energy_sell_kWh",
+    "stored_kWh",
+)
+
+
+def hourly_columns(
+    production_kWh: np.ndarray,
+    consumption_kWh: np.ndarray,
+    flows: StorageFlows,
+) -> dict[str, np.ndarray]:
+    """
+    The HOURLY_COLUMNS of simulated flows, without copying them.
+
+    Args:
+        production_kWh, consumption_kWh:
+            Broadcastable to the shape of the flows.
+        flows:
+            The flows of one scenario or a batch, e.g. of simulate_storage.
+    """
+    shape = flows.energy_buy.shape
+    return {
+        "production_kWh": np.broadcast_to(production_kWh, shape),
+        "consumption_kWh": np.broadcast_to(consumption_kWh, shape),
+        "self_usage_kWh": flows.self_usage,
+        "energy_buy_kWh": flows.energy_buy,
+        "energy_sell_kWh": flows.energy_sell,
+        "stored_kWh": flows.stored,
+    }
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError(
+            "Writing Parquet files requires pyarrow, install it with "
+            "'pip install pyarrow'"
+        ) from error
+    return pa, pq
+
+
+class HourlyWriter(Protocol):
+    """Receives the hourly results of each scenario as soon as it is simulated."""
+
+    def write(
+        self, scenario_index: int, time: np.ndarray, columns: dict[str, np.ndarray]
+    ) -> None:
+        """
+        Write the hourly results of one scenario.
+
+        Args:
+            scenario_index:
+                The index of the scenario, e.g. in the list of run_sweep.
+            time:
+                The times of the time steps, as datetime64 array.
+            columns:
+                The HOURLY_COLUMNS of the scenario, one value per time step.
+        """
+        ...
+
+    def close(self) -> None: ...
+
+
+class ParquetHourlyWriter:
+    """
+    Write the hourly results of all scenarios to one Parquet file.
+
+    Each scenario is one row group, with its index in the scenario_index
+    column, so readers can select scenarios by the row group statistics and
+    read only the columns they need, e.g. with pyarrow.parquet.read_table(
+    path, columns=[...], filters=[("scenario_index", "in", [...])]). Each row
+    group is written when the scenario is simulated, so the memory does not
+    grow with the number of scenarios. The file is only complete after close,
+    e.g. use the writer in a contextlib.closing block. Requires pyarrow.
+    """
+
+    def __init__(self, path: Path, compression: str = "zstd") -> None:
+        self.path = Path(path)
+        self.compression = compression
+        self._pa, self._pq = _import_pyarrow()
+        self._writer: Any = None
+
+    def write(
+        self, scenario_index: int, time: np.ndarray, columns: dict[str, np.ndarray]
+    ) -> None:
+        pa = self._pa
+        table = pa.table(
+            {
+                "scenario_index": np.full(len(time), scenario_index, dtype=np.int32),
+                "time": time.astype("datetime64[ms]"),
+                **{
+                    name: np.ascontiguousarray(columns[name]) for name in HOURLY_COLUMNS
+                },
+            }
+        )
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(
+                self.path, table.schema, compression=self.compression
+            )
+        self._writer.write_table(table, row_group_size=len(time))
+
+    def close(self) -> None:
+        """Write the footer of the file, which readers need."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class CsvHourlyWriter:
+    """
+    Write the hourly results of each scenario to a gzip-compressed CSV file.
+
+    The files are named scenario_<index>.csv.gz in the directory, so readers
+    can pick the scenarios they need. Each file is written when its scenario
+    is simulated, so the memory does not grow with the number of scenarios.
+    """
+
+    def __init__(self, directory: Path, compresslevel: int = 6) -> None:
+        self.directory = Path(directory)
+        self.compresslevel = compresslevel
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def close(self) -> None:
+        """Nothing to do, each file is closed once written."""
+
+    def path(self, scenario_index: int) -> Path:
+        """The file of a scenario."""
+        return self.directory / f"scenario_{scenario_index:06d}.csv.gz"
+
+    def write(
+        self, scenario_index: int, time: np.ndarray, columns: dict[str, np.ndarray]
+    ) -> None:
+        with gzip.open(
+            self.path(scenario_index),
+            "wt",
+            compresslevel=self.compresslevel,
+            newline="",
+        ) as file:
+            writer = csv.writer(file)
+            writer.writerow(("time",) + HOURLY_COLUMNS)
+            writer.writerows(
+                zip(
+                    np.datetime_as_string(time, unit="m").tolist(),
+                    *(columns[name].tolist() for name in HOURLY_COLUMNS),
+                )
+            )
+
+
+def write_table(path: Path, columns: dict[str, list]) -> None:
+    """
+    Write a table, e.g. sweep.results_to_columns of a sweep, to a file.
+
+    The format is chosen by the suffix: .parquet requires pyarrow, .csv.gz is
+    compressed with gzip and any other suffix is written as plain CSV.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        pa, pq = _import_pyarrow()
+        pq.write_table(pa.table(columns), path)
+        return
+    with (
+        gzip.open(path, "wt", newline="")
+        if path.suffix == ".gz"
+        else open(path, "w", newline="")
+    ) as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        writer.writerows(zip(*columns.values()))
@@ -0,0 +1,292 @@
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.consumption.load_profiles import StandardLoadProfile
+from home_energy_flow.instrumentation import stage
+from home_energy_flow.kpis import YearlyKPIs, yearly_kpi_arrays
+from home_energy_flow.prices import Prices, Tariff
+from home_energy_flow.production import compute_production, meteo_load
+from home_energy_flow.production.meteo_catalog import MeteoCatalog
+from home_energy_flow.production.meteo_columns import MeteoColumns, MeteoDataset
+from home_energy_flow.production.orientation_index import OrientationIndex
+from home_energy_flow.profile_cache import model_key
+from home_energy_flow.storage import compute_storage
+from home_energy_flow.sweep import Scenario
+
+# Number of households simulated in one batch. Bounds the memory to about
+# 15 arrays of FLEET_CHUNK_SIZE x time steps, about 270 MB for a year.
+FLEET_CHUNK_SIZE = 256
+
+# The hourly series of FleetResult, summed over all households.
+FLEET_SERIES = (
+    "production_kWh",
+    "consumption_kWh",
+    "self_usage_kWh",
+    "energy_buy_kWh",
+    "energy_sell_kWh",
+)
+
+
+class Household(Scenario):
+    """A home of the fleet, with the location of its meteo data if needed."""
+
+    # Latitude and longitude, only needed if the data directory has data of
+    # several sites, see MeteoCatalog.find.
+    location: tuple[float, float] | None = None
+
+
+@dataclass(frozen=True)
+class FleetResult:
+    """
+    The per-household KPIs and the fleet-level aggregates of run_fleet.
+
+    The KPIs are arrays in the order of the households. The hourly series are
+    summed over all households.
+    """
+
+    # For each field of YearlyKPIs, one value per household
+    kpis: dict[str, np.ndarray]
+    time: np.ndarray
+    production_kWh: np.ndarray
+    consumption_kWh: np.ndarray
+    self_usage_kWh: np.ndarray
+    energy_buy_kWh: np.ndarray
+    energy_sell_kWh: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.kpis["production_kWh"])
+
+    def household_kpis(self, index: int) -> YearlyKPIs:
+        """The KPIs of one household."""
+        return YearlyKPIs(
+            **{name: float(values[index]) for name, values in self.kpis.items()}
+        )
+
+    def fleet_kpis(self) -> YearlyKPIs:
+        """The KPIs of the fleet as a whole, with energies and gains summed up."""
+        totals = {
+            name: float(values.sum())
+            for name, values in self.kpis.items()
+            if name != "autarky"
+        }
+        consumption = totals["consumption_kWh"]
+        return YearlyKPIs(
+            **totals,
+            autarky=totals["self_usage_kWh"] / consumption if consumption > 0 else 0.0,
+        )
+
+    @property
+    def peak_energy_buy_kWh(self) -> float:
+        """The largest energy bought by the fleet within one time step."""
+        return float(self.energy_buy_kWh.max(initial=0.0))
+
+    @property
+    def peak_energy_sell_kWh(self) -> float:
+        """The largest energy sold by the fleet within one time step."""
+        return float(self.energy_sell_kWh.max(initial=0.0))
+
+
+def _load_site_datasets(
+    households: Sequence[Household],
+    year: int,
+    catalog: MeteoCatalog,
+    interpolate: bool,
+    cache_dir: Path | None,
+) -> dict[tuple[float, float] | None, list[MeteoDataset]]:
+    """
+    Load the meteo data of each location once.
+
+    Files used by households of several locations are loaded only once.
+    """
+    entries_per_location: dict[tuple[float, float] | None, dict[Path, None]]
+    entries_per_location = defaultdict(dict)
+    checked_systems: set[tuple[str, tuple[float, float] | None]] = set()
+    for household in households:
+        key = (model_key(household.pv_system), household.location)
+        if key in checked_systems:
+            continue
+        checked_systems.add(key)
+        for entry in catalog.entries_for_system(
+            household.pv_system, year, household.location, interpolate
+        ):
+            entries_per_location[household.location][entry.path] = None
+
+    loaded: dict[Path, MeteoDataset] = {}
+    datasets: dict[tuple[float, float] | None, list[MeteoDataset]] = {}
+    for location, paths in entries_per_location.items():
+        for path in paths:
+            if path not in loaded:
+                dataset = meteo_load.load_meteo_dataset(path, cache_dir=cache_dir)
+                loaded[path] = dataset.select_year(year)
+        datasets[location] = [loaded[path] for path in paths]
+    return datasets
+
+
+def _consumption_batch(
+    households: Sequence[Household],
+    columns: MeteoColumns,
+    load_profile: StandardLoadProfile | None,
+) -> np.ndarray:
+    """
+    The consumption of the households in kWh, shape (households, time steps).
+
+    Both profiles are linear in their yearly consumption, so they are computed
+    once per site with 1 kWh per year, or for the heat pump once per heating
+    configuration, and scaled per household.
+    """
+    regular_unit = consumption_profiles.regular_consumption_for_columns(
+        columns, 1.0, load_profile
+    )
+    regular_kWh = np.array([h.regular_consumption_kWh for h in households])
+    consumption = regular_kWh[:, np.newaxis] * regular_unit
+
+    heatpump_kWh = np.array(
+        [h.heatpump_system.yearly_electricity_consumption_kWh for h in households]
+    )
+    # Households whose heat pumps differ only in the yearly consumption
+    configurations: dict[str, tuple[HeatPumpSystem, list[int]]] = {}
+    for i, household in enumerate(households):
+        unit_system = household.heatpump_system.model_copy(
+            update={"yearly_electricity_consumption_kWh": 1.0}
+        )
+        key = model_key(unit_system)
+        if key not in configurations:
+            configurations[key] = (unit_system, [])
+        configurations[key][1].append(i)
+    for unit_system, indices in configurations.values():
+        heatpump_unit = consumption_profiles.heatpump_consumption_for_columns(
+            columns, unit_system
+        )
+        consumption[indices] += heatpump_kWh[indices, np.newaxis] * heatpump_unit
+    return consumption
+
+
+def run_fleet(
+    households: Sequence[Household],
+    year: int,
+    prices: Tariff | None = None,
+    datasets: list[MeteoDataset] | None = None,
+    catalog: MeteoCatalog | None = None,
+    interpolate: bool = False,
+    chunk_size: int = FLEET_CHUNK_SIZE,
+    cache_dir: Path | None = None,
+    load_profile: StandardLoadProfile | None = None,
+) -> FleetResult:
+    """
+    Simulate many households as batches of household x time step arrays.
+
+    Each household has its own PV system, consumption and storage. The meteo
+    data of each site is loaded once and shared by its households. The
+    households are simulated in chunks of chunk_size, so the memory is bounded
+    independently of the size of the fleet. The results are equal to
+    simulating each household with main up to floating point rounding.
+
+    Args:
+        households:
+            The households of the fleet.
+        year:
+            The year of the meteo data to simulate.
+        prices:
+            The prices used to compute the gains, defaults to Prices(). Can
+            be any Tariff, e.g. a TimeOfUseTariff.
+        datasets:
+            Meteo data of the year used by all households. If not given, the
+            data of each household's location is loaded from the catalog.
+        catalog:
+            Catalog of the meteo data, defaults to MeteoCatalog.scan().
+        interpolate:
+            Interpolate the irradiance of module orientations without meteo
+            data, see compute_production.compute_production_batch.
+        chunk_size:
+            Number of households simulated at once.
+        cache_dir:
+            Directory of the meteo cache, see meteo_load.load_meteo_dataset.
+        load_profile:
+            Standard load profile of the regular consumption, e.g.
+            load_profiles.H0. Defaults to the typical daily profile.
+    """
+    if prices is None:
+        prices = Prices()
+    datasets_per_location: dict[tuple[float, float] | None, list[MeteoDataset]]
+    location_of: list[tuple[float, float] | None]
+    if datasets is not None:
+        datasets_per_location = {None: datasets}
+        location_of = [None] * len(households)
+    else:
+        datasets_per_location = _load_site_datasets(
+            households,
+            year,
+            MeteoCatalog.scan() if catalog is None else catalog,
+            interpolate,
+            cache_dir,
+        )
+        location_of = [household.location for household in households]
+
+    indices_per_location: dict[tuple[float, float] | None, list[int]] = defaultdict(
+        list
+    )
+    for i, location in enumerate(location_of):
+        indices_per_location[location].append(i)
+
+    kpis: dict[str, np.ndarray] = {
+        name: np.zeros(len(households)) for name in YearlyKPIs.model_fields
+    }
+    time: np.ndarray | None = None
+    hourly: dict[str, np.ndarray] = {}
+    for location, indices in indices_per_location.items():
+        site_datasets = datasets_per_location[location]
+        columns = site_datasets[0].columns
+        price_series = (
+            prices if isinstance(prices, Prices) else prices.price_series(columns.time)
+        )
+        if time is None:
+            time = columns.time
+            hourly = {name: np.zeros(len(time)) for name in FLEET_SERIES}
+        elif not np.array_equal(
+            columns.time.astype("datetime64[h]"), time.astype("datetime64[h]")
+        ):
+            raise ValueError("The meteo data of the sites has different hours")
+
+        index = OrientationIndex(site_datasets)
+        for start in range(0, len(indices), chunk_size):
+            chunk = indices[start : start + chunk_size]
+            chunk_households = [households[i] for i in chunk]
+            with stage("fleet_production", rows=len(chunk) * len(columns)):
+                _, production = compute_production.compute_production_batch(
+                    [h.pv_system for h in chunk_households],
+                    site_datasets,
+                    interpolate,
+                    index,
+                )
+            with stage("fleet_consumption", rows=len(chunk) * len(columns)):
+                consumption = _consumption_batch(
+                    chunk_households, columns, load_profile
+                )
+            with stage("fleet_storage", rows=len(chunk) * len(columns)):
+                flows = compute_storage.simulate_storage(
+                    production,
+                    consumption,
+                    storage_kWh=np.array([h.storage_kWh for h in chunk_households]),
+                )
+            with stage("fleet_kpis", rows=len(chunk) * len(columns)):
+                for name, values in yearly_kpi_arrays(
+                    production, consumption, flows, price_series
+                ).items():
+                    kpis[name][chunk] = values
+                hourly["production_kWh"] += production.sum(axis=0)
+                hourly["consumption_kWh"] += consumption.sum(axis=0)
+                hourly["self_usage_kWh"] += flows.self_usage.sum(axis=0)
+                hourly["energy_buy_kWh"] += flows.energy_buy.sum(axis=0)
+                hourly["energy_sell_kWh"] += flows.energy_sell.sum(axis=0)
+            del production, consumption, flows
+
+    if time is None:
+        time = np.empty(0, dtype="datetime64[m]")
+        hourly = {name: np.zeros(0) for name in FLEET_SERIES}
+    return FleetResult(kpis=kpis, time=time, **hourly)
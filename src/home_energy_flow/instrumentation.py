@@ -0,0 +1,249 @@
+import cProfile
+import pstats
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Collection, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import final
+
+
+@dataclass
+class StageRecord:
+    """Measurements of all runs of one stage."""
+
+    name: str
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    # Change of the number of memory blocks allocated by Python.
+    allocated_blocks: int = 0
+    # Largest traced memory during a run, only with trace_memory.
+    peak_memory_bytes: int | None = None
+    # Number of rows or time steps processed, if the stage reports them.
+    rows: int | None = None
+
+
+class StageHandle:
+    """Returned by Instrumentation.stage, to report the rows of the stage."""
+
+    def __init__(self, rows: int | None) -> None:
+        self.rows = rows
+
+    def set_rows(self, rows: int) -> None:
+        self.rows = rows
+
+
+@final
+class _NullStage:
+    """Stage of disabled instrumentation, which measures nothing."""
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        pass
+
+    def set_rows(self, rows: int) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Instrumentation:
+    """
+    Records the wall time, CPU time, allocations and rows of each stage.
+
+    Stages are marked in the code with the module level stage() context
+    manager. They are only measured while an Instrumentation is activated
+    with instrument(), e.g. by passing it to main.main. Stages can be nested,
+    the measurements of a stage include its nested stages.
+    """
+
+    def __init__(
+        self,
+        trace_memory: bool = False,
+        profile_stages: Collection[str] = (),
+        profile_dir: Path | None = None,
+        callbacks: Collection[Callable[[StageRecord], None]] = (),
+    ) -> None:
+        """
+        Args:
+            trace_memory:
+                Trace the peak memory of each stage with tracemalloc. This
+                slows down allocations considerably.
+            profile_stages:
+                Names of the stages to run under cProfile. The statistics are
+                kept in profiles and, if profile_dir is given, dumped to
+                <profile_dir>/<stage>.prof for e.g. snakeviz or pstats.
+            profile_dir:
+                Directory of the profile dumps.
+            callbacks:
+                Called with the measurements of a single run after each stage.
+        """
+        self.trace_memory = trace_memory
+        self.profile_stages = set(profile_stages)
+        self.profile_dir = profile_dir
+        self.callbacks = list(callbacks)
+        self.records: dict[str, StageRecord] = {}
+        self.profiles: dict[str, pstats.Stats] = {}
+        self._profiling = False
+        # Peak memory of the enclosing stages, while tracing memory
+        self._peaks: list[int] = []
+
+    def add_callback(self, callback: Callable[[StageRecord], None]) -> None:
+        self.callbacks.append(callback)
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None) -> Iterator[StageHandle]:
+        """Measure the block as one run of the stage."""
+        handle = StageHandle(rows)
+        profiler = None
+        if name in self.profile_stages and not self._profiling:
+            # Only one profiler can be active at a time
+            profiler = cProfile.Profile()
+            self._profiling = True
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            # The peak of the enclosing stage so far, before it is reset
+            if self._peaks:
+                self._peaks[-1] = max(
+                    self._peaks[-1], tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+
+        blocks = sys.getallocatedblocks()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield handle
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            run = StageRecord(
+                name=name,
+                calls=1,
+                wall_seconds=time.perf_counter() - wall_start,
+                cpu_seconds=time.process_time() - cpu_start,
+                allocated_blocks=sys.getallocatedblocks() - blocks,
+                rows=handle.rows,
+            )
+            if self.trace_memory:
+                run.peak_memory_bytes = max(
+                    self._peaks.pop(), tracemalloc.get_traced_memory()[1]
+                )
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], run.peak_memory_bytes)
+                if started_tracing:
+                    tracemalloc.stop()
+            if profiler is not None:
+                self._profiling = False
+                self._add_profile(name, profiler)
+            self._add_run(run)
+
+    def _add_profile(self, name: str, profiler: cProfile.Profile) -> None:
+        if name in self.profiles:
+            self.profiles[name].add(profiler)
+        else:
+            self.profiles[name] = pstats.Stats(profiler)
+        if self.profile_dir is not None:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            self.profiles[name].dump_stats(self.profile_dir / f"{name}.prof")
+
+    def _add_run(self, run: StageRecord) -> None:
+        record = self.records.setdefault(run.name, StageRecord(name=run.name))
+        record.calls += 1
+        record.wall_seconds += run.wall_seconds
+        record.cpu_seconds += run.cpu_seconds
+        record.allocated_blocks += run.allocated_blocks
+        if run.peak_memory_bytes is not None:
+            record.peak_memory_bytes = max(
+                record.peak_memory_bytes or 0, run.peak_memory_bytes
+            )
+        if run.rows is not None:
+            record.rows = (record.rows or 0) + run.rows
+        for callback in self.callbacks:
+            callback(run)
+
+    def report(self) -> list[dict]:
+        """The measurements of all stages, in the order they first finished."""
+        return [asdict(record) for record in self.records.values()]
+
+    def format_report(self) -> str:
+        """The measurements of all stages as a table."""
+        from tabulate import tabulate
+
+        rows = [
+            [
+                record.name,
+                record.calls,
+                f"{record.wall_seconds * 1000:.1f}",
+                f"{record.cpu_seconds * 1000:.1f}",
+                record.allocated_blocks,
+                "-"
+                if record.peak_memory_bytes is None
+                else f"{record.peak_memory_bytes / 1024**2:.1f}",
+                "-" if record.rows is None else record.rows,
+            ]
+            for record in self.records.values()
+        ]
+        return tabulate(
+            rows,
+            headers=[
+                "Stage",
+                "Calls",
+                "Wall ms",
+                "CPU ms",
+                "Blocks",
+                "Peak MiB",
+                "Rows",
+            ],
+            stralign="right",
+        )
+
+
+_active: ContextVar[Instrumentation | None] = ContextVar(
+    "home_energy_flow_instrumentation", default=None
+)
+
+
+@contextmanager
+def instrument(instrumentation: Instrumentation | None) -> Iterator[None]:
+    """Measure the stages run in the block with the instrumentation, if not None."""
+    if instrumentation is None:
+        yield
+        return
+    token = _active.set(instrumentation)
+    try:
+        yield
+    finally:
+        _active.reset(token)
+
+
+def stage(
+    name: str, rows: int | None = None
+) -> _NullStage | AbstractContextManager[StageHandle]:
+    """
+    Mark a block of code as a stage of the pipeline.
+
+    Without active instrumentation this returns a shared no-op context
+    manager, so marking stages costs about as much as a dictionary lookup.
+
+    Usage:
+        with stage("production", rows=len(times)) as handle:
+            ...
+            handle.set_rows(len(production))
+    """
+    instrumentation = _active.get()
+    if instrumentation is None:
+        return _NULL_STAGE
+    return instrumentation.stage(name, rows)
@@ -0,0 +1,212 @@
+from dataclasses import dataclass
+
+import numpy as np
+from pydantic import BaseModel
+
+from home_energy_flow.prices import Prices, PriceSeries, Tariff
+from home_energy_flow.production.time_axis import TimeAxis
+from home_energy_flow.storage.compute_storage import EnergyFlowData, StorageFlows
+
+
+class YearlyKPIs(BaseModel):
+    """Energy totals in kWh and gains in EUR over the simulated period."""
+
+    production_kWh: float
+    consumption_kWh: float
+    self_usage_kWh: float
+    energy_buy_kWh: float
+    energy_sell_kWh: float
+    gain_self_usage_eur: float
+    gain_sell_eur: float
+    gain_eur: float
+    # Share of the consumption that is covered by self usage, between 0 and 1.
+    autarky: float
+
+
+@dataclass(frozen=True)
+class MonthlyCosts:
+    """
+    Costs and revenues in EUR per month, see monthly_costs.
+
+    The arrays have the shape (..., months), with the batch dimensions of the
+    energy flows.
+    """
+
+    # The simulated months, as datetime64[M] array.
+    month: np.ndarray
+    # Costs of the energy bought.
+    energy_buy_eur: np.ndarray
+    # Revenue of the energy sold.
+    energy_sell_eur: np.ndarray
+    # Costs avoided by self usage, the gain of self usage.
+    self_usage_eur: np.ndarray
+
+    @property
+    def net_cost_eur(self) -> np.ndarray:
+        """Costs of the energy bought minus revenue of the energy sold."""
+        return self.energy_buy_eur - self.energy_sell_eur
+
+    @property
+    def gain_eur(self) -> np.ndarray:
+        """Gain of self usage plus revenue of the energy sold."""
+        return self.self_usage_eur + self.energy_sell_eur
+
+
+def monthly_costs(
+    time: np.ndarray,
+    energy_buy_kWh: np.ndarray,
+    energy_sell_kWh: np.ndarray,
+    self_usage_kWh: np.ndarray,
+    tariff: Tariff | PriceSeries,
+) -> MonthlyCosts:
+    """
+    Compute the costs and revenues of energy flows per month.
+
+    The costs of each month are dot products of the energy flows and the
+    prices of its time steps, computed for all months and batch entries at
+    once. Comparing tariffs thus only needs the energy flows of one
+    simulation, not a new simulation per tariff.
+
+    Args:
+        time:
+            The sorted times of the time steps, as datetime64 array.
+        energy_buy_kWh, energy_sell_kWh, self_usage_kWh:
+            The energy flows, shape (..., time steps), e.g. of StorageFlows.
+        tariff:
+            The tariff, or its prices at the times.
+    """
+    prices = tariff if isinstance(tariff, PriceSeries) else tariff.price_series(time)
+    month_index = TimeAxis(time).month_index
+    starts = np.flatnonzero(np.diff(month_index, prepend=month_index[:1] - 1))
+
+    def per_month(energy_kWh: np.ndarray, price: np.ndarray) -> np.ndarray:
+        energy_kWh = np.asarray(energy_kWh, dtype=np.float64)
+        if len(starts) == 0:
+            return np.zeros(energy_kWh.shape[:-1] + (0,))
+        return np.add.reduceat(energy_kWh * price, starts, axis=-1)
+
+    return MonthlyCosts(
+        month=month_index[starts].astype("datetime64[M]"),
+        energy_buy_eur=per_month(energy_buy_kWh, prices.energy_buy_eur_per_kWh),
+        energy_sell_eur=per_month(
+            prices.paid_sell(np.asarray(energy_sell_kWh)),
+            prices.energy_sell_eur_per_kWh,
+        ),
+        self_usage_eur=per_month(self_usage_kWh, prices.energy_buy_eur_per_kWh),
+    )
+
+
+def compute_yearly_kpis(
+    energy_flow_data: EnergyFlowData, prices: Prices | MonthlyCosts
+) -> YearlyKPIs:
+    """
+    Compute the KPIs of one simulation.
+
+    Args:
+        prices:
+            Constant prices, or the costs of the energy flows under a tariff
+            from monthly_costs, whose gains are used.
+    """
+    # Sum up in the order of the time steps, like the former list-based data
+    total_consumption = sum(energy_flow_data.consumption.tolist())
+    total_self_usage = sum(energy_flow_data.self_usage.tolist())
+    total_sell = sum(energy_flow_data.energy_sell.tolist())
+
+    if isinstance(prices, MonthlyCosts):
+        gain_self_usage = float(prices.self_usage_eur.sum())
+        gain_sell = float(prices.energy_sell_eur.sum())
+    else:
+        gain_self_usage = total_self_usage * prices.energy_buy_eur_per_kWh
+        gain_sell = total_sell * prices.energy_sell_eur_per_kWh
+    return YearlyKPIs(
+        production_kWh=sum(energy_flow_data.production.tolist()),
+        consumption_kWh=total_consumption,
+        self_usage_kWh=total_self_usage,
+        energy_buy_kWh=sum(energy_flow_data.energy_buy.tolist()),
+        energy_sell_kWh=total_sell,
+        gain_self_usage_eur=gain_self_usage,
+        gain_sell_eur=gain_sell,
+        gain_eur=gain_self_usage + gain_sell,
+        autarky=total_self_usage / total_consumption if total_consumption > 0 else 0.0,
+    )
+
+
+def yearly_kpi_arrays(
+    production_kWh: np.ndarray,
+    consumption_kWh: np.ndarray,
+    flows: StorageFlows,
+    prices: Prices | PriceSeries,
+) -> dict[str, np.ndarray]:
+    """
+    Compute the KPIs of a batch of simulations as arrays.
+
+    Args:
+        production_kWh:
+            Production per time step, broadcastable to the shape of the flows.
+        consumption_kWh:
+            Consumption per time step, broadcastable to the shape of the flows.
+        flows:
+            Flows of shape (batch, time steps).
+        prices:
+            Constant prices, or the prices of each time step of a tariff,
+            whose gains are dot products with the energy flows.
+
+    Returns:
+        For each field of YearlyKPIs, an array with one value per batch entry.
+    """
+    shape = flows.energy_buy.shape
+    total_production = np.broadcast_to(production_kWh, shape).sum(axis=-1)
+    total_consumption = np.broadcast_to(consumption_kWh, shape).sum(axis=-1)
+    self_usage = flows.self_usage
+    if flows.grid_charge is not None:
+        # Energy charged from the grid was bought, so it does not count as
+        # self usage when the storage is discharged
+        self_usage = self_usage - flows.grid_charge
+    total_self_usage = self_usage.sum(axis=-1)
+    total_buy = flows.energy_buy.sum(axis=-1)
+    total_sell = flows.energy_sell.sum(axis=-1)
+
+    if isinstance(prices, PriceSeries):
+        gain_self_usage = self_usage @ prices.energy_buy_eur_per_kWh
+        gain_sell = prices.paid_sell(flows.energy_sell) @ prices.energy_sell_eur_per_kWh
+    else:
+        gain_self_usage = total_self_usage * prices.energy_buy_eur_per_kWh
+        gain_sell = total_sell * prices.energy_sell_eur_per_kWh
+    autarky = np.divide(
+        total_self_usage,
+        total_consumption,
+        out=np.zeros_like(total_self_usage),
+        where=total_consumption > 0,
+    )
+    return {
+        "production_kWh": total_production,
+        "consumption_kWh": total_consumption,
+        "self_usage_kWh": total_self_usage,
+        "energy_buy_kWh": total_buy,
+        "energy_sell_kWh": total_sell,
+        "gain_self_usage_eur": gain_self_usage,
+        "gain_sell_eur": gain_sell,
+        "gain_eur": gain_self_usage + gain_sell,
+        "autarky": autarky,
+    }
+
+
+def compute_yearly_kpis_batch(
+    production_kWh: np.ndarray,
+    consumption_kWh: np.ndarray,
+    flows: StorageFlows,
+    prices: Prices | PriceSeries,
+) -> list[YearlyKPIs]:
+    """
+    Compute the KPIs of a batch of simulations from the arrays of simulate_storage.
+
+    Takes the same arguments as yearly_kpi_arrays.
+
+    Returns:
+        One YearlyKPIs per batch entry.
+    """
+    arrays = yearly_kpi_arrays(production_kWh, consumption_kWh, flows, prices)
+    return [
+        YearlyKPIs(**dict(zip(arrays, values)))
+        for values in zip(*(array.tolist() for array in arrays.values()))
+    ]
@@ -1,11 +1,18 @@
+from collections.abc import Sequence
+
+from home_energy_flow.kpis import compute_yearly_kpis, monthly_costs
 from home_energy_flow.plot.aggregate_monthly_data import aggregate_monthly_data
-from home_energy_flow.prices import Prices
+from home_energy_flow.prices import Prices, Tariff
 import home_energy_flow.storage.compute_storage
 from home_energy_flow.production.pv_system import PVSystem
 from home_energy_flow.consumption import consumption_profiles
-from home_energy_flow.production import compute_production, meteo_load
-from home_energy_flow.plot import plot_graph, print_as_table
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.meteo_catalog import MeteoCatalog
 from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.consumption.load_profiles import StandardLoadProfile
+from home_energy_flow.instrumentation import Instrumentation, instrument, stage
+from home_energy_flow.result import SimulationResult
+from home_energy_flow.sinks import Sink, default_sinks
 
 
 def main(
@@ -14,61 +21,124 @@ def main(
     regular_consumption_kWh: float,
     heatpump_system: HeatPumpSystem,
     storage_kWh: float,
-    prices: Prices = Prices(),
-) -> None:
-    meteo_data_per_orientation = meteo_load.get_meteo_data_per_orientation()
-    for meteo_data in meteo_data_per_orientation:
-        meteo_data.outputs.hourly = [
-            entry for entry in meteo_data.outputs.hourly if entry.time.year == year
-        ]
+    prices: Tariff = Prices(),
+    instrumentation: Instrumentation | None = None,
+    sinks: Sequence[Sink] | None = None,
+    load_profile: StandardLoadProfile | None = None,
+) -> SimulationResult:
+    """
+    Simulate one year and write the result to the sinks.
+
+    Args:
+        prices:
+            The prices used to compute the gains, e.g. Prices for constant
+            prices or a TimeOfUseTariff or HourlyTariff.
+        instrumentation:
+            If given, records the time, allocations and rows of each stage of
+            the run, e.g. to print instrumentation.format_report() afterwards.
+        sinks:
+            Where to write the result, e.g. sinks.TableSink(), sinks.ImageSink
+            or sinks.CsvSink. Defaults to printing the monthly table and gains
+            and showing the plot in a window. Pass [] to only return the result.
+        load_profile:
+            Standard load profile of the regular consumption, e.g.
+            load_profiles.H0. Defaults to the typical daily profile.
+
+    Returns:
+        The hourly and monthly energy flows and the KPIs of the year.
+    """
+    with instrument(instrumentation):
+        result = _simulate(
+            year,
+            pv_system,
+            regular_consumption_kWh,
+            heatpump_system,
+            storage_kWh,
+            prices,
+            load_profile,
+        )
+        for sink in default_sinks() if sinks is None else sinks:
+            with stage(type(sink).__name__):
+                sink.write(result)
+    return result
+
+
+def _simulate(
+    year: int,
+    pv_system: PVSystem,
+    regular_consumption_kWh: float,
+    heatpump_system: HeatPumpSystem,
+    storage_kWh: float,
+    prices: Tariff,
+    load_profile: StandardLoadProfile | None,
+) -> SimulationResult:
+    with stage("load") as handle:
+        # Only load the orientations used by the PV system
+        datasets = MeteoCatalog.scan().load(pv_system, year)
+        num_rows = len(datasets[0].columns)
+        handle.set_rows(num_rows)
 
     # Calculate the total energy production of the pv system
-    times, total_production = compute_production.compute_production(
-        pv_system, meteo_data_per_orientation
-    )
+    with stage("production", rows=num_rows):
+        _, total_production = compute_production.compute_production_array(
+            pv_system, datasets
+        )
 
     # Model the energy consumption of a household
-    regular_consumption = consumption_profiles.generate_typical_consumption_profile(
-        meteo_data_per_orientation[0].outputs.hourly,
-        yearly_consumption_kWh=regular_consumption_kWh,
-    )
-    heatpump_consumption = consumption_profiles.generate_heatpump_consumption_profile(
-        meteo_data_per_orientation[0].outputs.hourly,
-        heatpump_system=heatpump_system,
-    )
-    total_consumption = [
-        reg + heat for reg, heat in zip(regular_consumption, heatpump_consumption)
-    ]
+    with stage("consumption", rows=num_rows):
+        columns = datasets[0].columns
+        times = columns.axis
+        regular_consumption = consumption_profiles.regular_consumption_for_columns(
+            columns,
+            yearly_consumption_kWh=regular_consumption_kWh,
+            load_profile=load_profile,
+        )
+        heatpump_consumption = consumption_profiles.heatpump_consumption_for_columns(
+            columns,
+            heatpump_system=heatpump_system,
+        )
+        total_consumption = regular_consumption + heatpump_consumption
 
     # Calculate for each time the energy buy, energy sell and energy self usage
-    energy_flow_data = (
-        home_energy_flow.storage.compute_storage.compute_production_consumption(
-            total_production, total_consumption, storage_kWh=storage_kWh
+    with stage("storage", rows=num_rows):
+        energy_flow_data = (
+            home_energy_flow.storage.compute_storage.compute_production_consumption(
+                total_production, total_consumption, storage_kWh=storage_kWh
+            )
         )
-    )
 
-    # Visualize the data
-    monthly_datas = aggregate_monthly_data(
-        times,
-        energy_flow_data.production,
-        regular_consumption,
-        heatpump_consumption,
-        energy_flow_data.consumption,
-        energy_flow_data.energy_buy,
-        energy_flow_data.energy_sell,
-        energy_flow_data.self_usage,
-    )
-    print_as_table.pprint_data_per_month_as_table(monthly_datas)
-    
-
-    total_self_usage = sum(energy_flow_data.self_usage)
-    total_sell = sum(energy_flow_data.energy_sell)
+    # Sum up the data per month
+    with stage("aggregation", rows=num_rows):
+        monthly_datas = aggregate_monthly_data(
+            times,
+            energy_flow_data.production,
+            regular_consumption,
+            heatpump_consumption,
+            energy_flow_data.consumption,
+            energy_flow_data.energy_buy,
+            energy_flow_data.energy_sell,
+            energy_flow_data.self_usage,
+        )
 
-    gain_self_usage = total_self_usage * prices.energy_buy_eur_per_kWh
-    gain_sell = total_sell * prices.energy_sell_eur_per_kWh
-    gain = gain_self_usage + gain_sell
-    print(f"Total gain self usage: {gain_self_usage:.2f} EUR")
-    print(f"Total gain sell: {gain_sell:.2f} EUR")
-    print(f"Total gain: {gain:.2f} EUR")
+    with stage("kpis", rows=num_rows):
+        costs = monthly_costs(
+            columns.time,
+            energy_flow_data.energy_buy,
+            energy_flow_data.energy_sell,
+            energy_flow_data.self_usage,
+            prices,
+        )
+        kpis = compute_yearly_kpis(
+            energy_flow_data, prices if isinstance(prices, Prices) else costs
+        )
 
-    plot_graph.plot_data_per_month_as_lines(monthly_datas)
\ No newline at end of file
+    return SimulationResult(
+        year=year,
+        time=columns.time,
+        energy_flow_data=energy_flow_data,
+        regular_consumption=regular_consumption,
+        heatpump_consumption=heatpump_consumption,
+        monthly_datas=monthly_datas,
+        kpis=kpis,
+        costs=costs,
+    )
@@ -0,0 +1,271 @@
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.consumption.load_profiles import StandardLoadProfile
+from home_energy_flow.instrumentation import stage
+from home_energy_flow.kpis import YearlyKPIs, compute_yearly_kpis, monthly_costs
+from home_energy_flow.plot.aggregate_monthly_data import aggregate_monthly_data
+from home_energy_flow.prices import Prices, Tariff
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.meteo_catalog import MeteoCatalog
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.pv_system import PVSystem
+from home_energy_flow.production.time_axis import TimeAxis
+from home_energy_flow.result import SimulationResult
+from home_energy_flow.storage import compute_storage
+from home_energy_flow.storage.compute_storage import EnergyFlowData
+
+# The KPIs of the year-over-year table, with their column headers.
+COMPARISON_COLUMNS = (
+    ("production_kWh", "Production kWh"),
+    ("consumption_kWh", "Consumption kWh"),
+    ("self_usage_kWh", "Self Usage kWh"),
+    ("energy_buy_kWh", "Energy Buy kWh"),
+    ("energy_sell_kWh", "Energy Sell kWh"),
+    ("autarky", "Autarky"),
+    ("gain_eur", "Gain EUR"),
+)
+
+
+@dataclass(frozen=True)
+class MultiYearResult:
+    """
+    The result of run_multi_year.
+
+    The hourly arrays span all years. The results of one year are views of
+    them, see year_result.
+    """
+
+    time: np.ndarray
+    # Hourly production, consumption, buy, sell and self usage in kWh
+    energy_flow_data: EnergyFlowData
+    # Hourly parts of the consumption in kWh
+    regular_consumption: np.ndarray
+    heatpump_consumption: np.ndarray
+    # The time steps of each year
+    year_slices: dict[int, slice]
+    kpis: dict[int, YearlyKPIs]
+    prices: Tariff
+
+    @property
+    def years(self) -> list[int]:
+        return list(self.year_slices)
+
+    def year_result(self, year: int) -> SimulationResult:
+        """
+        The result of one year, as main would return it.
+
+        The hourly values are views of the arrays of all years. Only the
+        monthly sums and the costs of the year are computed.
+        """
+        index = self.year_slices[year]
+        energy_flow_data = self.energy_flow_data[index]
+        time = self.time[index]
+        regular_consumption = self.regular_consumption[index]
+        heatpump_consumption = self.heatpump_consumption[index]
+        return SimulationResult(
+            year=year,
+            time=time,
+            energy_flow_data=energy_flow_data,
+            regular_consumption=regular_consumption,
+            heatpump_consumption=heatpump_consumption,
+            monthly_datas=aggregate_monthly_data(
+                TimeAxis(time),
+                energy_flow_data.production,
+                regular_consumption,
+                heatpump_consumption,
+                energy_flow_data.consumption,
+                energy_flow_data.energy_buy,
+                energy_flow_data.energy_sell,
+                energy_flow_data.self_usage,
+            ),
+            kpis=self.kpis[year],
+            costs=monthly_costs(
+                time,
+                energy_flow_data.energy_buy,
+                energy_flow_data.energy_sell,
+                energy_flow_data.self_usage,
+                self.prices,
+            ),
+        )
+
+    def comparison_columns(self) -> dict[str, list]:
+        """
+        The KPIs of each year as columns, e.g. for export.write_table.
+
+        The change_* columns hold the change of the gain and the autarky
+        relative to the previous year, None for the first year.
+        """
+        columns: dict[str, list] = {"year": self.years}
+        for name, _ in COMPARISON_COLUMNS:
+            columns[name] = [getattr(self.kpis[year], name) for year in self.years]
+        for name in ("gain_eur", "autarky"):
+            values = columns[name]
+            columns[f"change_{name}"] = [None] + [
+                current - previous for previous, current in itertools.pairwise(values)
+            ]
+        return columns
+
+    def comparison_table(self) -> str:
+        """The year-over-year table of the KPIs, formatted for printing."""
+        # Imported here, so that importing the package does not load tabulate
+        from tabulate import tabulate
+
+        columns = self.comparison_columns()
+        table = []
+        for i, year in enumerate(self.years):
+            row: list[int | str] = [year]
+            for name, _ in COMPARISON_COLUMNS:
+                value = columns[name][i]
+                row.append(f"{value:.3f}" if name == "autarky" else f"{value:.1f}")
+            change = columns["change_gain_eur"][i]
+            row.append("" if change is None else f"{change:+.1f}")
+            table.append(row)
+        headers = (
+            ["Year"]
+            + [header for _, header in COMPARISON_COLUMNS]
+            + ["Gain Change EUR"]
+        )
+        return tabulate(table, headers, tablefmt="pretty")
+
+
+def _span_datasets(
+    datasets: list[MeteoDataset], first_year: int | None, last_year: int | None
+) -> tuple[list[MeteoDataset], list[int]]:
+    """The datasets restricted to the years from first_year to last_year, as views."""
+    axis = datasets[0].columns.axis
+    years = [
+        year
+        for year in axis.years()
+        if (first_year is None or year >= first_year)
+        and (last_year is None or year <= last_year)
+    ]
+    if not years:
+        raise ValueError(
+            f"The meteo data has no years from {first_year} to {last_year}"
+        )
+    span = slice(axis.year_slice(years[0]).start, axis.year_slice(years[-1]).stop)
+    return [
+        MeteoDataset(inputs=dataset.inputs, columns=dataset.columns.slice(span))
+        for dataset in datasets
+    ], years
+
+
+def run_multi_year(
+    pv_system: PVSystem,
+    regular_consumption_kWh: float,
+    heatpump_system: HeatPumpSystem,
+    storage_kWh: float,
+    first_year: int | None = None,
+    last_year: int | None = None,
+    prices: Tariff | None = None,
+    datasets: list[MeteoDataset] | None = None,
+    catalog: MeteoCatalog | None = None,
+    carry_over_storage: bool = False,
+    load_profile: StandardLoadProfile | None = None,
+) -> MultiYearResult:
+    """
+    Simulate the household for several consecutive years at once.
+
+    The meteo data is loaded once for all years, and the production and
+    consumption of all years are computed in one pass. The consumption of
+    each calendar year is scaled to the yearly consumption, as in main. The
+    loaded datasets are only sliced, never modified, so they can be reused
+    for further runs.
+
+    Args:
+        pv_system, regular_consumption_kWh, heatpump_system, storage_kWh:
+            The household, as in main.
+        first_year, last_year:
+            The years to simulate, by default all years of the meteo data.
+        prices:
+            The prices used to compute the gains, defaults to Prices().
+        datasets:
+            Meteo data of the orientations of the PV system, spanning the
+            years. Loaded with the catalog if not given.
+        catalog:
+            Catalog of the meteo data, defaults to MeteoCatalog.scan().
+        carry_over_storage:
+            If True, the energy stored at the end of a year is used in the
+            next year. By default the storage starts empty each year, so each
+            year equals the result of main.
+        load_profile:
+            Standard load profile of the regular consumption, see main.
+    """
+    if prices is None:
+        prices = Prices()
+    if datasets is None:
+        catalog = MeteoCatalog.scan() if catalog is None else catalog
+        datasets = catalog.load(pv_system)
+    datasets, years = _span_datasets(datasets, first_year, last_year)
+    columns = datasets[0].columns
+    num_rows = len(columns)
+
+    with stage("production", rows=num_rows):
+        _, production = compute_production.compute_production_array(pv_system, datasets)
+    with stage("consumption", rows=num_rows):
+        regular_consumption = consumption_profiles.regular_consumption_for_columns(
+            columns, regular_consumption_kWh, load_profile
+        )
+        heatpump_consumption = consumption_profiles.heatpump_consumption_for_columns(
+            columns, heatpump_system
+        )
+        consumption = regular_consumption + heatpump_consumption
+
+    year_slices = {year: columns.axis.year_slice(year) for year in years}
+    with stage("storage", rows=num_rows):
+        if carry_over_storage:
+            flows = compute_storage.simulate_storage(
+                production, consumption, storage_kWh=storage_kWh
+            )
+            energy_buy = flows.energy_buy
+            energy_sell = flows.energy_sell
+            self_usage = flows.self_usage
+        else:
+            energy_buy = np.empty(num_rows)
+            energy_sell = np.empty(num_rows)
+            self_usage = np.empty(num_rows)
+            for index in year_slices.values():
+                flows = compute_storage.simulate_storage(
+                    production[index], consumption[index], storage_kWh=storage_kWh
+                )
+                energy_buy[index] = flows.energy_buy
+                energy_sell[index] = flows.energy_sell
+                self_usage[index] = flows.self_usage
+        energy_flow_data = EnergyFlowData(
+            energy_buy=energy_buy,
+            energy_sell=energy_sell,
+            self_usage=self_usage,
+            production=production,
+            consumption=consumption,
+        )
+
+    kpis = {}
+    with stage("kpis", rows=num_rows):
+        for year, index in year_slices.items():
+            year_data = energy_flow_data[index]
+            if isinstance(prices, Prices):
+                kpis[year] = compute_yearly_kpis(year_data, prices)
+            else:
+                costs = monthly_costs(
+                    columns.time[index],
+                    year_data.energy_buy,
+                    year_data.energy_sell,
+                    year_data.self_usage,
+                    prices,
+                )
+                kpis[year] = compute_yearly_kpis(year_data, costs)
+
+    return MultiYearResult(
+        time=columns.time,
+        energy_flow_data=energy_flow_data,
+        regular_consumption=regular_consumption,
+        heatpump_consumption=heatpump_consumption,
+        year_slices=year_slices,
+        kpis=kpis,
+        prices=prices,
+    )
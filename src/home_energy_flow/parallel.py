@@ -0,0 +1,272 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.context import BaseContext
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from home_energy_flow.consumption.load_profiles import StandardLoadProfile
+from home_energy_flow.prices import Prices, Tariff
+from home_energy_flow.production.meteo_columns import (
+    VALUE_COLUMNS,
+    MeteoColumns,
+    MeteoDataset,
+)
+from home_energy_flow.production.meteo_datamodels import Inputs
+from home_energy_flow.storage.dispatch import DispatchStrategy
+from home_energy_flow.sweep import (
+    Scenario,
+    ScenarioResult,
+    load_sweep_datasets,
+    run_sweep,
+)
+
+# Number of tasks per worker. More tasks balance the load better, fewer tasks
+# share more production and consumption profiles within a task.
+TASKS_PER_WORKER = 4
+
+
+@dataclass(frozen=True)
+class SharedMeteoSpec:
+    """Everything a worker needs to attach to the shared meteo columns."""
+
+    time_name: str
+    values_name: str
+    num_datasets: int
+    num_time_steps: int
+    inputs_json: list[str]
+
+
+class SharedMeteoData:
+    """
+    The columns of several meteo datasets in two shared memory blocks.
+
+    The times are stored as int64 array of shape (datasets, time steps), the
+    value columns as float64 array of shape (datasets, columns, time steps).
+    The process creating the blocks must call close() and unlink() once all
+    workers are done.
+    """
+
+    def __init__(
+        self,
+        spec: SharedMeteoSpec,
+        time_block: SharedMemory,
+        values_block: SharedMemory,
+    ) -> None:
+        self.spec = spec
+        self._time_block = time_block
+        self._values_block = values_block
+        self.times = np.ndarray(
+            (spec.num_datasets, spec.num_time_steps),
+            dtype=np.int64,
+            buffer=time_block.buf,
+        )
+        self.values = np.ndarray(
+            (spec.num_datasets, len(VALUE_COLUMNS), spec.num_time_steps),
+            dtype=np.float64,
+            buffer=values_block.buf,
+        )
+
+    @classmethod
+    def create(cls, datasets: list[MeteoDataset]) -> "SharedMeteoData":
+        """Copy the columns of the datasets into new shared memory blocks."""
+        num_time_steps = len(datasets[0].columns)
+        for dataset in datasets:
+            assert len(dataset.columns) == num_time_steps, (
+                "Length of solar data sets do not match"
+            )
+        # SharedMemory does not accept a size of 0, so allocate at least 1 byte.
+        time_block = SharedMemory(
+            create=True, size=max(len(datasets) * num_time_steps * 8, 1)
+        )
+        values_block = SharedMemory(
+            create=True,
+            size=max(len(datasets) * len(VALUE_COLUMNS) * num_time_steps * 8, 1),
+        )
+        spec = SharedMeteoSpec(
+            time_name=time_block.name,
+            values_name=values_block.name,
+            num_datasets=len(datasets),
+            num_time_steps=num_time_steps,
+            inputs_json=[dataset.inputs.model_dump_json() for dataset in datasets],
+        )
+        shared = cls(spec, time_block, values_block)
+        for i, dataset in enumerate(datasets):
+            shared.times[i] = dataset.columns.time.astype("datetime64[m]").view(
+                np.int64
+            )
+            for j, name in enumerate(VALUE_COLUMNS):
+                shared.values[i, j] = getattr(dataset.columns, name)
+        return shared
+
+    @classmethod
+    def attach(cls, spec: SharedMeteoSpec) -> "SharedMeteoData":
+        """
+        Attach to shared memory blocks created by the parent process.
+
+        Child processes share the resource tracker of their parent, so the
+        blocks stay registered only once and are unlinked by the parent.
+        """
+        return cls(
+            spec,
+            SharedMemory(name=spec.time_name),
+            SharedMemory(name=spec.values_name),
+        )
+
+    def datasets(self) -> list[MeteoDataset]:
+        """Read-only datasets whose columns are views into the shared memory."""
+        self.times.flags.writeable = False
+        self.values.flags.writeable = False
+        return [
+            MeteoDataset(
+                inputs=Inputs.model_validate_json(inputs_json),
+                columns=MeteoColumns(
+                    time=self.times[i].view("datetime64[m]"),
+                    **{name: self.values[i, j] for j, name in enumerate(VALUE_COLUMNS)},
+                ),
+            )
+            for i, inputs_json in enumerate(self.spec.inputs_json)
+        ]
+
+    def close(self) -> None:
+        # The arrays must be released before the blocks can be closed.
+        del self.times, self.values
+        self._time_block.close()
+        self._values_block.close()
+
+    def unlink(self) -> None:
+        self._time_block.unlink()
+        self._values_block.unlink()
+
+
+# State of a worker process, set once by _init_worker.
+_worker_shared: SharedMeteoData | None = None
+_worker_datasets: list[MeteoDataset] = []
+
+
+def _init_worker(spec: SharedMeteoSpec) -> None:
+    global _worker_shared, _worker_datasets
+    _worker_shared = SharedMeteoData.attach(spec)
+    _worker_datasets = _worker_shared.datasets()
+
+
+def _run_task(
+    year: int,
+    prices: Tariff,
+    scenarios: list[Scenario],
+    interpolate: bool,
+    dispatch: DispatchStrategy | None,
+    load_profile: StandardLoadProfile | None,
+) -> list[ScenarioResult]:
+    return run_sweep(
+        scenarios,
+        year,
+        prices=prices,
+        datasets=_worker_datasets,
+        interpolate=interpolate,
+        dispatch=dispatch,
+        load_profile=load_profile,
+    )
+
+
+def split_into_tasks(scenarios: list[Scenario], num_tasks: int) -> list[list[int]]:
+    """
+    Split the scenario indices into at most num_tasks tasks of similar size.
+
+    Scenarios with the same PV system are kept next to each other, so that
+    most tasks compute each production only once.
+    """
+    indices_per_system: dict[str, list[int]] = defaultdict(list)
+    for i, scenario in enumerate(scenarios):
+        indices_per_system[scenario.pv_system.model_dump_json()].append(i)
+    ordered = [i for indices in indices_per_system.values() for i in indices]
+    task_size = max(-(-len(ordered) // max(num_tasks, 1)), 1)
+    return [
+        ordered[start : start + task_size]
+        for start in range(0, len(ordered), task_size)
+    ]
+
+
+def run_sweep_parallel(
+    scenarios: list[Scenario],
+    year: int,
+    prices: Tariff | None = None,
+    datasets: list[MeteoDataset] | None = None,
+    max_workers: int | None = None,
+    mp_context: BaseContext | None = None,
+    interpolate: bool = False,
+    dispatch: DispatchStrategy | None = None,
+    load_profile: StandardLoadProfile | None = None,
+) -> list[ScenarioResult]:
+    """
+    Simulate many scenarios like run_sweep, but in a pool of worker processes.
+
+    The meteo columns are copied once into shared memory, which all workers
+    attach to. The workers only receive the scenarios of their tasks. The
+    hourly results stay in the workers, use run_sweep with an hourly_writer
+    to export them.
+
+    Args:
+        scenarios:
+            The scenarios to simulate, e.g. from sweep.scenario_grid.
+        year:
+            The year of the meteo data to simulate.
+        prices:
+            The prices used to compute the gain, defaults to Prices(). Can
+            be any Tariff, e.g. a TimeOfUseTariff.
+        datasets:
+            Meteo data of the orientations of the scenarios, restricted to the
+            year. Loaded with sweep.load_sweep_datasets if not given.
+        max_workers:
+            Number of worker processes, defaults to the number of CPUs.
+        mp_context:
+            Multiprocessing context used to start the workers, e.g. to use
+            the "spawn" start method. Defaults to the platform default.
+        interpolate, dispatch, load_profile:
+            As in run_sweep. The dispatch strategy and the load profile are
+            sent to the workers with each task.
+
+    Returns:
+        One result per scenario, in the order of the scenarios, independent
+        of the number of workers.
+    """
+    if prices is None:
+        prices = Prices()
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if not scenarios:
+        return []
+    if datasets is None:
+        datasets = load_sweep_datasets(scenarios, year, interpolate)
+
+    tasks = split_into_tasks(scenarios, num_tasks=max_workers * TASKS_PER_WORKER)
+    shared = SharedMeteoData.create(datasets)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(shared.spec,),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _run_task,
+                    year,
+                    prices,
+                    [scenarios[i] for i in indices],
+                    interpolate,
+                    dispatch,
+                    load_profile,
+                )
+                for indices in tasks
+            ]
+            results: list[ScenarioResult | None] = [None] * len(scenarios)
+            for indices, future in zip(tasks, futures):
+                for i, result in zip(indices, future.result()):
+                    results[i] = result.model_copy(update={"scenario_index": i})
+    finally:
+        shared.close()
+        shared.unlink()
+    return [result for result in results if result is not None]
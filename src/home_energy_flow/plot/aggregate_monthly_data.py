@@ -1,19 +1,22 @@
+import numpy as np
+
 from home_energy_flow.plot.datamodels import MonthlyData
+from home_energy_flow.plot.flow_accumulator import bucket_sums
 from home_energy_flow.production.meteo_datamodels import Time
+from home_energy_flow.production.time_axis import TimeAxis
 
 
 def aggregate_monthly_data(
-    times: list[Time],
-    solar_production: list[float],
-    regular_consumption: list[float],
-    heatpump_consumption: list[float],
-    total_consumption: list[float],
-    energy_buy: list[float],
-    energy_sell: list[float],
-    self_usage: list[float],
+    times: list[Time] | TimeAxis,
+    solar_production: list[float] | np.ndarray,
+    regular_consumption: list[float] | np.ndarray,
+    heatpump_consumption: list[float] | np.ndarray,
+    total_consumption: list[float] | np.ndarray,
+    energy_buy: list[float] | np.ndarray,
+    energy_sell: list[float] | np.ndarray,
+    self_usage: list[float] | np.ndarray,
 ) -> list[MonthlyData]:
-    monthly_datas = []
-    for name, values in [
+    series = [
         ("Solar Production", solar_production),
         ("Regular Consumption", regular_consumption),
         ("Heatpump Consumption", heatpump_consumption),
@@ -21,12 +24,20 @@ def aggregate_monthly_data(
         ("Energy Buy", energy_buy),
         ("Energy Sell", energy_sell),
         ("Self Usage", self_usage),
-    ]:
-        data_per_month = [0.0] * 12
-        for time, d in zip(times, values):
-            month = time.month
-            data_per_month[month - 1] += d
+    ]
+    # Read the month of each time once and sum up all series in one bincount
+    if isinstance(times, TimeAxis):
+        month_index = times.month - 1
+        year = int(times.year[0])
+    else:
+        month_index = np.fromiter(
+            (time.month - 1 for time in times), dtype=np.int64, count=len(times)
+        )
+        year = times[0].year
+    values = np.array([values[: len(times)] for _, values in series], dtype=np.float64)
+    data_per_month = bucket_sums(month_index, values, num_buckets=12)
 
-        monthly_data = MonthlyData(name=name, data=data_per_month, year=times[0].year)
-        monthly_datas.append(monthly_data)
-    return monthly_datas
+    return [
+        MonthlyData(name=name, data=data.tolist(), year=year)
+        for (name, _), data in zip(series, data_per_month)
+    ]
@@ -0,0 +1,172 @@
+from collections.abc import Mapping, Sequence
+from typing import Any
+
+import numpy as np
+
+from home_energy_flow.plot.datamodels import MonthlyData
+from home_energy_flow.production.time_axis import TimeAxis
+
+# Display names of the energy flow series, in the order of the monthly table.
+SERIES_NAMES = {
+    "production": "Solar Production",
+    "regular_consumption": "Regular Consumption",
+    "heatpump_consumption": "Heatpump Consumption",
+    "consumption": "Total Consumption",
+    "energy_buy": "Energy Buy",
+    "energy_sell": "Energy Sell",
+    "self_usage": "Self Usage",
+}
+
+BUCKETS = ("month", "day", "week", "hour_of_day")
+
+
+def bucket_ids(time: np.ndarray, bucket: str) -> np.ndarray:
+    """
+    Integer id of the bucket of each time.
+
+    The ids are months or days since 1970-01-01, weeks (starting on Monday)
+    since 1969-12-29, or the hour of the day.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}', must be one of {BUCKETS}")
+    return TimeAxis(time).bucket_ids(bucket)
+
+
+def bucket_sums(ids: np.ndarray, values: np.ndarray, num_buckets: int) -> np.ndarray:
+    """
+    Sum up several series per bucket with a single bincount.
+
+    Args:
+        ids:
+            Bucket of each time step, between 0 and num_buckets - 1.
+        values:
+            The series, shape (series, time steps).
+        num_buckets:
+            Number of buckets.
+
+    Returns:
+        The sums of shape (series, num_buckets). Within each bucket the values
+        are added in the order of the time steps.
+    """
+    num_series = len(values)
+    index = np.arange(num_series)[:, np.newaxis] * num_buckets + ids
+    return np.bincount(
+        index.ravel(), weights=values.ravel(), minlength=num_series * num_buckets
+    ).reshape(num_series, num_buckets)
+
+
+class FlowAccumulator:
+    """
+    Sums of energy flow series per time bucket, updated chunk by chunk.
+
+    Each call of add costs one bincount for all requested series, so the
+    simulation can update the accumulator as it produces each chunk.
+    """
+
+    def __init__(
+        self, bucket: str = "month", series: Sequence[str] = tuple(SERIES_NAMES)
+    ) -> None:
+        """
+        Args:
+            bucket:
+                One of "month", "day", "week" and "hour_of_day".
+            series:
+                Names of the series to sum up, only these have to be passed
+                to add.
+        """
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket '{bucket}', must be one of {BUCKETS}")
+        self.bucket = bucket
+        self.series = list(series)
+        self._first_id = 0
+        self._sums = np.zeros((len(self.series), 0))
+
+    def add(
+        self,
+        time: np.ndarray,
+        values: Mapping[str, np.ndarray],
+        ids: np.ndarray | None = None,
+    ) -> None:
+        """
+        Add the values of consecutive time steps.
+
+        Args:
+            time:
+                Times as datetime64 array.
+            values:
+                At least the requested series, each with one value per time.
+            ids:
+                Precomputed bucket_ids(time, bucket), e.g. from the TimeAxis
+                of the meteo data when the same times are added for many
+                simulations.
+        """
+        if len(time) == 0:
+            return
+        if ids is None:
+            ids = bucket_ids(time, self.bucket)
+        first_id = int(ids.min())
+        last_id = int(ids.max())
+        self._cover(first_id, last_id)
+
+        stacked = np.stack([np.asarray(values[name]) for name in self.series])
+        sums = bucket_sums(ids - first_id, stacked, last_id - first_id + 1)
+        start = first_id - self._first_id
+        self._sums[:, start : start + sums.shape[1]] += sums
+
+    def add_chunk(self, chunk: Any, ids: np.ndarray | None = None) -> None:
+        """Add an object with a time attribute and one attribute per series."""
+        self.add(
+            chunk.time, {name: getattr(chunk, name) for name in self.series}, ids=ids
+        )
+
+    def _cover(self, first_id: int, last_id: int) -> None:
+        """Grow the sums so that they cover the ids from first_id to last_id."""
+        if self._sums.shape[1] == 0:
+            self._first_id = first_id
+            self._sums = np.zeros((len(self.series), last_id - first_id + 1))
+            return
+        end_id = self._first_id + self._sums.shape[1]
+        prepend = max(self._first_id - first_id, 0)
+        append = max(last_id + 1 - end_id, 0)
+        if prepend or append:
+            self._sums = np.pad(self._sums, ((0, 0), (prepend, append)))
+            self._first_id -= prepend
+
+    def keys(self) -> np.ndarray:
+        """
+        The buckets of the totals: datetime64[M] for months, datetime64[D] for
+        days and for the Monday of weeks, and integers for hours of the day.
+        """
+        ids = np.arange(self._first_id, self._first_id + self._sums.shape[1])
+        if self.bucket == "month":
+            return ids.astype("datetime64[M]")
+        if self.bucket == "day":
+            return ids.astype("datetime64[D]")
+        if self.bucket == "week":
+            return (ids * 7 - 3).astype("datetime64[D]")
+        return ids
+
+    def totals(self) -> dict[str, np.ndarray]:
+        """Sum of each series per bucket, in the order of keys()."""
+        return {name: sums for name, sums in zip(self.series, self._sums)}
+
+    def to_monthly_data(self) -> dict[int, list[MonthlyData]]:
+        """The monthly sums per year as MonthlyData, for month buckets only."""
+        if self.bucket != "month":
+            raise ValueError("Monthly data requires the 'month' bucket.")
+        months = self.keys()
+        years = months.astype("datetime64[Y]").astype(np.int64) + 1970
+        month_index = months.astype(np.int64) % 12
+        monthly_datas: dict[int, list[MonthlyData]] = {}
+        for year in np.unique(years).tolist():
+            in_year = years == year
+            monthly_datas[year] = []
+            for name, sums in zip(self.series, self._sums):
+                data = np.zeros(12)
+                data[month_index[in_year]] = sums[in_year]
+                monthly_datas[year].append(
+                    MonthlyData(
+                        name=SERIES_NAMES.get(name, name), year=year, data=data.tolist()
+                    )
+                )
+        return monthly_datas
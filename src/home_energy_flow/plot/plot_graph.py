@@ -1,44 +1,65 @@
-import matplotlib.pyplot as plt
+from pathlib import Path
 
 from home_energy_flow.plot.datamodels import MonthlyData
 
+MONTH_NAMES = [
+    "Jan",
+    "Feb",
+    "Mar",
+    "Apr",
+    "May",
+    "Jun",
+    "Jul",
+    "Aug",
+    "Sep",
+    "Oct",
+    "Nov",
+    "Dec",
+]
 
-def plot_data_per_month_as_lines(monthly_datas: list[MonthlyData]):
-    months = range(1, 13)
 
-    # Create the plot
-    plt.figure(figsize=(10, 6))
+def _draw_data_per_month(axes, monthly_datas: list[MonthlyData]):
+    months = range(1, 13)
 
     # Plot each data series
     for montly_data in monthly_datas:
         label = montly_data.name
         data = montly_data.data
-        plt.plot(months, data, label=f"{label}: {sum(data):.0f} kWh", marker="o")
+        axes.plot(months, data, label=f"{label}: {sum(data):.0f} kWh", marker="o")
 
     # Add labels and title
-    plt.xlabel("Month")
-    plt.ylabel("Energy (kWh)")
-    plt.title(f"Monthly Energy Production and Consumption {monthly_datas[0].year}")
+    axes.set_xlabel("Month")
+    axes.set_ylabel("Energy (kWh)")
+    axes.set_title(f"Monthly Energy Production and Consumption {monthly_datas[0].year}")
 
     # Add grid and legend
-    plt.grid(True)
+    axes.grid(True)
     # location is outside
-    plt.legend(loc="upper center")
+    axes.legend(loc="upper center")
+    axes.set_xticks(months, MONTH_NAMES)
+
+
+def plot_data_per_month_as_lines(monthly_datas: list[MonthlyData]):
+    # Imported here, so that importing the package does not load matplotlib
+    import matplotlib.pyplot as plt
+
+    # Create the plot
+    _, axes = plt.subplots(figsize=(10, 6))
+    _draw_data_per_month(axes, monthly_datas)
 
     # Show the plot
-    month_names = [
-        "Jan",
-        "Feb",
-        "Mar",
-        "Apr",
-        "May",
-        "Jun",
-        "Jul",
-        "Aug",
-        "Sep",
-        "Oct",
-        "Nov",
-        "Dec",
-    ]
-    plt.xticks(months, month_names)
     plt.show()
+
+
+def save_data_per_month_as_lines(monthly_datas: list[MonthlyData], path: Path):
+    """
+    Save the plot of plot_data_per_month_as_lines to a file, without a window.
+
+    The format is taken from the suffix of the path, e.g. .png or .svg.
+    """
+    # The Figure is drawn without pyplot, so no GUI backend is loaded.
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    _draw_data_per_month(figure.subplots(), monthly_datas)
+    figure.savefig(path)
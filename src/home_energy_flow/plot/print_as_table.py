@@ -1,9 +1,14 @@
-from tabulate import tabulate
-
 from home_energy_flow.plot.datamodels import MonthlyData
 
 
 def pprint_data_per_month_as_table(monthly_datas: list[MonthlyData]):
+    print(format_data_per_month_as_table(monthly_datas))
+
+
+def format_data_per_month_as_table(monthly_datas: list[MonthlyData]) -> str:
+    # Imported here, so that importing the package does not load tabulate
+    from tabulate import tabulate
+
     # Create a list of months (1 to 12)
     months = range(1, 13)
 
@@ -18,8 +23,8 @@ def pprint_data_per_month_as_table(monthly_datas: list[MonthlyData]):
     # Define headers
     headers = ["Month"] + [data.name for data in monthly_datas]
 
-    # Print the table using tabulate
-    print(tabulate(table, headers, tablefmt="pretty"))
+    # Format the table using tabulate
+    return tabulate(table, headers, tablefmt="pretty")
 
 
 def pprint_data_per_month(data: MonthlyData):
@@ -1,10 +1,150 @@
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
 
+import numpy as np
 
+from home_energy_flow.production.time_axis import TimeAxis
 
-from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class PriceSeries:
+    """The buy and sell prices of each time step, see Tariff.price_series."""
+
+    energy_buy_eur_per_kWh: np.ndarray
+    energy_sell_eur_per_kWh: np.ndarray
+    # Energy sold above this limit within one time step is not paid.
+    paid_sell_limit_kWh: float | None = None
+
+    def paid_sell(self, energy_sell_kWh: np.ndarray) -> np.ndarray:
+        """The part of the energy sold per time step that is paid."""
+        if self.paid_sell_limit_kWh is None:
+            return energy_sell_kWh
+        return np.minimum(energy_sell_kWh, self.paid_sell_limit_kWh)
+
+
+class Tariff(Protocol):
+    """Buy and sell prices, which may change from time step to time step."""
+
+    def price_series(self, time: np.ndarray) -> PriceSeries:
+        """The prices at the times of a simulation, given as datetime64 array."""
+        ...
 
 
 @dataclass
 class Prices:
     energy_buy_eur_per_kWh: float = 0.3
-    energy_sell_eur_per_kWh: float = 0.08
\ No newline at end of file
+    energy_sell_eur_per_kWh: float = 0.08
+
+    def price_series(self, time: np.ndarray) -> PriceSeries:
+        return PriceSeries(
+            energy_buy_eur_per_kWh=np.full(len(time), self.energy_buy_eur_per_kWh),
+            energy_sell_eur_per_kWh=np.full(len(time), self.energy_sell_eur_per_kWh),
+        )
+
+
+def _paid_sell_limit(time: np.ndarray, feed_in_limit_kW: float | None) -> float | None:
+    if feed_in_limit_kW is None:
+        return None
+    return feed_in_limit_kW * TimeAxis(time).step_hours
+
+
+@dataclass
+class TimeOfUseTariff:
+    """Prices per hour of the day, e.g. with cheaper energy at night."""
+
+    # Buy price of each hour of the day, 24 values.
+    energy_buy_eur_per_kWh: list[float]
+    # Sell price of each hour of the day, or one price for all hours.
+    energy_sell_eur_per_kWh: list[float] | float = 0.08
+    # Feed-in power above this limit is not paid, e.g. 60% of the peak power.
+    feed_in_limit_kW: float | None = None
+
+    def price_series(self, time: np.ndarray) -> PriceSeries:
+        if len(self.energy_buy_eur_per_kWh) != 24:
+            raise ValueError("A time-of-use tariff needs a buy price for each hour")
+        hour = TimeAxis(time).hour
+        sell = np.asarray(self.energy_sell_eur_per_kWh, dtype=np.float64)
+        return PriceSeries(
+            energy_buy_eur_per_kWh=np.asarray(
+                self.energy_buy_eur_per_kWh, dtype=np.float64
+            )[hour],
+            energy_sell_eur_per_kWh=(
+                np.full(len(time), sell) if sell.ndim == 0 else sell[hour]
+            ),
+            paid_sell_limit_kWh=_paid_sell_limit(time, self.feed_in_limit_kW),
+        )
+
+
+@dataclass
+class HourlyTariff:
+    """Prices of each hour, e.g. of a dynamic tariff following the spot market."""
+
+    # Start of each hour with a price, sorted, as datetime64 array.
+    time: np.ndarray
+    energy_buy_eur_per_kWh: np.ndarray
+    # Sell price of each hour, or one price for all hours.
+    energy_sell_eur_per_kWh: np.ndarray | float = 0.08
+    # Feed-in power above this limit is not paid, e.g. 60% of the peak power.
+    feed_in_limit_kW: float | None = None
+
+    @classmethod
+    def from_csv(
+        cls, path: Path, feed_in_limit_kW: float | None = None
+    ) -> "HourlyTariff":
+        """
+        Read the prices from a CSV file.
+
+        The file has the columns time, as ISO 8601 string, and
+        energy_buy_eur_per_kWh, and optionally energy_sell_eur_per_kWh.
+        """
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+        tariff = cls(
+            time=np.array([row["time"] for row in rows], dtype="datetime64[m]"),
+            energy_buy_eur_per_kWh=np.array(
+                [row["energy_buy_eur_per_kWh"] for row in rows], dtype=np.float64
+            ),
+            feed_in_limit_kW=feed_in_limit_kW,
+        )
+        if rows and "energy_sell_eur_per_kWh" in rows[0]:
+            tariff.energy_sell_eur_per_kWh = np.array(
+                [row["energy_sell_eur_per_kWh"] for row in rows], dtype=np.float64
+            )
+        return tariff
+
+    def price_series(self, time: np.ndarray) -> PriceSeries:
+        """The prices of the hours of the times, a ValueError if one is missing."""
+        hours = self.time.astype("datetime64[h]")
+        requested = time.astype("datetime64[h]")
+        index = np.minimum(np.searchsorted(hours, requested), max(len(hours) - 1, 0))
+        if len(hours) == 0 or np.any(hours[index] != requested):
+            raise ValueError("The tariff has no prices for some of the simulated hours")
+        sell = np.asarray(self.energy_sell_eur_per_kWh, dtype=np.float64)
+        return PriceSeries(
+            energy_buy_eur_per_kWh=np.asarray(
+                self.energy_buy_eur_per_kWh, dtype=np.float64
+            )[index],
+            energy_sell_eur_per_kWh=(
+                np.full(len(time), sell) if sell.ndim == 0 else sell[index]
+            ),
+            paid_sell_limit_kWh=_paid_sell_limit(time, self.feed_in_limit_kW),
+        )
+
+
+@dataclass
+class InvestmentCosts:
+    """Investment costs, spread evenly over the lifetime to compare with gains."""
+
+    eur_per_kWp: float = 0.0
+    eur_per_storage_kWh: float = 0.0
+    lifetime_years: float = 20.0
+
+    def yearly_eur(
+        self, kWp: float | np.ndarray, storage_kWh: float | np.ndarray
+    ) -> float | np.ndarray:
+        """The investment per year of the PV peak power and storage capacity."""
+        return (
+            self.eur_per_kWp * kWp + self.eur_per_storage_kWh * storage_kWh
+        ) / self.lifetime_years
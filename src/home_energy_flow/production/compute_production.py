@@ -1,9 +1,24 @@
-from home_energy_flow.production.pv_system import Modules, PVSystem
+import numpy as np
+
+from home_energy_flow.production.meteo_columns import MeteoDataset
 from home_energy_flow.production.meteo_datamodels import (
+    Inputs,
     SolarRadiationData,
     Time,
     TimeSeriesEntry,
 )
+from home_energy_flow.production.orientation_index import (
+    OrientationIndex,
+    inputs_orientation,
+    module_orientation,
+)
+from home_energy_flow.production.pv_system import Modules, PVSystem
+from home_energy_flow.profile_cache import ProfileCache, default_cache
+
+
+def matches_module(inputs: Inputs, module: Modules) -> bool:
+    """Whether the mounting system of the data has the module's slope and azimuth."""
+    return inputs_orientation(inputs) == module_orientation(module)
 
 
 def solar_data_for_module(
@@ -11,14 +26,20 @@ def solar_data_for_module(
 ) -> SolarRadiationData:
     # Find the solar radiation data that matches the module's slope and azimuth
     for data in available_data:
-        if (
-            data.inputs.mounting_system.fixed.slope.value == module.slope.value
-            and data.inputs.mounting_system.fixed.azimuth.value == module.azimuth.value
-        ):
+        if matches_module(data.inputs, module):
             return data
     raise ValueError("No matching solar radiation data found")
 
 
+def dataset_for_module(module: Modules, datasets: list[MeteoDataset]) -> int:
+    """
+    Index of the dataset that matches the module's slope and azimuth.
+
+    To look up many modules, build an OrientationIndex of the datasets once.
+    """
+    return OrientationIndex(datasets).dataset_index(module)
+
+
 def compute_production_single_module(
     module: Modules, solar_data: list[TimeSeriesEntry], performance_ratio: float
 ):
@@ -32,6 +53,51 @@ def compute_production_single_module(
     return energy_kWh
 
 
+def compute_production_from_irradiance(
+    system: PVSystem,
+    irradiance_per_module: list[np.ndarray],
+    num_time_steps: int,
+    time_step_hours: float = 1.0,
+) -> np.ndarray:
+    """
+    Compute the total energy production of a PV system in kWh per time step.
+
+    Args:
+        system:
+            The PV system.
+        irradiance_per_module:
+            For each module of the system, the global irradiance G(i) on its
+            plane in W/m2 per time step.
+        num_time_steps:
+            Length of the irradiance arrays.
+        time_step_hours:
+            Duration of a time step in hours, e.g. 0.25 for 15-minute data.
+
+    Returns:
+        The production in kWh per time step of all modules summed up and
+        limited to the maximum power of the system.
+    """
+    total_production = np.zeros(num_time_steps, dtype=np.float64)
+    for module, irradiance in zip(system.modules, irradiance_per_module):
+        total_production += (
+            module.kWP
+            * irradiance
+            * module.n
+            * system.performance_ratio
+            / 1000
+            * time_step_hours
+        )
+
+    # Limit the total production to the maximum power of the PV system
+    if system.maximum_power_kW is not None:
+        np.minimum(
+            total_production,
+            system.maximum_power_kW * time_step_hours,
+            out=total_production,
+        )
+    return total_production
+
+
 def compute_production(system: PVSystem, all_solar_data: list[SolarRadiationData]):
     """
     Compute the total energy production of a PV system using the given solar radiation data.
@@ -41,31 +107,229 @@ def compute_production(system: PVSystem, all_solar_data: list[SolarRadiationData
     for data in all_solar_data[1:]:
         hourly_data = data.outputs.hourly
         assert len(hourly_data) == len(times), "Length of solar data sets do not match"
-        assert hourly_data[0].time == times[0], "Times of solar data sets do not match"
-        assert (
-            hourly_data[-1].time == times[-1]
-        ), "Times of solar data sets do not match"
+        if times:
+            assert hourly_data[0].time == times[0], (
+                "Times of solar data sets do not match"
+            )
+            assert hourly_data[-1].time == times[-1], (
+                "Times of solar data sets do not match"
+            )
 
-    production_per_module = []
-    for i, module in enumerate(system.modules):
+    irradiance_per_module = []
+    for module in system.modules:
         # Find the solar radiation data that matches the module's slope and azimuth
         solar_data = solar_data_for_module(module, all_solar_data)
-
-        production = compute_production_single_module(
-            module, solar_data.outputs.hourly, system.performance_ratio
+        irradiance_per_module.append(
+            np.array([entry.G_i for entry in solar_data.outputs.hourly])
         )
-        production_per_module.append(production)
 
-    # Sum the energy production of all modules for each time step
-    total_production: list[float] = [
-        sum(production[i] for production in production_per_module)
-        for i in range(len(times))
+    total_production = compute_production_from_irradiance(
+        system, irradiance_per_module, num_time_steps=len(times)
+    )
+    return times, total_production.tolist()
+
+
+def check_same_times(datasets: list[MeteoDataset]) -> np.ndarray:
+    """Assert that all datasets have the same time axis and return it."""
+    times = datasets[0].columns.time
+    for dataset in datasets[1:]:
+        assert np.array_equal(
+            dataset.columns.time, times
+        ), "Times of solar data sets do not match"
+    return times
+
+
+def compute_production_array(
+    system: PVSystem,
+    datasets: list[MeteoDataset],
+    interpolate: bool = False,
+    index: OrientationIndex | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the total energy production of a PV system from columnar meteo data.
+
+    Gives the same numbers as compute_production, but works on the G(i)
+    columns directly instead of on TimeSeriesEntry objects. The production
+    per time step is scaled by the step_hours of the time axis of the data.
+
+    Args:
+        system:
+            The PV system.
+        datasets:
+            The meteo data of the available orientations.
+        interpolate:
+            If True, the irradiance of modules without a dataset of their
+            orientation is interpolated, see OrientationIndex.irradiance.
+            Otherwise, such modules raise a ValueError.
+        index:
+            The OrientationIndex of the datasets. Built from the datasets if
+            not given, pass it to reuse it between calls.
+
+    Returns:
+        The times as datetime64 array and the production in kWh per time step.
+    """
+    times = check_same_times(datasets)
+    if index is None:
+        index = OrientationIndex(datasets)
+    irradiance_per_module = [
+        index.module_irradiance(module, interpolate) for module in system.modules
     ]
+    return times, compute_production_from_irradiance(
+        system,
+        irradiance_per_module,
+        num_time_steps=len(times),
+        time_step_hours=datasets[0].columns.axis.step_hours,
+    )
 
-    # Limit the total production to the maximum power of the PV system
-    if system.maximum_power_kW is not None:
-        total_production = [
-            min(production, system.maximum_power_kW) for production in total_production
+
+def production_weights(
+    systems: list[PVSystem],
+    datasets: list[MeteoDataset],
+    interpolate: bool = False,
+    index: OrientationIndex | None = None,
+) -> np.ndarray:
+    """
+    Weights of the irradiance of each dataset in the production of each system.
+
+    Args:
+        interpolate:
+            If True, modules without a dataset of their orientation get the
+            interpolation weights of OrientationIndex.interpolation_weights.
+        index:
+            The OrientationIndex of the datasets, see compute_production_array.
+
+    Returns:
+        Array of shape (len(systems), len(datasets)). Multiplied with the G(i)
+        in W/m2 of the datasets, it gives the production in kWh per hour.
+    """
+    if index is None:
+        index = OrientationIndex(datasets)
+    weights = np.zeros((len(systems), len(datasets)), dtype=np.float64)
+    for i, system in enumerate(systems):
+        for module in system.modules:
+            scale = module.kWP * module.n * system.performance_ratio / 1000
+            weights[i] += scale * index.module_weights(module, interpolate)
+    return weights
+
+
+def compute_production_batch(
+    systems: list[PVSystem],
+    datasets: list[MeteoDataset],
+    interpolate: bool = False,
+    index: OrientationIndex | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the production of many PV systems against the same meteo data.
+
+    The modules of all systems are reduced to one weight per dataset, so the
+    production of all systems is a single matrix product with the stacked
+    G(i) columns, followed by the clipping to the maximum power. Because the
+    modules of one orientation are summed before multiplying with G(i), the
+    results can differ from compute_production_array in the last digits.
+
+    With interpolate, modules of orientations without a dataset are supported
+    as in compute_production_array. Since the interpolation is a weighted sum
+    of the available G(i), they only change the weights, so scanning many
+    orientations costs no more than scanning many systems.
+
+    Pass the OrientationIndex of the datasets as index to reuse it when
+    computing the production of several batches against the same datasets.
+    As in compute_production_array, the production is scaled by the
+    step_hours of the time axis of the data.
+
+    Returns:
+        The times as datetime64 array and the production in kWh per time step
+        as array of shape (len(systems), number of time steps).
+    """
+    times = check_same_times(datasets)
+    time_step_hours = datasets[0].columns.axis.step_hours
+    weights = production_weights(systems, datasets, interpolate, index)
+    # Only stack the irradiance of datasets that are used by any system.
+    used = np.flatnonzero(np.any(weights != 0, axis=0))
+    if len(used) == 0:
+        return times, np.zeros((len(systems), len(times)), dtype=np.float64)
+    irradiance = np.stack([datasets[j].columns.G_i for j in used])
+    production = (weights[:, used] * time_step_hours) @ irradiance
+
+    maximum_power_kW = np.array(
+        [
+            np.inf if system.maximum_power_kW is None else system.maximum_power_kW
+            for system in systems
         ]
+    )
+    np.minimum(
+        production,
+        maximum_power_kW[:, np.newaxis] * time_step_hours,
+        out=production,
+    )
+    return times, production
+
+
+def unit_production(
+    dataset: MeteoDataset,
+    time_step_hours: float | None = None,
+    cache: ProfileCache | None = None,
+) -> np.ndarray:
+    """
+    Production in kWh per time step of 1 kWp at a performance ratio of 1.
+
+    The array is computed once per dataset and time step and cached in the
+    given cache, by default in profile_cache.default_cache. It must not be
+    modified. The time step defaults to the step_hours of the dataset.
+    """
+    if time_step_hours is None:
+        time_step_hours = dataset.columns.axis.step_hours
+    cache = default_cache if cache is None else cache
+    return cache.get_or_compute(
+        [dataset.columns],
+        ("unit_production", time_step_hours),
+        lambda: dataset.columns.G_i / 1000 * time_step_hours,
+    )
+
+
+def compute_production_cached(
+    system: PVSystem,
+    datasets: list[MeteoDataset],
+    time_step_hours: float | None = None,
+    cache: ProfileCache | None = None,
+    interpolate: bool = False,
+    index: OrientationIndex | None = None,
+) -> np.ndarray:
+    """
+    Compute the production of a PV system from the cached unit productions.
+
+    The modules of each orientation are reduced to their peak power times
+    the performance ratio, which scales the cached unit_production of the
+    orientation. Like compute_production_batch, the results can differ from
+    compute_production_array in the last digits. With interpolate, modules of
+    orientations without a dataset are supported as in compute_production_batch,
+    and index is the OrientationIndex of the datasets as there. The time step
+    defaults to the step_hours of the datasets.
+
+    Returns:
+        The production in kWh per time step.
+    """
+    times = check_same_times(datasets)
+    if time_step_hours is None:
+        time_step_hours = datasets[0].columns.axis.step_hours
+    if index is None:
+        index = OrientationIndex(datasets)
+    scale_per_dataset = np.zeros(len(datasets), dtype=np.float64)
+    for module in system.modules:
+        scale_per_dataset += (
+            module.kWP
+            * module.n
+            * system.performance_ratio
+            * index.module_weights(module, interpolate)
+        )
 
-    return times, total_production
+    production = np.zeros(len(times), dtype=np.float64)
+    for i in np.flatnonzero(scale_per_dataset):
+        production += scale_per_dataset[i] * unit_production(
+            datasets[i], time_step_hours, cache
+        )
+    if system.maximum_power_kW is not None:
+        np.minimum(
+            production, system.maximum_power_kW * time_step_hours, out=production
+        )
+    return production
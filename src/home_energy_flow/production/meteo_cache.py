@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from home_energy_flow.production.meteo_columns import (
+    VALUE_COLUMNS,
+    MeteoColumns,
+    MeteoDataset,
+)
+from home_energy_flow.production.meteo_datamodels import Inputs
+
+# Increase this whenever the on-disk layout changes to invalidate old caches.
+CACHE_FORMAT_VERSION = 1
+
+CACHE_DIR_ENV_VARIABLE = "HOME_ENERGY_FLOW_CACHE_DIR"
+
+
+def default_cache_dir() -> Path:
+    """Directory of the meteo cache, can be overwritten by an environment variable."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV_VARIABLE)
+    if cache_dir:
+        return Path(cache_dir)
+    return Path.home() / ".cache" / "home_energy_flow" / "meteo"
+
+
+def source_key(file_path: Path) -> dict:
+    """The key identifying the content of a source file: its path, mtime and size."""
+    stat = file_path.stat()
+    return {
+        "format_version": CACHE_FORMAT_VERSION,
+        "path": str(file_path.resolve()),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def cache_entry_dir(file_path: Path, cache_dir: Path) -> Path:
+    """The directory holding the cached columns of a source file."""
+    path_hash = hashlib.sha256(str(file_path.resolve()).encode()).hexdigest()[:16]
+    return cache_dir / f"{file_path.stem}-{path_hash}"
+
+
+def read_cache(file_path: Path, cache_dir: Path) -> MeteoDataset | None:
+    """
+    Read the cached columns of a source file as read-only memory maps.
+
+    Returns:
+        The cached dataset or None if there is no cache entry or if the source
+        file changed since the cache entry was written.
+    """
+    entry_dir = cache_entry_dir(file_path, cache_dir)
+    try:
+        with open(entry_dir / "header.json", "r") as file:
+            header = json.load(file)
+        if header["key"] != source_key(file_path):
+            return None
+        arrays = {
+            name: np.load(entry_dir / f"{name}.npy", mmap_mode="r")
+            for name in ("time",) + VALUE_COLUMNS
+        }
+    except (OSError, ValueError, KeyError):
+        return None
+    return MeteoDataset(
+        inputs=Inputs.model_validate(header["inputs"]),
+        columns=MeteoColumns(**arrays),
+    )
+
+
+def write_cache(file_path: Path, cache_dir: Path, dataset: MeteoDataset) -> None:
+    """
+    Write the columns of a dataset to the cache entry of its source file.
+
+    The entry is first written to a temporary directory and then moved into
+    place, so concurrent readers never see a partially written entry.
+    """
+    entry_dir = cache_entry_dir(file_path, cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{entry_dir.name}-", dir=cache_dir))
+    try:
+        for name in ("time",) + VALUE_COLUMNS:
+            array = np.ascontiguousarray(getattr(dataset.columns, name))
+            np.save(tmp_dir / f"{name}.npy", array, allow_pickle=False)
+        # The header is written last, an entry without header is never read.
+        header = {
+            "key": source_key(file_path),
+            "inputs": dataset.inputs.model_dump(mode="json"),
+        }
+        with open(tmp_dir / "header.json", "w") as file:
+            json.dump(header, file)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
@@ -0,0 +1,219 @@
+import math
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+from home_energy_flow.production import meteo_load, meteo_stream
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.orientation_index import (
+    module_orientation,
+    normalize_orientation,
+)
+from home_energy_flow.production.pv_system import PVSystem
+
+DEFAULT_DATA_DIR = Path("meteo_data_source")
+
+# Name of the hourly data files downloaded from PVGIS, e.g.
+# Timeseries_47.754_8.939_SA3_90deg_-90deg_2020_2023.json
+PVGIS_FILE_NAME = re.compile(
+    r"Timeseries_(?P<latitude>-?[\d.]+)_(?P<longitude>-?[\d.]+)_\w+?"
+    r"_(?P<slope>-?[\d.]+)deg_(?P<azimuth>-?[\d.]+)deg"
+    r"_(?P<year_min>\d{4})_(?P<year_max>\d{4})\.json"
+)
+
+# Files whose locations differ by less than this many degrees of latitude
+# and longitude belong to the same site. PVGIS snaps the requested location
+# to its grid, so the files of one site differ in the third decimal.
+SAME_SITE_DEGREES = 0.01
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    """Location, orientation and years of one PVGIS file, without its data."""
+
+    path: Path
+    latitude: float
+    longitude: float
+    slope: float
+    azimuth: float
+    year_min: int
+    year_max: int
+
+    @property
+    def orientation(self) -> tuple[float, float]:
+        return normalize_orientation(self.slope, self.azimuth)
+
+    def covers(self, year: int | None) -> bool:
+        """Whether the file has data of the year, any file covers None."""
+        return year is None or self.year_min <= year <= self.year_max
+
+    def distance(self, latitude: float, longitude: float) -> float:
+        """Distance to a location in degrees, good enough to compare sites."""
+        return math.hypot(self.latitude - latitude, self.longitude - longitude)
+
+
+def read_catalog_entry(file_path: Path) -> CatalogEntry:
+    """Index a PVGIS file by its name, or by its header if it was renamed."""
+    match = PVGIS_FILE_NAME.fullmatch(file_path.name)
+    if match:
+        return CatalogEntry(
+            path=file_path,
+            latitude=float(match["latitude"]),
+            longitude=float(match["longitude"]),
+            slope=float(match["slope"]),
+            azimuth=float(match["azimuth"]),
+            year_min=int(match["year_min"]),
+            year_max=int(match["year_max"]),
+        )
+    inputs = meteo_stream.read_inputs(file_path)
+    return CatalogEntry(
+        path=file_path,
+        latitude=inputs.location.latitude,
+        longitude=inputs.location.longitude,
+        slope=inputs.mounting_system.fixed.slope.value,
+        azimuth=inputs.mounting_system.fixed.azimuth.value,
+        year_min=inputs.meteo_data.year_min,
+        year_max=inputs.meteo_data.year_max,
+    )
+
+
+class MeteoCatalog:
+    """
+    Index of the PVGIS files of a data directory.
+
+    The catalog only reads file names, or the headers of files that were
+    renamed, so it is cheap to build. Loading a PV system then reads only
+    the files of the system's orientations and keeps only the requested year.
+    """
+
+    def __init__(self, entries: Sequence[CatalogEntry]) -> None:
+        self.entries = list(entries)
+        self._by_orientation: dict[tuple[float, float], list[CatalogEntry]] = {}
+        for entry in self.entries:
+            self._by_orientation.setdefault(entry.orientation, []).append(entry)
+
+    @classmethod
+    def scan(
+        cls, data_dir: Path = DEFAULT_DATA_DIR, pattern: str = "*.json"
+    ) -> "MeteoCatalog":
+        """Index all files of the data directory matching the glob pattern."""
+        return cls(
+            [read_catalog_entry(path) for path in sorted(data_dir.glob(pattern))]
+        )
+
+    def find(
+        self,
+        slope: float,
+        azimuth: float,
+        year: int | None = None,
+        location: tuple[float, float] | None = None,
+    ) -> CatalogEntry | None:
+        """
+        The file with the orientation and data of the year.
+
+        Args:
+            slope, azimuth:
+                Orientation in degree.
+            year:
+                Year the file must cover, any year if None.
+            location:
+                Latitude and longitude, the file of the nearest site is used.
+                Only needed if the catalog has files of several sites.
+
+        Returns:
+            The entry of the file, None if there is none.
+        """
+        candidates = [
+            entry
+            for entry in self._by_orientation.get(
+                normalize_orientation(slope, azimuth), []
+            )
+            if entry.covers(year)
+        ]
+        if not candidates:
+            return None
+        if location is None:
+            first = candidates[0]
+            if any(
+                entry.distance(first.latitude, first.longitude) > SAME_SITE_DEGREES
+                for entry in candidates
+            ):
+                raise ValueError(
+                    "The data directory has files of several sites, "
+                    "pass the location to choose one"
+                )
+            return first
+        return min(candidates, key=lambda entry: entry.distance(*location))
+
+    def entries_for_system(
+        self,
+        pv_system: PVSystem,
+        year: int | None = None,
+        location: tuple[float, float] | None = None,
+        interpolate: bool = False,
+    ) -> list[CatalogEntry]:
+        """
+        The files needed to simulate the PV system, each once.
+
+        Args:
+            interpolate:
+                If True, orientations without a file are allowed. All files of
+                the site are then needed, to interpolate between them, see
+                OrientationIndex.irradiance. Otherwise, such orientations
+                raise a ValueError.
+        """
+        entries: dict[Path, CatalogEntry] = {}
+        for module in pv_system.modules:
+            entry = self.find(*module_orientation(module), year, location)
+            if entry is not None:
+                entries.setdefault(entry.path, entry)
+            elif interpolate:
+                for slope, azimuth in self._by_orientation:
+                    neighbour = self.find(slope, azimuth, year, location)
+                    if neighbour is not None:
+                        entries.setdefault(neighbour.path, neighbour)
+            else:
+                raise ValueError(
+                    f"No solar radiation data found for slope {module.slope.value},"
+                    f" azimuth {module.azimuth.value} and year {year}"
+                )
+        return list(entries.values())
+
+    def load(
+        self,
+        pv_system: PVSystem,
+        year: int | None = None,
+        location: tuple[float, float] | None = None,
+        interpolate: bool = False,
+        cache_dir: Path | None = None,
+        trusted: bool = False,
+    ) -> list[MeteoDataset]:
+        """
+        Load the meteo data of the orientations of the PV system.
+
+        The files are loaded with meteo_load.load_meteo_dataset, so after the
+        first load only the memory-mapped pages of the year are read.
+
+        Args:
+            pv_system:
+                Only the files of the orientations of its modules are loaded.
+            year:
+                The datasets are restricted to this year, if not None.
+            location, interpolate:
+                See entries_for_system.
+            cache_dir, trusted:
+                See meteo_load.load_meteo_dataset.
+
+        Returns:
+            One dataset per needed file, in the order of the modules.
+        """
+        datasets = [
+            meteo_load.load_meteo_dataset(
+                entry.path, cache_dir=cache_dir, trusted=trusted
+            )
+            for entry in self.entries_for_system(pv_system, year, location, interpolate)
+        ]
+        if year is None:
+            return datasets
+        return [dataset.select_year(year) for dataset in datasets]
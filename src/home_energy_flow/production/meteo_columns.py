@@ -0,0 +1,235 @@
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from typing import overload
+
+import numpy as np
+
+from home_energy_flow.production.meteo_datamodels import (
+    Inputs,
+    Outputs,
+    SolarRadiationData,
+    Time,
+    TimeSeriesEntry,
+)
+from home_energy_flow.production.time_axis import TimeAxis, combine_time
+
+# Names of the float columns of the PVGIS hourly data, in the order of the
+# TimeSeriesEntry fields. The time column is stored separately as datetime64.
+VALUE_COLUMNS = ("G_i", "H_sun", "T2m", "WS10m", "Int")
+
+
+@dataclass(frozen=True)
+class MeteoColumns:
+    """
+    Hourly meteo data of one PVGIS file stored as one typed array per column.
+
+    All arrays have the same length. The arrays may be read-only memory maps
+    of the on-disk cache, so they must not be modified in place.
+    """
+
+    time: np.ndarray  # datetime64[m]
+    G_i: np.ndarray  # W/m2, float64
+    H_sun: np.ndarray  # degree, float64
+    T2m: np.ndarray  # degree Celsius, float64
+    WS10m: np.ndarray  # m/s, float64
+    Int: np.ndarray  # float64
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @cached_property
+    def axis(self) -> TimeAxis:
+        """The calendar index of the times, computed once per columns."""
+        return TimeAxis(self.time)
+
+    def slice(self, index: slice) -> "MeteoColumns":
+        """Return a range of rows as views, sharing the computed calendar index."""
+        sliced = MeteoColumns(
+            time=self.time[index],
+            G_i=self.G_i[index],
+            H_sun=self.H_sun[index],
+            T2m=self.T2m[index],
+            WS10m=self.WS10m[index],
+            Int=self.Int[index],
+        )
+        # cached_property stores its value in the instance dict, which is
+        # writable even though the dataclass is frozen.
+        sliced.__dict__["axis"] = self.axis[index]
+        return sliced
+
+    def select_year(self, year: int) -> "MeteoColumns":
+        """Return the rows of the given calendar year as views."""
+        return self.slice(self.axis.year_slice(year))
+
+    def to_time_series_entries(self) -> list[TimeSeriesEntry]:
+        """Build the pydantic TimeSeriesEntry objects for all rows."""
+        axis = self.axis
+        return [
+            TimeSeriesEntry.model_construct(
+                time=Time.model_construct(year=year, month=month, day=day, hour=hour),
+                G_i=g_i,
+                H_sun=h_sun,
+                T2m=t2m,
+                WS10m=ws10m,
+                Int=int_,
+            )
+            for year, month, day, hour, g_i, h_sun, t2m, ws10m, int_ in zip(
+                axis.year.tolist(),
+                axis.month.tolist(),
+                axis.day.tolist(),
+                axis.hour.tolist(),
+                self.G_i.tolist(),
+                self.H_sun.tolist(),
+                self.T2m.tolist(),
+                self.WS10m.tolist(),
+                self.Int.tolist(),
+            )
+        ]
+
+
+@dataclass(frozen=True)
+class MeteoDataset:
+    """The header of a PVGIS file together with its hourly data as columns."""
+
+    inputs: Inputs
+    columns: MeteoColumns
+
+    def select_year(self, year: int) -> "MeteoDataset":
+        """Return the dataset restricted to the given calendar year."""
+        return MeteoDataset(inputs=self.inputs, columns=self.columns.select_year(year))
+
+    def to_solar_radiation_data(self, lazy: bool = False) -> SolarRadiationData:
+        """
+        Convert the dataset into the pydantic SolarRadiationData model.
+
+        The values were already checked when the columns were built, so the
+        models are constructed without validating them again.
+
+        Args:
+            lazy:
+                If True, the hourly entries are a LazyTimeSeriesEntries, which
+                builds each TimeSeriesEntry only when it is accessed.
+        """
+        hourly: Sequence[TimeSeriesEntry]
+        if lazy:
+            hourly = LazyTimeSeriesEntries(self.columns)
+        else:
+            hourly = self.columns.to_time_series_entries()
+        return SolarRadiationData.model_construct(
+            inputs=self.inputs,
+            outputs=Outputs.model_construct(hourly=hourly),
+        )
+
+
+class LazyTimeSeriesEntries(Sequence[TimeSeriesEntry]):
+    """
+    Read-only sequence of the TimeSeriesEntry objects of columns.
+
+    The entries are built when they are accessed and not kept, so the columns
+    stay the only copy of the data.
+    """
+
+    # Number of entries built at once while iterating.
+    ITER_CHUNK_SIZE = 4096
+
+    def __init__(self, columns: MeteoColumns) -> None:
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    @overload
+    def __getitem__(self, index: int) -> TimeSeriesEntry: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[TimeSeriesEntry]: ...
+
+    def __getitem__(
+        self, index: int | slice
+    ) -> TimeSeriesEntry | list[TimeSeriesEntry]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("time series entry index out of range")
+        columns = self.columns
+        return TimeSeriesEntry.model_construct(
+            time=columns.axis.time_at(index),
+            G_i=float(columns.G_i[index]),
+            H_sun=float(columns.H_sun[index]),
+            T2m=float(columns.T2m[index]),
+            WS10m=float(columns.WS10m[index]),
+            Int=float(columns.Int[index]),
+        )
+
+    def __iter__(self) -> Iterator[TimeSeriesEntry]:
+        for start in range(0, len(self), self.ITER_CHUNK_SIZE):
+            chunk = self.columns.slice(slice(start, start + self.ITER_CHUNK_SIZE))
+            yield from chunk.to_time_series_entries()
+
+
+def parse_time_strings(time_strings: Sequence[str] | np.ndarray) -> np.ndarray:
+    """
+    Parse PVGIS time strings in the format 'YYYYMMDD:HHMM' into datetime64[m].
+
+    Args:
+        time_strings:
+            Time strings as found in the 'time' field of the hourly data, or
+            an array of them of dtype bytes (S13) or str (U13).
+
+    Returns:
+        Array of dtype datetime64[m] with one entry per time string.
+    """
+    strings = np.asarray(time_strings)
+    if strings.dtype.kind == "S":
+        strings, char_type = strings.astype("S13", copy=False), "u1"
+    else:
+        strings, char_type = strings.astype("U13", copy=False), "u4"
+    if strings.size == 0:
+        return np.empty(0, dtype="datetime64[m]")
+    # View each string as its 13 characters and convert them to digits.
+    digits = strings.view(char_type).reshape(-1, 13).astype(np.int32)
+    digits -= ord("0")
+    is_digit = (digits >= 0) & (digits <= 9)
+    is_valid = (
+        np.all(is_digit[:, :8], axis=1)
+        & (digits[:, 8] == ord(":") - ord("0"))
+        & np.all(is_digit[:, 9:], axis=1)
+    )
+    if not np.all(is_valid):
+        raise ValueError(f"Invalid time format: {strings[~is_valid][0]}")
+
+    def number(start: int, stop: int) -> np.ndarray:
+        value = np.zeros(len(strings), dtype=np.int64)
+        for i in range(start, stop):
+            value = value * 10 + digits[:, i]
+        return value
+
+    return combine_time(
+        years=number(0, 4),
+        months=number(4, 6),
+        days=number(6, 8),
+        hours=number(9, 11),
+        minutes=number(11, 13),
+    )
+
+
+def columns_from_hourly_data(hourly_data: list[dict]) -> MeteoColumns:
+    """
+    Convert the raw 'hourly' list of a PVGIS JSON file into typed columns.
+
+    Args:
+        hourly_data:
+            List of dicts with the keys 'time', 'G(i)', 'H_sun', 'T2m', 'WS10m'
+            and 'Int', as found in the PVGIS JSON files.
+    """
+    return MeteoColumns(
+        time=parse_time_strings([entry["time"] for entry in hourly_data]),
+        G_i=np.array([entry["G(i)"] for entry in hourly_data], dtype=np.float64),
+        H_sun=np.array([entry["H_sun"] for entry in hourly_data], dtype=np.float64),
+        T2m=np.array([entry["T2m"] for entry in hourly_data], dtype=np.float64),
+        WS10m=np.array([entry["WS10m"] for entry in hourly_data], dtype=np.float64),
+        Int=np.array([entry["Int"] for entry in hourly_data], dtype=np.float64),
+    )
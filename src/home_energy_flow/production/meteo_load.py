@@ -1,7 +1,26 @@
 # Define paths to your JSON files
 import json
 from pathlib import Path
-from home_energy_flow.production.meteo_datamodels import SolarRadiationData, Time
+
+from home_energy_flow.instrumentation import stage
+from home_energy_flow.production import meteo_cache, meteo_stream
+from home_energy_flow.production.meteo_columns import (
+    MeteoDataset,
+    columns_from_hourly_data,
+)
+from home_energy_flow.production.meteo_datamodels import (
+    Inputs,
+    SolarRadiationData,
+    Time,
+)
+
+METEO_FILES = [
+    Path("meteo_data_source/Timeseries_47.754_8.939_SA3_90deg_-90deg_2020_2023.json"),
+    Path("meteo_data_source/Timeseries_47.754_8.939_SA3_90deg_90deg_2020_2023.json"),
+    Path("meteo_data_source/Timeseries_47.753_8.939_SA3_45deg_-90deg_2020_2023.json"),
+    Path("meteo_data_source/Timeseries_47.753_8.939_SA3_45deg_90deg_2020_2023.json"),
+    Path("meteo_data_source/Timeseries_47.755_8.938_SA3_30deg_0deg_2020_2023.json"),
+]
 
 
 def preprocess_hourly_data(hourly_data: list) -> list:
@@ -14,36 +33,122 @@ def preprocess_hourly_data(hourly_data: list) -> list:
     return preprocessed_data
 
 
-def load_solar_radiation_data(file_path: Path) -> SolarRadiationData:
+def load_solar_radiation_data(
+    file_path: Path, trusted: bool = False
+) -> SolarRadiationData:
+    """
+    Load a PVGIS JSON file into the pydantic SolarRadiationData model.
+
+    Args:
+        file_path:
+            Path to the PVGIS JSON file.
+        trusted:
+            If True, the file is loaded with the streaming parser of
+            parse_meteo_dataset, which validates only the header and the
+            schema of the first hourly entry. The hourly entries are then
+            built lazily when they are accessed.
+    """
+    if trusted:
+        dataset = parse_meteo_dataset(file_path, trusted=True)
+        return dataset.to_solar_radiation_data(lazy=True)
+
     # Read the JSON data from the file
-    with open(file_path, "r") as file:
+    with stage("parse_json"), open(file_path, "r") as file:
         data = json.load(file)
 
-    # Preprocess the 'hourly' data to handle the 'time' conversion
-    data["outputs"]["hourly"] = preprocess_hourly_data(data["outputs"]["hourly"])
+    with stage("validate", rows=len(data["outputs"]["hourly"])):
+        # Preprocess the 'hourly' data to handle the 'time' conversion
+        data["outputs"]["hourly"] = preprocess_hourly_data(data["outputs"]["hourly"])
 
-    # Convert the data into a SolarRadiationData instance using Pydantic
-    return SolarRadiationData(**data)
+        # Convert the data into a SolarRadiationData instance using Pydantic
+        return SolarRadiationData(**data)
 
 
-def get_meteo_data_per_orientation() -> list[SolarRadiationData]:
-    json_files = [
-        Path(
-            "meteo_data_source/Timeseries_47.754_8.939_SA3_90deg_-90deg_2020_2023.json"
-        ),
-        Path(
-            "meteo_data_source/Timeseries_47.754_8.939_SA3_90deg_90deg_2020_2023.json"
-        ),
-        Path(
-            "meteo_data_source/Timeseries_47.753_8.939_SA3_45deg_-90deg_2020_2023.json"
-        ),
-        Path(
-            "meteo_data_source/Timeseries_47.753_8.939_SA3_45deg_90deg_2020_2023.json"
-        ),
-        Path(
-            "meteo_data_source/Timeseries_47.755_8.938_SA3_30deg_0deg_2020_2023.json"
-        ),
+def parse_meteo_dataset(file_path: Path, trusted: bool = False) -> MeteoDataset:
+    """
+    Parse a PVGIS JSON file into its header and typed hourly columns.
+
+    Args:
+        file_path:
+            Path to the PVGIS JSON file.
+        trusted:
+            If True, the file is decoded with meteo_stream.stream_meteo_dataset,
+            which checks only the header and the schema of the first hourly
+            entry, but needs a fraction of the memory of json.load.
+    """
+    if trusted:
+        with stage("stream_json"):
+            return meteo_stream.stream_meteo_dataset(file_path)
+    with stage("parse_json"), open(file_path, "r") as file:
+        data = json.load(file)
+    with stage("build_columns", rows=len(data["outputs"]["hourly"])):
+        return MeteoDataset(
+            inputs=Inputs.model_validate(data["inputs"]),
+            columns=columns_from_hourly_data(data["outputs"]["hourly"]),
+        )
+
+
+def load_meteo_dataset(
+    file_path: Path,
+    cache_dir: Path | None = None,
+    use_cache: bool = True,
+    trusted: bool = False,
+) -> MeteoDataset:
+    """
+    Load a PVGIS JSON file as typed columns, using the on-disk cache.
+
+    The first load parses the JSON file and writes its columns to the cache.
+    Later loads memory-map the cached columns, until the path, modification
+    time or size of the JSON file changes.
+
+    Args:
+        file_path:
+            Path to the PVGIS JSON file.
+        cache_dir:
+            Directory of the cache. Defaults to meteo_cache.default_cache_dir().
+        use_cache:
+            If False, the JSON file is parsed and the cache is neither read
+            nor written.
+        trusted:
+            Parse the JSON file with the streaming parser, see
+            parse_meteo_dataset.
+    """
+    if not use_cache:
+        return parse_meteo_dataset(file_path, trusted=trusted)
+    if cache_dir is None:
+        cache_dir = meteo_cache.default_cache_dir()
+    with stage("read_cache"):
+        dataset = meteo_cache.read_cache(file_path, cache_dir)
+    if dataset is None:
+        dataset = parse_meteo_dataset(file_path, trusted=trusted)
+        try:
+            with stage("write_cache"):
+                meteo_cache.write_cache(file_path, cache_dir, dataset)
+        except OSError:
+            # A read-only or full cache directory must not prevent loading.
+            pass
+    return dataset
+
+
+def get_meteo_datasets_per_orientation(
+    cache_dir: Path | None = None,
+) -> list[MeteoDataset]:
+    return [load_meteo_dataset(file, cache_dir=cache_dir) for file in METEO_FILES]
+
+
+def get_meteo_datasets_for_year(
+    year: int, cache_dir: Path | None = None
+) -> list[MeteoDataset]:
+    """Load the meteo data of all orientations, restricted to one year."""
+    return [
+        dataset.select_year(year)
+        for dataset in get_meteo_datasets_per_orientation(cache_dir=cache_dir)
     ]
 
-    # Load the solar radiation data from both files
-    return [load_solar_radiation_data(file) for file in json_files]
+
+def get_meteo_data_per_orientation() -> list[SolarRadiationData]:
+    # Load the solar radiation data from the cached columns of all files
+    return [
+        dataset.to_solar_radiation_data()
+        for dataset in get_meteo_datasets_per_orientation()
+    ]
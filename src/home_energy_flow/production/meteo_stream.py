@@ -0,0 +1,252 @@
+import json
+import re
+from array import array
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+
+from home_energy_flow.production.meteo_columns import (
+    MeteoColumns,
+    MeteoDataset,
+    parse_time_strings,
+)
+from home_energy_flow.production.meteo_datamodels import Inputs
+
+# Number of characters read from the file at once.
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+# Keys of the entries of the 'hourly' array and the MeteoColumns field of each.
+HOURLY_COLUMNS = {
+    "time": "time",
+    "G(i)": "G_i",
+    "H_sun": "H_sun",
+    "T2m": "T2m",
+    "WS10m": "WS10m",
+    "Int": "Int",
+}
+
+# Length of the PVGIS time strings, 'YYYYMMDD:HHMM'.
+TIME_STRING_LENGTH = 13
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class JsonStream:
+    """
+    Decodes a JSON document value by value while reading it block by block.
+
+    Only the text of the values that are not yet decoded is kept in memory,
+    so large arrays can be consumed element by element.
+    """
+
+    def __init__(self, file: IO[str], block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        self.file = file
+        self.block_size = block_size
+        self.buffer = ""
+        self.pos = 0
+        self.at_end = False
+
+    def _read_block(self) -> bool:
+        """Append the next block to the unread text, False at the end of the file."""
+        if self.at_end:
+            return False
+        # Read at least as much as is buffered, so that decoding a value
+        # larger than a block is retried only a logarithmic number of times.
+        block = self.file.read(max(self.block_size, len(self.buffer) - self.pos))
+        if not block:
+            self.at_end = True
+            return False
+        self.buffer = self.buffer[self.pos :] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, '' at the end of the file."""
+        while True:
+            match = _WHITESPACE.match(self.buffer, self.pos)
+            assert match is not None
+            self.pos = match.end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_block():
+                return ""
+
+    def expect(self, char: str) -> None:
+        """Consume the next character, which must be char."""
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON document")
+        self.pos += 1
+
+    def value(self) -> object:
+        """Decode the next complete value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._read_block():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next block.
+            if end == len(self.buffer) and self._read_block():
+                continue
+            self.pos = end
+            return value
+
+    def _separator(self, close: str) -> bool:
+        """Consume a ',' or the closing character, True if there are more items."""
+        char = self.peek()
+        self.pos += 1
+        if char == close:
+            return False
+        if char != ",":
+            raise ValueError(f"Expected ',' or {close!r} in JSON document")
+        return True
+
+    def object_keys(self) -> Iterator[str]:
+        """
+        Iterate over the keys of the next object.
+
+        For each key, the caller must consume its value, e.g. with value() or
+        object_keys(), before asking for the next key.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise TypeError("Expected a string as key in JSON document")
+            self.expect(":")
+            yield key
+            if not self._separator("}"):
+                return
+
+    def flat_array_batches(self) -> Iterator[list]:
+        """
+        Iterate over the elements of the next array in batches.
+
+        All elements that are complete in the buffer are decoded at once, which
+        is much faster than decoding them one by one. This requires that the
+        elements are objects without nested objects or arrays, and that their
+        strings contain no '}' or ']', like the hourly entries of PVGIS files.
+        """
+        self.expect("[")
+        while True:
+            if self.peek() == "]":
+                self.pos += 1
+                return
+            buffer = self.buffer
+            close = buffer.find("]", self.pos)
+            if close >= 0:
+                end = close
+            else:
+                # End after the last complete object in the buffer, if any.
+                end = buffer.rfind("}", self.pos) + 1
+                if end <= self.pos:
+                    if not self._read_block():
+                        raise ValueError("Unterminated array in JSON document")
+                    continue
+            yield json.loads("[" + buffer[self.pos : end] + "]")
+            self.pos = end
+            if close < 0 and not self._separator("]"):
+                return
+
+
+def _check_schema(entry: object) -> None:
+    if not isinstance(entry, dict) or set(entry) != set(HOURLY_COLUMNS):
+        raise ValueError(
+            f"Hourly entries must have the keys {list(HOURLY_COLUMNS)}, got {entry}"
+        )
+    for key, value in entry.items():
+        expected = str if key == "time" else (int, float)
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise TypeError(f"Invalid value of {key!r} in hourly entry: {value!r}")
+
+
+def read_hourly_columns(stream: JsonStream) -> MeteoColumns:
+    """
+    Decode the 'hourly' array of a PVGIS file into typed columns.
+
+    Only the first entry is checked against the expected keys and types, the
+    remaining entries are trusted to have the same schema. The entries are
+    decoded in batches of one block and their values appended to compact
+    arrays, so the decoded entries do not accumulate in memory.
+    """
+    time_bytes = bytearray()
+    values = {name: array("d") for name in HOURLY_COLUMNS if name != "time"}
+    count = 0
+    for batch in stream.flat_array_batches():
+        if count == 0 and batch:
+            _check_schema(batch[0])
+        time_bytes += "".join([entry["time"] for entry in batch]).encode("ascii")
+        for key, column in values.items():
+            column.extend([entry[key] for entry in batch])
+        count += len(batch)
+
+    if len(time_bytes) != count * TIME_STRING_LENGTH:
+        raise ValueError("Invalid time format in hourly entries")
+    columns = {
+        HOURLY_COLUMNS[key]: np.frombuffer(column, dtype=np.float64)
+        for key, column in values.items()
+    }
+    time_strings = np.frombuffer(time_bytes, dtype=f"S{TIME_STRING_LENGTH}")
+    return MeteoColumns(time=parse_time_strings(time_strings), **columns)
+
+
+def stream_meteo_dataset(
+    file_path: Path, block_size: int = DEFAULT_BLOCK_SIZE
+) -> MeteoDataset:
+    """
+    Load a trusted PVGIS JSON file into typed columns with a streaming parser.
+
+    The 'inputs' header is validated with pydantic, the hourly entries only
+    against the schema of the first entry. The file is read block by block
+    and the hourly values are stored as they are decoded, so the peak memory
+    stays close to the size of the resulting columns.
+
+    Args:
+        file_path:
+            Path to the PVGIS JSON file.
+        block_size:
+            Number of characters read from the file at once.
+    """
+    inputs = None
+    columns = None
+    with open(file_path, "r") as file:
+        stream = JsonStream(file, block_size)
+        for key in stream.object_keys():
+            if key == "inputs":
+                inputs = Inputs.model_validate(stream.value())
+            elif key == "outputs":
+                for output_key in stream.object_keys():
+                    if output_key == "hourly":
+                        columns = read_hourly_columns(stream)
+                    else:
+                        stream.value()
+            else:
+                stream.value()
+        if stream.peek() != "":
+            raise ValueError(f"Unexpected data after the JSON document in {file_path}")
+    if inputs is None or columns is None:
+        raise ValueError(f"{file_path} has no 'inputs' or no 'outputs.hourly'")
+    return MeteoDataset(inputs=inputs, columns=columns)
+
+
+def read_inputs(file_path: Path, block_size: int = DEFAULT_BLOCK_SIZE) -> Inputs:
+    """
+    Read only the 'inputs' header of a PVGIS JSON file.
+
+    PVGIS writes the header first, so only the start of the file is read.
+    """
+    with open(file_path, "r") as file:
+        stream = JsonStream(file, block_size)
+        for key in stream.object_keys():
+            if key == "inputs":
+                return Inputs.model_validate(stream.value())
+            stream.value()
+    raise ValueError(f"{file_path} has no 'inputs'")
@@ -0,0 +1,223 @@
+from collections.abc import Sequence
+from functools import cached_property
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.meteo_datamodels import Inputs
+from home_energy_flow.production.pv_system import Modules
+
+# Number of nearest orientations whose irradiance is interpolated.
+DEFAULT_NEIGHBOURS = 3
+
+# Exponent of the inverse distance weights of the interpolation.
+DEFAULT_POWER = 2.0
+
+# Planes whose normals differ by less than this angle in radians are treated
+# as having the same orientation.
+SAME_ORIENTATION_RADIANS = 1e-6
+
+
+def normalize_orientation(slope: float, azimuth: float) -> tuple[float, float]:
+    """
+    Canonical slope and azimuth in degree, equal for equal orientations.
+
+    The azimuth is wrapped into [-180, 180) and set to 0 for horizontal
+    planes, whose azimuth does not matter.
+    """
+    azimuth = (azimuth + 180.0) % 360.0 - 180.0
+    if slope == 0:
+        azimuth = 0.0
+    # Adding 0.0 turns -0.0 into 0.0
+    return (float(slope) + 0.0, float(azimuth) + 0.0)
+
+
+def inputs_orientation(inputs: Inputs) -> tuple[float, float]:
+    """Canonical slope and azimuth of the mounting system of a PVGIS file."""
+    fixed = inputs.mounting_system.fixed
+    return normalize_orientation(fixed.slope.value, fixed.azimuth.value)
+
+
+def module_orientation(module: Modules) -> tuple[float, float]:
+    """Canonical slope and azimuth of a module."""
+    return normalize_orientation(module.slope.value, module.azimuth.value)
+
+
+def plane_normals(slopes: ArrayLike, azimuths: ArrayLike) -> np.ndarray:
+    """
+    Unit normal vectors of planes.
+
+    Args:
+        slopes:
+            Inclinations from the horizontal plane in degree.
+        azimuths:
+            Orientations in degree, 0 = south, 90 = west, -90 = east.
+
+    Returns:
+        Array of shape (number of planes, 3).
+    """
+    slope = np.radians(np.asarray(slopes, dtype=np.float64))
+    azimuth = np.radians(np.asarray(azimuths, dtype=np.float64))
+    return np.stack(
+        [
+            np.sin(slope) * np.cos(azimuth),
+            np.sin(slope) * np.sin(azimuth),
+            np.cos(slope),
+        ],
+        axis=-1,
+    )
+
+
+class OrientationIndex:
+    """
+    Index of meteo datasets by the orientation of their mounting system.
+
+    Looking up the dataset of an orientation is a dictionary lookup. For
+    orientations without a dataset, the irradiance G(i) can be interpolated
+    between the nearest available orientations, for many orientations at
+    once. The index is meant to be built once per list of datasets.
+    """
+
+    def __init__(self, datasets: Sequence[MeteoDataset]) -> None:
+        self.datasets = list(datasets)
+        # Index of the first dataset of each orientation
+        self._index: dict[tuple[float, float], int] = {}
+        for i, dataset in enumerate(self.datasets):
+            self._index.setdefault(inputs_orientation(dataset.inputs), i)
+
+    def __len__(self) -> int:
+        """Number of distinct orientations."""
+        return len(self._index)
+
+    def find(self, slope: float, azimuth: float) -> int | None:
+        """Index of the dataset with the orientation, None if there is none."""
+        return self._index.get(normalize_orientation(slope, azimuth))
+
+    def dataset_index(self, module: Modules) -> int:
+        """Index of the dataset that matches the module's slope and azimuth."""
+        index = self._index.get(module_orientation(module))
+        if index is None:
+            raise ValueError("No matching solar radiation data found")
+        return index
+
+    @cached_property
+    def _normals(self) -> np.ndarray:
+        """The normals of the distinct orientations, in the order of _index."""
+        if not self._index:
+            raise ValueError("Cannot interpolate without solar radiation data")
+        slopes, azimuths = zip(*self._index)
+        return plane_normals(slopes, azimuths)
+
+    @cached_property
+    def _irradiance(self) -> np.ndarray:
+        """The G(i) of the distinct orientations, shape (orientations, time)."""
+        datasets = [self.datasets[i] for i in self._index.values()]
+        times = datasets[0].columns.time
+        for dataset in datasets[1:]:
+            if not np.array_equal(dataset.columns.time, times):
+                raise ValueError("Times of solar data sets do not match")
+        return np.stack([dataset.columns.G_i for dataset in datasets])
+
+    def interpolation_weights(
+        self,
+        slopes: ArrayLike,
+        azimuths: ArrayLike,
+        neighbours: int = DEFAULT_NEIGHBOURS,
+        power: float = DEFAULT_POWER,
+    ) -> np.ndarray:
+        """
+        Weights of the datasets in the interpolated irradiance of orientations.
+
+        Each orientation gets the weighted mean of the nearest available
+        orientations, weighted by the inverse angle between the plane normals
+        to the given power. Available orientations get the weight 1 for their
+        own dataset, so their irradiance is reproduced exactly.
+
+        Args:
+            slopes, azimuths:
+                Orientations in degree, as in plane_normals.
+            neighbours:
+                Number of nearest available orientations to interpolate.
+            power:
+                Exponent of the inverse distance weights.
+
+        Returns:
+            Array of shape (number of orientations, len(datasets)) whose rows
+            sum to 1. Datasets with a duplicate orientation get the weight 0.
+        """
+        if neighbours < 1:
+            raise ValueError("At least one neighbour is needed to interpolate")
+        normals = plane_normals(slopes, azimuths).reshape(-1, 3)
+        cosines = np.clip(normals @ self._normals.T, -1.0, 1.0)
+        angles = np.arccos(cosines)
+
+        is_same = angles < SAME_ORIENTATION_RADIANS
+        with np.errstate(divide="ignore"):
+            weights = np.where(is_same, np.inf, angles**-power)
+        if neighbours < len(self._index):
+            # Drop all but the nearest orientations of each row
+            farthest = np.argpartition(angles, neighbours, axis=1)[:, neighbours:]
+            np.put_along_axis(weights, farthest, 0.0, axis=1)
+        exact = np.any(is_same, axis=1)
+        weights[exact] = is_same[exact]
+        weights /= weights.sum(axis=1, keepdims=True)
+
+        per_dataset = np.zeros((len(normals), len(self.datasets)), dtype=np.float64)
+        per_dataset[:, list(self._index.values())] = weights
+        return per_dataset
+
+    def irradiance(
+        self,
+        slopes: ArrayLike,
+        azimuths: ArrayLike,
+        neighbours: int = DEFAULT_NEIGHBOURS,
+        power: float = DEFAULT_POWER,
+    ) -> np.ndarray:
+        """
+        The irradiance G(i) in W/m2 of arbitrary orientations.
+
+        The interpolation is exact for the available orientations and stays
+        between the irradiance of the neighbours. It therefore cannot
+        extrapolate, e.g. to north-facing planes if only data of east-, south-
+        and west-facing planes is available.
+
+        Returns:
+            Array of shape (number of orientations, number of time steps).
+        """
+        weights = self.interpolation_weights(slopes, azimuths, neighbours, power)
+        return weights[:, list(self._index.values())] @ self._irradiance
+
+    def module_weights(self, module: Modules, interpolate: bool = False) -> np.ndarray:
+        """
+        Weights of the datasets in the irradiance of a module.
+
+        Args:
+            module:
+                The module.
+            interpolate:
+                If True, the irradiance of a module without matching dataset
+                is interpolated, see interpolation_weights. Otherwise, such a
+                module raises a ValueError.
+        """
+        index = self._index.get(module_orientation(module))
+        if index is None:
+            if not interpolate:
+                raise ValueError("No matching solar radiation data found")
+            return self.interpolation_weights(
+                [module.slope.value], [module.azimuth.value]
+            )[0]
+        weights = np.zeros(len(self.datasets), dtype=np.float64)
+        weights[index] = 1.0
+        return weights
+
+    def module_irradiance(
+        self, module: Modules, interpolate: bool = False
+    ) -> np.ndarray:
+        """The G(i) of a module in W/m2, interpolated as in module_weights."""
+        index = self._index.get(module_orientation(module))
+        if index is not None:
+            return self.datasets[index].columns.G_i
+        if not interpolate:
+            raise ValueError("No matching solar radiation data found")
+        return self.irradiance([module.slope.value], [module.azimuth.value])[0]
@@ -0,0 +1,184 @@
+from functools import cached_property
+
+import numpy as np
+
+from home_energy_flow.production.meteo_datamodels import Time
+
+
+def combine_time(
+    years: np.ndarray,
+    months: np.ndarray,
+    days: np.ndarray,
+    hours: np.ndarray,
+    minutes: np.ndarray,
+) -> np.ndarray:
+    """Combine calendar fields into an array of dtype datetime64[m]."""
+    month_starts = (years - 1970) * 12 + (months - 1)
+    dates = month_starts.astype("datetime64[M]").astype("datetime64[D]") + (days - 1)
+    return (
+        dates.astype("datetime64[m]")
+        + hours.astype("timedelta64[h]")
+        + minutes.astype("timedelta64[m]")
+    )
+
+
+def split_time(
+    time: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Split an array of datetime64 into year, month, day and hour arrays."""
+    axis = TimeAxis(time)
+    return axis.year, axis.month, axis.day, axis.hour
+
+
+class TimeAxis:
+    """
+    Calendar index of a sorted array of datetime64 times.
+
+    The calendar fields are computed once, on first access, as int64 arrays.
+    Slicing an axis slices the already computed fields without copying, so
+    selecting a year or a day is a constant time view.
+    """
+
+    def __init__(self, time: np.ndarray) -> None:
+        self.time = time
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, index: slice) -> "TimeAxis":
+        """
+        The axis of a slice of the times, sharing the computed fields.
+
+        The slice keeps the step_hours of the whole axis, so that a slice with
+        fewer than 2 time steps still knows their duration.
+        """
+        sliced = TimeAxis(self.time[index])
+        sliced.__dict__["step_hours"] = self.step_hours
+        for name in _SLICEABLE_FIELDS:
+            if name in self.__dict__:
+                sliced.__dict__[name] = self.__dict__[name][index]
+        return sliced
+
+    @cached_property
+    def step_hours(self) -> float:
+        """Duration of the time steps in hours, estimated from the first ones."""
+        if len(self.time) < 2:
+            return 1.0
+        steps = np.diff(self.time[:1000].astype("datetime64[m]")).astype(np.int64)
+        return float(np.median(steps)) / 60
+
+    @cached_property
+    def day_index(self) -> np.ndarray:
+        """Days since 1970-01-01."""
+        return self.time.astype("datetime64[D]").astype(np.int64)
+
+    @cached_property
+    def month_index(self) -> np.ndarray:
+        """Months since 1970-01."""
+        return self.time.astype("datetime64[M]").astype(np.int64)
+
+    @cached_property
+    def week_index(self) -> np.ndarray:
+        """Weeks, starting on Monday, since 1969-12-29."""
+        # 1970-01-01 was a Thursday
+        return (self.day_index + 3) // 7
+
+    @cached_property
+    def year(self) -> np.ndarray:
+        return self.month_index // 12 + 1970
+
+    @cached_property
+    def month(self) -> np.ndarray:
+        """Month of the year, from 1 to 12."""
+        return self.month_index % 12 + 1
+
+    @cached_property
+    def day(self) -> np.ndarray:
+        """Day of the month, from 1 to 31."""
+        month_starts = self.month_index.astype("datetime64[M]").astype("datetime64[D]")
+        return self.day_index - month_starts.astype(np.int64) + 1
+
+    @cached_property
+    def hour(self) -> np.ndarray:
+        """Hour of the day, from 0 to 23."""
+        hours = self.time.astype("datetime64[h]").astype(np.int64)
+        return hours - self.day_index * 24
+
+    @cached_property
+    def day_of_year(self) -> np.ndarray:
+        """Day of the year, from 0 to 365."""
+        year_starts = (self.year - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+        return self.day_index - year_starts.astype(np.int64)
+
+    @cached_property
+    def _year_slices(self) -> dict[int, slice]:
+        years = self.year
+        if np.any(np.diff(self.time.astype("datetime64[m]").astype(np.int64)) < 0):
+            raise ValueError("The times of a TimeAxis must be sorted.")
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(years)) + 1])
+        stops = np.concatenate([starts[1:], [len(years)]])
+        return {
+            int(years[start]): slice(int(start), int(stop))
+            for start, stop in zip(starts.tolist(), stops.tolist())
+        }
+
+    def years(self) -> list[int]:
+        """The calendar years covered by the axis, in order."""
+        return list(self._year_slices) if len(self) > 0 else []
+
+    def year_slice(self, year: int) -> slice:
+        """The slice of the time steps of a calendar year, empty if not covered."""
+        if len(self) == 0:
+            return slice(0, 0)
+        return self._year_slices.get(year, slice(0, 0))
+
+    def day_slice(self, day: np.datetime64) -> slice:
+        """The slice of the time steps of a day."""
+        day_number = int(np.asarray(day, dtype="datetime64[D]").astype(np.int64))
+        start, stop = np.searchsorted(self.day_index, [day_number, day_number + 1])
+        return slice(int(start), int(stop))
+
+    def bucket_ids(self, bucket: str) -> np.ndarray:
+        """Ids of plot.flow_accumulator buckets: month, day, week or hour_of_day."""
+        if bucket == "month":
+            return self.month_index
+        if bucket == "day":
+            return self.day_index
+        if bucket == "week":
+            return self.week_index
+        if bucket == "hour_of_day":
+            return self.hour
+        raise ValueError(f"Unknown bucket '{bucket}'")
+
+    def time_at(self, index: int) -> Time:
+        """The pydantic Time of one time step."""
+        return Time.model_construct(
+            year=int(self.year[index]),
+            month=int(self.month[index]),
+            day=int(self.day[index]),
+            hour=int(self.hour[index]),
+        )
+
+    def to_times(self) -> list[Time]:
+        """The pydantic Time of all time steps."""
+        return [
+            Time.model_construct(year=year, month=month, day=day, hour=hour)
+            for year, month, day, hour in zip(
+                self.year.tolist(),
+                self.month.tolist(),
+                self.day.tolist(),
+                self.hour.tolist(),
+            )
+        ]
+
+
+_SLICEABLE_FIELDS = (
+    "day_index",
+    "month_index",
+    "week_index",
+    "year",
+    "month",
+    "day",
+    "hour",
+    "day_of_year",
+)
@@ -0,0 +1,120 @@
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from pydantic import BaseModel
+
+# Default bound of the memory used by the cached arrays.
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+
+def model_key(model: BaseModel) -> str:
+    """Hashable form of a pydantic model such as Modules, PVSystem or HeatPumpSystem."""
+    return model.model_dump_json()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class ProfileCache:
+    """
+    Least recently used cache of arrays derived from meteo data.
+
+    The entries are keyed by the identity of the objects they are derived
+    from, e.g. the MeteoColumns of a dataset, together with a hashable key of
+    the parameters, e.g. from model_key. The entries of an object are dropped
+    when the object is garbage collected. The least recently used entries are
+    evicted once the arrays take more than max_bytes or there are more than
+    max_entries entries.
+
+    The cached arrays are read-only, because they are shared by all callers.
+    """
+
+    def __init__(
+        self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int | None = None
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._entries: OrderedDict[tuple[tuple[int, ...], Hashable], np.ndarray] = (
+            OrderedDict()
+        )
+        self._nbytes = 0
+        self._tracked_owners: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the cached arrays."""
+        return self._nbytes
+
+    def get_or_compute(
+        self,
+        owners: Sequence[object],
+        key: Hashable,
+        compute: Callable[[], np.ndarray],
+    ) -> np.ndarray:
+        """
+        Return the cached array of the owners and key, computing it on a miss.
+
+        Args:
+            owners:
+                The objects the array is derived from. They must support weak
+                references and must not be modified while they are alive.
+            key:
+                Hashable form of all other inputs of compute.
+            compute:
+                Computes the array.
+        """
+        entry_key = (tuple(id(owner) for owner in owners), key)
+        array = self._entries.get(entry_key)
+        if array is not None:
+            self.stats.hits += 1
+            self._entries.move_to_end(entry_key)
+            return array
+
+        self.stats.misses += 1
+        array = compute()
+        array.flags.writeable = False
+        if array.nbytes > self.max_bytes:
+            return array
+        for owner in owners:
+            if id(owner) not in self._tracked_owners:
+                self._tracked_owners.add(id(owner))
+                weakref.finalize(owner, self._forget_owner, id(owner))
+        self._entries[entry_key] = array
+        self._nbytes += array.nbytes
+        self._evict()
+        return array
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self._nbytes > self.max_bytes
+            or (self.max_entries is not None and len(self._entries) > self.max_entries)
+        ):
+            _, array = self._entries.popitem(last=False)
+            self._nbytes -= array.nbytes
+            self.stats.evictions += 1
+
+    def _forget_owner(self, owner_id: int) -> None:
+        self._tracked_owners.discard(owner_id)
+        for entry_key in [key for key in self._entries if owner_id in key[0]]:
+            self._nbytes -= self._entries.pop(entry_key).nbytes
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        self._entries.clear()
+        self._nbytes = 0
+        self.stats = CacheStats()
+
+
+# The cache used by the production and consumption profiles by default.
+default_cache = ProfileCache()
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from home_energy_flow.kpis import MonthlyCosts, YearlyKPIs, monthly_costs
+from home_energy_flow.plot.datamodels import MonthlyData
+from home_energy_flow.prices import Tariff
+from home_energy_flow.storage.compute_storage import EnergyFlowData
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """The result of main.main for one year."""
+
+    year: int
+    # The times of the hourly values, as datetime64 array
+    time: np.ndarray
+    # Hourly production, consumption, buy, sell and self usage in kWh
+    energy_flow_data: EnergyFlowData
+    # Hourly parts of the consumption in kWh
+    regular_consumption: np.ndarray
+    heatpump_consumption: np.ndarray
+    monthly_datas: list[MonthlyData]
+    kpis: YearlyKPIs
+    # Costs and revenues per month under the tariff of the simulation
+    costs: MonthlyCosts
+
+    def costs_for(self, tariff: Tariff) -> MonthlyCosts:
+        """The costs per month under another tariff, without simulating again."""
+        return monthly_costs(
+            self.time,
+            self.energy_flow_data.energy_buy,
+            self.energy_flow_data.energy_sell,
+            self.energy_flow_data.self_usage,
+            tariff,
+        )
+
+    def hourly_arrays(self) -> dict[str, np.ndarray]:
+        """The hourly values as columns, without copying them."""
+        flows = self.energy_flow_data
+        return {
+            "time": self.time,
+            "production": flows.production,
+            "regular_consumption": self.regular_consumption,
+            "heatpump_consumption": self.heatpump_consumption,
+            "consumption": flows.consumption,
+            "energy_buy": flows.energy_buy,
+            "energy_sell": flows.energy_sell,
+            "self_usage": flows.self_usage,
+        }
+
+    def hourly_columns(self) -> dict[str, list]:
+        """The hourly values as lists, with the times as ISO strings."""
+        columns = {name: array.tolist() for name, array in self.hourly_arrays().items()}
+        columns["time"] = np.datetime_as_string(self.time, unit="m").tolist()
+        return columns
+
+    def between(self, start: np.datetime64, stop: np.datetime64) -> EnergyFlowData:
+        """The energy flows of the times from start to before stop, as views."""
+        first, last = np.searchsorted(self.time, [start, stop])
+        return self.energy_flow_data[int(first) : int(last)]
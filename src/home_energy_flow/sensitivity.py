@@ -0,0 +1,357 @@
+from dataclasses import dataclass
+
+import numpy as np
+from pydantic import BaseModel
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.consumption.load_profiles import StandardLoadProfile
+from home_energy_flow.instrumentation import stage
+from home_energy_flow.kpis import YearlyKPIs, yearly_kpi_arrays
+from home_energy_flow.prices import Prices
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.meteo_catalog import MeteoCatalog
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.pv_system import PVSystem
+from home_energy_flow.storage import compute_storage
+
+# Number of samples simulated at once. Bounds the memory to about 10 arrays of
+# SENSITIVITY_BATCH_SIZE x time steps, about 180 MB for a year.
+SENSITIVITY_BATCH_SIZE = 256
+
+# The uncertain inputs, in the order of the columns of the samples.
+PARAMETERS = (
+    "performance_ratio",
+    "storage_efficiency",
+    "heating_turnoff_temp",
+    "energy_buy_eur_per_kWh",
+    "energy_sell_eur_per_kWh",
+    "year",
+)
+
+
+class SensitivitySpace(BaseModel):
+    """
+    The ranges of the uncertain inputs.
+
+    The continuous inputs are uniformly distributed between their lower and
+    upper bound, the weather year is one of years with equal probability.
+    """
+
+    performance_ratio: tuple[float, float] = (0.75, 0.9)
+    storage_efficiency: tuple[float, float] = (0.85, 0.95)
+    heating_turnoff_temp: tuple[float, float] = (12.0, 16.0)
+    energy_buy_eur_per_kWh: tuple[float, float] = (0.25, 0.4)
+    energy_sell_eur_per_kWh: tuple[float, float] = (0.05, 0.1)
+    years: list[int] = [2020, 2021, 2022, 2023]
+
+    def values(self, unit_samples: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        Map samples of the unit hypercube to the inputs.
+
+        Args:
+            unit_samples:
+                Shape (samples, len(PARAMETERS)), values in [0, 1).
+
+        Returns:
+            For each of PARAMETERS, one value per sample.
+        """
+        values = {}
+        for j, name in enumerate(PARAMETERS[:-1]):
+            low, high = getattr(self, name)
+            values[name] = low + unit_samples[:, j] * (high - low)
+        year_index = np.minimum(
+            (unit_samples[:, -1] * len(self.years)).astype(np.int64),
+            len(self.years) - 1,
+        )
+        values["year"] = np.asarray(self.years)[year_index]
+        return values
+
+    def midpoint(self) -> dict[str, float]:
+        """The center of each range, and the middle of the years."""
+        return {
+            name: float(value[0])
+            for name, value in self.values(np.full((1, len(PARAMETERS)), 0.5)).items()
+        }
+
+
+@dataclass(frozen=True)
+class OneAtATimeResult:
+    """The output when varying one input with all others at their midpoint."""
+
+    parameter: str
+    values: np.ndarray
+    outputs: np.ndarray
+
+    @property
+    def swing(self) -> float:
+        """The difference between the largest and the smallest output."""
+        return float(self.outputs.max() - self.outputs.min())
+
+
+@dataclass(frozen=True)
+class SobolResult:
+    """Variance-based sensitivity indices of sobol_indices."""
+
+    parameters: tuple[str, ...]
+    # Share of the output variance explained by each input alone.
+    first_order: np.ndarray
+    # Share of the output variance that involves each input, including its
+    # interactions with other inputs.
+    total_order: np.ndarray
+    mean: float
+    variance: float
+    num_evaluations: int
+
+    def as_dict(self) -> dict[str, tuple[float, float]]:
+        """The first and total order index of each input."""
+        return {
+            name: (float(first), float(total))
+            for name, first, total in zip(
+                self.parameters, self.first_order, self.total_order
+            )
+        }
+
+
+class SensitivityModel:
+    """
+    Simulates one household for many samples of the uncertain inputs.
+
+    The meteo data of each weather year is loaded once. The production of the
+    PV system at a performance ratio of 1 is computed once per year and
+    scaled per sample, the regular consumption is shared by all samples. The
+    heat pump consumption and the storage are computed for batches of
+    samples as arrays of samples x time steps.
+    """
+
+    def __init__(
+        self,
+        pv_system: PVSystem,
+        storage_kWh: float,
+        regular_consumption_kWh: float,
+        heatpump_system: HeatPumpSystem,
+        datasets_per_year: dict[int, list[MeteoDataset]] | None = None,
+        catalog: MeteoCatalog | None = None,
+        load_profile: StandardLoadProfile | None = None,
+        batch_size: int = SENSITIVITY_BATCH_SIZE,
+    ) -> None:
+        """
+        Args:
+            pv_system, storage_kWh, regular_consumption_kWh, heatpump_system:
+                The household, as in main. The performance ratio and the
+                heating turnoff temperature are replaced by the samples.
+            datasets_per_year:
+                Meteo data of the orientations of the PV system per year.
+                Years without data are loaded from the catalog.
+            catalog:
+                Catalog of the meteo data, defaults to MeteoCatalog.scan().
+            load_profile:
+                Standard load profile of the regular consumption, see main.
+            batch_size:
+                Number of samples simulated at once.
+        """
+        self.pv_system = pv_system
+        self.storage_kWh = storage_kWh
+        self.regular_consumption_kWh = regular_consumption_kWh
+        self.heatpump_system = heatpump_system
+        self.datasets_per_year = dict(datasets_per_year or {})
+        self.catalog = catalog
+        self.load_profile = load_profile
+        self.batch_size = batch_size
+
+    def _datasets(self, year: int) -> list[MeteoDataset]:
+        if year not in self.datasets_per_year:
+            if self.catalog is None:
+                self.catalog = MeteoCatalog.scan()
+            self.datasets_per_year[year] = self.catalog.load(self.pv_system, year)
+        return self.datasets_per_year[year]
+
+    def evaluate(self, values: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+        """
+        Simulate the samples.
+
+        Args:
+            values:
+                For each of PARAMETERS, one value per sample, e.g. from
+                SensitivitySpace.values.
+
+        Returns:
+            For each field of YearlyKPIs, one value per sample.
+        """
+        num_samples = len(values["year"])
+        kpis = {name: np.zeros(num_samples) for name in YearlyKPIs.model_fields}
+        years = np.asarray(values["year"])
+        for year in np.unique(years).tolist():
+            datasets = self._datasets(year)
+            columns = datasets[0].columns
+            unit_system = self.pv_system.model_copy(
+                update={"performance_ratio": 1.0, "maximum_power_kW": None}
+            )
+            _, unit_production = compute_production.compute_production_batch(
+                [unit_system], datasets
+            )
+            maximum_power_kWh = (
+                np.inf
+                if self.pv_system.maximum_power_kW is None
+                else self.pv_system.maximum_power_kW * columns.axis.step_hours
+            )
+            regular = consumption_profiles.regular_consumption_for_columns(
+                columns, self.regular_consumption_kWh, self.load_profile
+            )
+
+            in_year = np.flatnonzero(years == year)
+            for start in range(0, len(in_year), self.batch_size):
+                batch = in_year[start : start + self.batch_size]
+                rows = len(batch) * len(columns)
+                with stage("sensitivity_production", rows=rows):
+                    production = np.minimum(
+                        values["performance_ratio"][batch, np.newaxis]
+                        * unit_production,
+                        maximum_power_kWh,
+                    )
+                with stage("sensitivity_consumption", rows=rows):
+                    consumption = consumption_profiles.heatpump_consumption_batch(
+                        columns.axis,
+                        columns.T2m,
+                        self.heatpump_system,
+                        values["heating_turnoff_temp"][batch],
+                    )
+                    consumption += regular
+                with stage("sensitivity_storage", rows=rows):
+                    flows = compute_storage.simulate_storage(
+                        production,
+                        consumption,
+                        storage_kWh=self.storage_kWh,
+                        storage_efficiency=values["storage_efficiency"][batch],
+                    )
+                with stage("sensitivity_kpis", rows=rows):
+                    # Gains at prices of 1 EUR per kWh, scaled by the sampled prices
+                    batch_kpis = yearly_kpi_arrays(
+                        production, consumption, flows, Prices(1.0, 1.0)
+                    )
+                    batch_kpis["gain_self_usage_eur"] *= values[
+                        "energy_buy_eur_per_kWh"
+                    ][batch]
+                    batch_kpis["gain_sell_eur"] *= values["energy_sell_eur_per_kWh"][
+                        batch
+                    ]
+                    batch_kpis["gain_eur"] = (
+                        batch_kpis["gain_self_usage_eur"] + batch_kpis["gain_sell_eur"]
+                    )
+                    for name, batch_values in batch_kpis.items():
+                        kpis[name][batch] = batch_values
+                del production, consumption, flows
+        return kpis
+
+
+def one_at_a_time(
+    model: SensitivityModel,
+    space: SensitivitySpace,
+    num_points: int = 5,
+    output: str = "gain_eur",
+) -> list[OneAtATimeResult]:
+    """
+    Vary each input over its range while all others stay at their midpoint.
+
+    All perturbations are simulated in one call of SensitivityModel.evaluate.
+
+    Args:
+        num_points:
+            Number of equally spaced values of each continuous input. The
+            weather year takes each of the years.
+        output:
+            The field of YearlyKPIs to report.
+    """
+    midpoint = space.midpoint()
+    grids: dict[str, np.ndarray] = {}
+    for name in PARAMETERS:
+        if name == "year":
+            grids[name] = np.asarray(space.years, dtype=np.float64)
+        else:
+            low, high = getattr(space, name)
+            grids[name] = np.linspace(low, high, num_points)
+    values = {
+        name: np.concatenate(
+            [
+                grid if name == varied else np.full(len(grid), midpoint[name])
+                for varied, grid in grids.items()
+            ]
+        )
+        for name in PARAMETERS
+    }
+    values["year"] = values["year"].astype(np.int64)
+    outputs = model.evaluate(values)[output]
+
+    results = []
+    start = 0
+    for name, grid in grids.items():
+        results.append(
+            OneAtATimeResult(
+                parameter=name,
+                values=grid,
+                outputs=outputs[start : start + len(grid)],
+            )
+        )
+        start += len(grid)
+    return results
+
+
+def sobol_indices(
+    model: SensitivityModel,
+    space: SensitivitySpace,
+    num_base_samples: int = 512,
+    output: str = "gain_eur",
+    seed: int | None = 0,
+) -> SobolResult:
+    """
+    Estimate the first and total order Sobol indices of the inputs.
+
+    Uses the sampling scheme of Saltelli: two independent sample matrices A
+    and B, and for each input the matrix A with the column of that input
+    taken from B. All num_base_samples * (len(PARAMETERS) + 2) samples are
+    simulated in one call of SensitivityModel.evaluate. The first order
+    indices use the estimator of Saltelli et al. (2010) with centered
+    outputs, the total order indices the estimator of Jansen (1999). The
+    samples are pseudo-random, so the indices have a sampling error that
+    shrinks with the square root of num_base_samples.
+
+    Args:
+        num_base_samples:
+            Number of rows of A and B.
+        output:
+            The field of YearlyKPIs to analyze.
+        seed:
+            Seed of the random samples.
+    """
+    rng = np.random.default_rng(seed)
+    num_parameters = len(PARAMETERS)
+    a = rng.random((num_base_samples, num_parameters))
+    b = rng.random((num_base_samples, num_parameters))
+    mixed = np.repeat(a[np.newaxis], num_parameters, axis=0)
+    for j in range(num_parameters):
+        mixed[j, :, j] = b[:, j]
+    unit_samples = np.concatenate([a, b, mixed.reshape(-1, num_parameters)])
+
+    outputs = model.evaluate(space.values(unit_samples))[output]
+    f_a = outputs[:num_base_samples]
+    f_b = outputs[num_base_samples : 2 * num_base_samples]
+    f_mixed = outputs[2 * num_base_samples :].reshape(num_parameters, -1)
+
+    mean = float(np.mean(np.concatenate([f_a, f_b])))
+    variance = float(np.var(np.concatenate([f_a, f_b])))
+    if variance == 0:
+        first_order = np.zeros(num_parameters)
+        total_order = np.zeros(num_parameters)
+    else:
+        # Centering f_b does not change the expected value, but removes the
+        # noise of the mean times f_mixed - f_a
+        first_order = np.mean((f_b - mean) * (f_mixed - f_a), axis=-1) / variance
+        total_order = 0.5 * np.mean((f_a - f_mixed) ** 2, axis=-1) / variance
+    return SobolResult(
+        parameters=PARAMETERS,
+        first_order=first_order,
+        total_order=total_order,
+        mean=mean,
+        variance=variance,
+        num_evaluations=len(outputs),
+    )
@@ -0,0 +1,91 @@
+import sys
+from pathlib import Path
+from typing import Protocol, TextIO
+
+from home_energy_flow import export
+from home_energy_flow.plot import plot_graph, print_as_table
+from home_energy_flow.result import SimulationResult
+
+
+class Sink(Protocol):
+    """Output of main.main, e.g. a table, a plot or a file."""
+
+    def write(self, result: SimulationResult) -> None: ...
+
+
+class TableSink:
+    """Print the monthly table and the gains."""
+
+    def __init__(self, stream: TextIO | None = None) -> None:
+        """
+        Args:
+            stream:
+                Where to print to, defaults to sys.stdout at the time of writing.
+        """
+        self.stream = stream
+
+    def write(self, result: SimulationResult) -> None:
+        stream = sys.stdout if self.stream is None else self.stream
+        print(
+            print_as_table.format_data_per_month_as_table(result.monthly_datas),
+            file=stream,
+        )
+        kpis = result.kpis
+        print(f"Total gain self usage: {kpis.gain_self_usage_eur:.2f} EUR", file=stream)
+        print(f"Total gain sell: {kpis.gain_sell_eur:.2f} EUR", file=stream)
+        print(f"Total gain: {kpis.gain_eur:.2f} EUR", file=stream)
+
+
+class PlotSink:
+    """Show the monthly plot in a window, which blocks until it is closed."""
+
+    def write(self, result: SimulationResult) -> None:
+        plot_graph.plot_data_per_month_as_lines(result.monthly_datas)
+
+
+class ImageSink:
+    """Save the monthly plot to a file, e.g. .png or .svg, without a window."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def write(self, result: SimulationResult) -> None:
+        plot_graph.save_data_per_month_as_lines(result.monthly_datas, self.path)
+
+
+class CsvSink:
+    """
+    Save the hourly values to a CSV file with one column per series.
+
+    Paths ending in .gz are compressed with gzip.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def write(self, result: SimulationResult) -> None:
+        export.write_table(self.path, result.hourly_columns())
+
+
+class ParquetSink:
+    """Save the hourly values to a Parquet file, requires pyarrow."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def write(self, result: SimulationResult) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError(
+                "ParquetSink requires pyarrow, install it with 'pip install pyarrow'"
+            ) from error
+        columns: dict[str, object] = dict(result.hourly_arrays())
+        columns["time"] = result.time.astype("datetime64[ms]")
+        pq.write_table(pa.table(columns), self.path)
+
+
+def default_sinks() -> list[Sink]:
+    """The output of main without sinks: the table and the interactive plot."""
+    return [TableSink(), PlotSink()]
@@ -0,0 +1,424 @@
+import bisect
+import itertools
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from pydantic import BaseModel
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.consumption.load_profiles import StandardLoadProfile
+from home_energy_flow.instrumentation import stage
+from home_energy_flow.kpis import YearlyKPIs, yearly_kpi_arrays
+from home_energy_flow.prices import InvestmentCosts, Prices
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.meteo_catalog import MeteoCatalog
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.orientation_index import OrientationIndex
+from home_energy_flow.production.pv_system import Modules, PVSystem
+from home_energy_flow.storage import compute_storage
+
+# Number of PV systems whose production is computed at once to bound the
+# gains of their candidates.
+SIZING_BOUND_BATCH_SIZE = 256
+
+# Number of PV systems whose storage capacities are simulated together. Larger
+# batches simulate faster per candidate, smaller ones skip more candidates.
+SIZING_SYSTEMS_PER_BATCH = 64
+
+# Number of storage capacities per PV system simulated at once, starting with
+# the smallest. Larger capacities are only simulated if a smaller one was
+# full at some time step, see optimize_sizing.
+SIZING_CAPACITIES_PER_BATCH = 8
+
+
+class SizingSpace(BaseModel):
+    """
+    The PV systems and storage capacities searched by optimize_sizing.
+
+    Each entry of modules is a module type at one orientation. Its n is
+    replaced by each of its module_counts, so the PV systems are all
+    combinations of the module counts and maximum powers.
+    """
+
+    modules: list[Modules]
+    # For each entry of modules, the numbers of modules to try.
+    module_counts: list[list[int]]
+    maximum_power_kW: list[float | None] = [None]
+    storage_kWh: list[float]
+    performance_ratio: float = 0.8
+
+    def pv_system(
+        self, counts: Sequence[int], maximum_power_kW: float | None
+    ) -> PVSystem:
+        """The PV system with the given number of modules per entry of modules."""
+        return PVSystem(
+            modules=[
+                module.model_copy(update={"n": n})
+                for module, n in zip(self.modules, counts)
+                if n > 0
+            ],
+            maximum_power_kW=maximum_power_kW,
+            performance_ratio=self.performance_ratio,
+        )
+
+
+class SizingCandidate(YearlyKPIs):
+    """A PV system and storage capacity of the search space with its KPIs."""
+
+    pv_system: PVSystem
+    storage_kWh: float
+    kWp: float
+    # Investment costs per year, see InvestmentCosts.yearly_eur.
+    investment_eur: float
+    # Gain minus the investment costs per year.
+    net_gain_eur: float
+    # Energy bought minus energy sold plus the investment costs per year.
+    cost_eur: float
+
+
+@dataclass(frozen=True)
+class SizingResult:
+    """Result of optimize_sizing."""
+
+    # The candidates for which no other candidate has both a higher autarky
+    # and lower costs, by increasing cost and autarky.
+    pareto_front: list[SizingCandidate]
+    # Number of candidates of the search space.
+    num_candidates: int
+    # Number of candidates whose storage was simulated, the others were pruned.
+    num_simulated: int
+
+    @property
+    def best(self) -> SizingCandidate:
+        """
+        The candidate with the largest net gain.
+
+        The consumption is the same for all candidates, so this is also the
+        candidate with the lowest costs, the first of the Pareto front.
+        """
+        return self.pareto_front[0]
+
+
+class _ParetoFront:
+    """Points not dominated in cost and autarky, by increasing cost and autarky."""
+
+    def __init__(self) -> None:
+        self.costs: list[float] = []
+        self.autarkies: list[float] = []
+        self.items: list[tuple[int, int, dict[str, float]]] = []
+
+    def dominates(self, costs: np.ndarray, autarkies: np.ndarray) -> np.ndarray:
+        """Whether a point has at most the cost and at least the autarky."""
+        if not self.costs:
+            return np.zeros(np.shape(costs), dtype=bool)
+        # The last point with at most the cost has the highest autarky of them
+        index = np.searchsorted(self.costs, costs, side="right") - 1
+        best_autarky = np.asarray(self.autarkies)[np.maximum(index, 0)]
+        return (index >= 0) & (best_autarky >= autarkies)
+
+    def add(
+        self, cost: float, autarky: float, item: tuple[int, int, dict[str, float]]
+    ) -> None:
+        """Add the point unless it is dominated, and drop the points it dominates."""
+        if self.dominates(np.array(cost), np.array(autarky)):
+            return
+        start = bisect.bisect_left(self.costs, cost)
+        end = start
+        while end < len(self.costs) and self.autarkies[end] <= autarky:
+            end += 1
+        self.costs[start:end] = [cost]
+        self.autarkies[start:end] = [autarky]
+        self.items[start:end] = [item]
+
+
+def _run_totals(energy: np.ndarray, limits: np.ndarray) -> np.ndarray:
+    """
+    Sum of the runs of consecutive positive values of each row, each run limited.
+
+    Args:
+        energy:
+            Non-negative values of shape (rows, time steps).
+        limits:
+            The limits of each run, shape (limits,).
+
+    Returns:
+        For each row and limit, the sum of min(run total, limit) over the runs
+        of the row, shape (rows, limits).
+    """
+    positive = energy > 0
+    starts = positive.copy()
+    starts[:, 1:] &= ~positive[:, :-1]
+    run_rows = np.nonzero(starts)[0]
+    run_ids = np.cumsum(starts, axis=None) - 1
+    run_totals = np.bincount(
+        run_ids[positive.ravel()],
+        weights=energy[positive],
+        minlength=len(run_rows),
+    )
+    limited = np.minimum(run_totals[:, np.newaxis], limits)
+    totals = np.zeros((len(energy), len(limits)))
+    for j in range(len(limits)):
+        totals[:, j] = np.bincount(
+            run_rows, weights=limited[:, j], minlength=len(energy)
+        )
+    return totals
+
+
+def optimize_sizing(
+    space: SizingSpace,
+    regular_consumption_kWh: float,
+    heatpump_system: HeatPumpSystem,
+    year: int,
+    prices: Prices | None = None,
+    costs: InvestmentCosts | None = None,
+    storage_efficiency: float = 0.9,
+    datasets: list[MeteoDataset] | None = None,
+    interpolate: bool = False,
+    load_profile: StandardLoadProfile | None = None,
+) -> SizingResult:
+    """
+    Find the PV systems and storage capacities with the best autarky and costs.
+
+    Each candidate is a combination of module counts, maximum power and
+    storage capacity of the search space. Its costs per year are the energy
+    bought minus the energy sold plus the investment costs, so the cheapest
+    candidate has the largest net gain.
+
+    The production per module and the consumption are computed once, the
+    production of a PV system is then a weighted sum of them. Most candidates
+    are never simulated:
+
+    - The gain of a PV system is bounded from its production and consumption
+      alone, assuming that the storage shifts as much surplus as possible into
+      deficits. Candidates whose bounds are dominated by a simulated candidate
+      are skipped, and the PV systems are simulated in the order of their
+      bounds so that good candidates are found early.
+    - The storage level only depends on the capacity when the storage is full.
+      Once a capacity is never filled, all larger capacities give the same
+      energy flows at higher costs, so they are skipped.
+
+    Skipped candidates are dominated by a simulated one, so the Pareto front is
+    the same as when simulating all candidates, up to candidates with equal
+    costs and autarky.
+
+    Args:
+        space:
+            The PV systems and storage capacities to search.
+        regular_consumption_kWh, heatpump_system:
+            The consumption of the household, as in main.
+        year:
+            The year of the meteo data to simulate.
+        prices:
+            The prices used to compute the gains, defaults to Prices(). Only
+            constant prices are supported, as the bounds of the gains assume
+            the same price in every time step. Compare the candidates of the
+            Pareto front under a TimeOfUseTariff or HourlyTariff with
+            run_sweep.
+        costs:
+            The investment costs, defaults to none.
+        storage_efficiency:
+            Charge and discharge efficiency of the storage.
+        datasets:
+            Meteo data of the orientations of the modules restricted to the
+            year. Loaded with MeteoCatalog if not given.
+        interpolate:
+            Interpolate the irradiance of module orientations without meteo
+            data, see compute_production.compute_production_batch.
+        load_profile:
+            Standard load profile of the regular consumption, see main.
+    """
+    if prices is None:
+        prices = Prices()
+    if costs is None:
+        costs = InvestmentCosts()
+    if len(space.module_counts) != len(space.modules):
+        raise ValueError("The sizing space needs module counts for each module")
+    if datasets is None:
+        datasets = MeteoCatalog.scan().load(
+            PVSystem(modules=space.modules), year, interpolate=interpolate
+        )
+    compute_production.check_same_times(datasets)
+    columns = datasets[0].columns
+    consumption = np.add(
+        consumption_profiles.regular_consumption_for_columns(
+            columns, regular_consumption_kWh, load_profile
+        ),
+        consumption_profiles.heatpump_consumption_for_columns(
+            columns, heatpump_system=heatpump_system
+        ),
+    )
+    total_consumption = float(consumption.sum())
+
+    # Production of one module of each entry of modules, in kWh per time step
+    index = OrientationIndex(datasets)
+    module_weights = np.array(
+        [
+            module.kWP
+            * space.performance_ratio
+            * index.module_weights(module, interpolate)
+            for module in space.modules
+        ]
+    ).reshape(len(space.modules), len(datasets))
+    module_production = np.zeros((len(space.modules), len(columns)))
+    used = np.flatnonzero(np.any(module_weights != 0, axis=0))
+    if len(used) > 0:
+        module_production = module_weights[:, used] @ np.stack(
+            [compute_production.unit_production(datasets[j]) for j in used]
+        )
+
+    # All PV systems, as module counts and maximum power
+    combinations = list(itertools.product(*space.module_counts))
+    num_powers = len(space.maximum_power_kW)
+    counts = np.repeat(
+        np.array(combinations, dtype=np.float64).reshape(
+            len(combinations), len(space.modules)
+        ),
+        num_powers,
+        axis=0,
+    )
+    maximum_power_kW = np.tile(
+        [np.inf if power is None else power for power in space.maximum_power_kW],
+        len(combinations),
+    )
+    maximum_production_kWh = maximum_power_kW * columns.axis.step_hours
+    kWp = counts @ np.array([module.kWP for module in space.modules])
+    capacities = np.array(sorted(set(space.storage_kWh)), dtype=np.float64)
+    storage_investment = np.asarray(costs.yearly_eur(0.0, capacities))
+
+    def production_of(systems: np.ndarray) -> np.ndarray:
+        production = counts[systems] @ module_production
+        np.minimum(
+            production, maximum_production_kWh[systems, np.newaxis], out=production
+        )
+        return production
+
+    # Upper bounds of the autarky and lower bounds of the costs of each
+    # candidate, of shape (PV systems, capacities). During a run of deficits
+    # the storage delivers at most its capacity times the efficiency, during a
+    # run of surpluses it takes at most its capacity divided by the efficiency,
+    # and of the energy taken at most the efficiency squared is delivered.
+    buy = prices.energy_buy_eur_per_kWh
+    sell = prices.energy_sell_eur_per_kWh
+    round_trip = storage_efficiency**2
+    autarky_bound = np.zeros((len(counts), len(capacities)))
+    cost_bound = np.zeros((len(counts), len(capacities)))
+    with stage("sizing_bounds", rows=len(counts) * len(columns)):
+        for start in range(0, len(counts), SIZING_BOUND_BATCH_SIZE):
+            systems = np.arange(
+                start, min(start + SIZING_BOUND_BATCH_SIZE, len(counts))
+            )
+            net = np.subtract(production_of(systems), consumption)
+            surplus = np.maximum(net, 0.0)
+            deficit = np.maximum(-net, 0.0)
+            del net
+            direct = total_consumption - deficit.sum(axis=-1)
+            total_surplus = surplus.sum(axis=-1)
+            from_storage = np.minimum(
+                _run_totals(deficit, capacities * storage_efficiency),
+                round_trip * _run_totals(surplus, capacities / storage_efficiency),
+            )
+            del surplus, deficit
+            if total_consumption > 0:
+                autarky_bound[systems] = (
+                    direct[:, np.newaxis] + from_storage
+                ) / total_consumption
+            # The gain is largest if all stored energy covers deficits, and the
+            # energy to store it would otherwise be sold.
+            gain_bound = (
+                buy * direct[:, np.newaxis]
+                + sell * total_surplus[:, np.newaxis]
+                + max(buy - sell / round_trip, 0.0) * from_storage
+            )
+            cost_bound[systems] = (
+                buy * total_consumption
+                - gain_bound
+                + np.asarray(costs.yearly_eur(kWp[systems], 0.0))[:, np.newaxis]
+                + storage_investment
+            )
+
+    front = _ParetoFront()
+    num_simulated = 0
+    order = np.argsort(cost_bound.min(axis=-1), kind="stable")
+    for start in range(0, len(order), SIZING_SYSTEMS_PER_BATCH):
+        systems = order[start : start + SIZING_SYSTEMS_PER_BATCH]
+        active = ~front.dominates(cost_bound[systems], autarky_bound[systems])
+        if not np.any(active):
+            continue
+        production = production_of(systems)
+        for first in range(0, len(capacities), SIZING_CAPACITIES_PER_BATCH):
+            block = slice(first, first + SIZING_CAPACITIES_PER_BATCH)
+            active[:, block] &= ~front.dominates(
+                cost_bound[systems, block], autarky_bound[systems, block]
+            )
+            rows, columns_in_block = np.nonzero(active[:, block])
+            if len(rows) == 0:
+                continue
+            capacity_indices = columns_in_block + first
+            with stage("sizing_storage", rows=len(rows) * len(columns)):
+                candidate_production = production[rows]
+                flows = compute_storage.simulate_storage(
+                    candidate_production,
+                    consumption,
+                    storage_kWh=capacities[capacity_indices],
+                    storage_efficiency=storage_efficiency,
+                )
+                kpis = yearly_kpi_arrays(
+                    candidate_production, consumption, flows, prices
+                )
+                never_full = (
+                    flows.stored.max(axis=-1, initial=0.0)
+                    < capacities[capacity_indices]
+                )
+                del candidate_production, flows
+            num_simulated += len(rows)
+
+            investment = (
+                costs.yearly_eur(kWp[systems[rows]], 0.0)
+                + (storage_investment[capacity_indices])
+            )
+            candidate_costs = (
+                buy * kpis["energy_buy_kWh"]
+                - sell * kpis["energy_sell_kWh"]
+                + investment
+            )
+            for k, (row, capacity_index) in enumerate(zip(rows, capacity_indices)):
+                front.add(
+                    float(candidate_costs[k]),
+                    float(kpis["autarky"][k]),
+                    (
+                        int(systems[row]),
+                        int(capacity_index),
+                        {name: float(values[k]) for name, values in kpis.items()},
+                    ),
+                )
+                if never_full[k]:
+                    active[row, capacity_index + 1 :] = False
+
+    pareto_front = []
+    for cost, (system_index, storage_index, kpi_values) in zip(
+        front.costs, front.items
+    ):
+        investment = float(
+            costs.yearly_eur(float(kWp[system_index]), float(capacities[storage_index]))
+        )
+        pareto_front.append(
+            SizingCandidate(
+                **kpi_values,
+                pv_system=space.pv_system(
+                    combinations[system_index // num_powers],
+                    space.maximum_power_kW[system_index % num_powers],
+                ),
+                storage_kWh=float(capacities[storage_index]),
+                kWp=float(kWp[system_index]),
+                investment_eur=investment,
+                net_gain_eur=kpi_values["gain_eur"] - investment,
+                cost_eur=cost,
+            )
+        )
+    return SizingResult(
+        pareto_front=pareto_front,
+        num_candidates=len(counts) * len(capacities),
+        num_simulated=num_simulated,
+    )
@@ -1,8 +1,11 @@
+from dataclasses import dataclass
+
+import numpy as np
 from pydantic import BaseModel
 
 
-class EnergyFlowData(BaseModel):
-    """All data in kWh per time step"""
+class EnergyFlowLists(BaseModel):
+    """The columns of EnergyFlowData as lists, e.g. to serialize them as JSON."""
 
     energy_buy: list[float]
     energy_sell: list[float]
@@ -11,9 +14,263 @@ class EnergyFlowData(BaseModel):
     consumption: list[float]
 
 
+class EnergyFlowData:
+    """
+    All data in kWh per time step, as one float64 array per column.
+
+    Arrays that already are float64 are stored without copying them, and
+    nothing is validated per element. Slicing returns views of the columns.
+    Use to_lists for the columns as Python lists.
+    """
+
+    __slots__ = ("consumption", "energy_buy", "energy_sell", "production", "self_usage")
+
+    # The columns in the order of the arguments of __init__
+    COLUMNS = ("energy_buy", "energy_sell", "self_usage", "production", "consumption")
+
+    def __init__(
+        self,
+        energy_buy: np.ndarray | list[float],
+        energy_sell: np.ndarray | list[float],
+        self_usage: np.ndarray | list[float],
+        production: np.ndarray | list[float],
+        consumption: np.ndarray | list[float],
+    ) -> None:
+        self.energy_buy = np.asarray(energy_buy, dtype=np.float64)
+        self.energy_sell = np.asarray(energy_sell, dtype=np.float64)
+        self.self_usage = np.asarray(self_usage, dtype=np.float64)
+        self.production = np.asarray(production, dtype=np.float64)
+        self.consumption = np.asarray(consumption, dtype=np.float64)
+        if any(
+            getattr(self, name).shape != self.energy_buy.shape for name in self.COLUMNS
+        ):
+            raise ValueError("All columns must have the same shape.")
+
+    def __len__(self) -> int:
+        return len(self.energy_buy)
+
+    def __getitem__(self, index: slice) -> "EnergyFlowData":
+        """The data of a range of time steps, as views of the columns."""
+        if not isinstance(index, slice):
+            raise TypeError("EnergyFlowData can only be sliced")
+        return EnergyFlowData(*(getattr(self, name)[index] for name in self.COLUMNS))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, EnergyFlowData):
+            return NotImplemented
+        return all(
+            np.array_equal(getattr(self, name), getattr(other, name))
+            for name in self.COLUMNS
+        )
+
+    def __repr__(self) -> str:
+        return f"EnergyFlowData({len(self)} time steps)"
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """The columns by name, without copying them, e.g. for pandas or Arrow."""
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    def to_lists(self) -> EnergyFlowLists:
+        """The columns as lists, in the model of the former list-based data."""
+        return EnergyFlowLists.model_construct(
+            **{name: column.tolist() for name, column in self.columns().items()}
+        )
+
+
+@dataclass(frozen=True)
+class StorageFlows:
+    """
+    Result of simulate_storage.
+
+    All arrays are in kWh and have the shape (..., time steps), where the
+    leading dimensions are the broadcast batch dimensions of the inputs.
+    """
+
+    energy_buy: np.ndarray
+    energy_sell: np.ndarray
+    self_usage: np.ndarray
+    # Energy in the storage at the end of each time step.
+    stored: np.ndarray
+    # Energy in the storage at the end of the last time step, shape (...).
+    final_stored: np.ndarray
+    # Energy bought to charge the storage, included in energy_buy. None if the
+    # storage is only charged from surplus, as by simulate_storage.
+    grid_charge: np.ndarray | None = None
+
+
+# Batches with at least this many entries step through the time steps, with
+# each step vectorized over the batch, instead of using the parallel scan.
+# The scan needs about log2(time steps) passes over all values, the loop has
+# a fixed cost per time step that pays off for wide batches.
+SEQUENTIAL_MIN_BATCH = 16
+
+
+def _stored_sequential(
+    shift: np.ndarray, capacity: np.ndarray, initial: np.ndarray
+) -> np.ndarray:
+    """
+    The storage level at the end of each time step, one time step at a time.
+
+    Args:
+        shift:
+            Change of the storage level per time step, shape (..., time steps).
+        capacity, initial:
+            Capacity and initial level, broadcastable to shape (..., 1).
+    """
+    shape = shift.shape
+    # Time steps as rows, so that each step works on contiguous memory
+    levels = np.ascontiguousarray(
+        shift.reshape(int(np.prod(shape[:-1], dtype=np.int64)), shape[-1]).T
+    )
+    upper = np.broadcast_to(capacity, shape[:-1] + (1,)).reshape(-1)
+    level = np.array(np.broadcast_to(initial, shape[:-1] + (1,)).reshape(-1))
+    for row in levels:
+        np.add(level, row, out=level)
+        np.maximum(level, 0.0, out=level)
+        np.minimum(level, upper, out=level)
+        row[...] = level
+    return np.ascontiguousarray(levels.T).reshape(shape)
+
+
+def _compose_storage_steps(
+    shift: np.ndarray, lower: np.ndarray, upper: np.ndarray
+) -> None:
+    """
+    Compose the storage updates of all time steps with an inclusive scan.
+
+    The update of one time step is s -> min(max(s + shift, lower), upper).
+    The composition of two such updates is again of this form, so the
+    updates of the time steps 0..t can be combined for all t in log2(steps)
+    vectorized passes. The arrays are overwritten with the composed updates.
+    """
+    num_time_steps = shift.shape[-1]
+    offset = 1
+    while offset < num_time_steps:
+        # The earlier update f is applied first, then the later update g.
+        f_shift = shift[..., :-offset]
+        f_lower = lower[..., :-offset]
+        f_upper = upper[..., :-offset]
+        g_shift = shift[..., offset:]
+        g_lower = lower[..., offset:]
+        g_upper = upper[..., offset:]
+
+        new_upper = np.minimum(np.maximum(f_upper + g_shift, g_lower), g_upper)
+        new_lower = np.minimum(np.maximum(f_lower + g_shift, g_lower), new_upper)
+        new_shift = f_shift + g_shift
+
+        shift[..., offset:] = new_shift
+        lower[..., offset:] = new_lower
+        upper[..., offset:] = new_upper
+        offset *= 2
+
+
+def simulate_storage(
+    production_kWh: np.ndarray,
+    consumption_kWh: np.ndarray,
+    storage_kWh: float | np.ndarray = 2.0,
+    storage_efficiency: float | np.ndarray = 0.9,
+    initial_storage_kWh: float | np.ndarray = 0.0,
+) -> StorageFlows:
+    """
+    Simulate a storage that is charged from surplus and discharged on deficit.
+
+    Array version of compute_production_consumption with the same charge and
+    discharge efficiency handling. The time axis is the last axis, all other
+    axes are batch axes. storage_kWh, storage_efficiency and
+    initial_storage_kWh have the batch shape, so e.g. production and
+    consumption of shape (time steps,) together with storage_kWh of shape
+    (capacities,) simulate all capacities against the same series at once.
+
+    The storage level is computed for all time steps with a parallel scan
+    instead of a loop over time steps. The results are equal to the loop up
+    to floating point rounding. Batches of at least SEQUENTIAL_MIN_BATCH
+    entries loop over the time steps instead, vectorized over the batch.
+
+    Args:
+        production_kWh:
+            Production per time step in kWh, shape (..., time steps).
+        consumption_kWh:
+            Consumption per time step in kWh, shape (..., time steps).
+        storage_kWh:
+            Total storage capacity in kWh, shape (...).
+        storage_efficiency:
+            Charge and discharge efficiency of the storage, shape (...).
+            Must be larger than 0 and at most 1.
+        initial_storage_kWh:
+            Energy in the storage before the first time step, shape (...).
+    """
+    production = np.asarray(production_kWh, dtype=np.float64)
+    consumption = np.asarray(consumption_kWh, dtype=np.float64)
+    capacity = np.asarray(storage_kWh, dtype=np.float64)[..., np.newaxis]
+    efficiency = np.asarray(storage_efficiency, dtype=np.float64)[..., np.newaxis]
+    initial = np.asarray(initial_storage_kWh, dtype=np.float64)[..., np.newaxis]
+    if np.any(efficiency <= 0) or np.any(efficiency > 1):
+        raise ValueError("Storage efficiency must be larger than 0 and at most 1.")
+    shape = np.broadcast_shapes(
+        production.shape,
+        consumption.shape,
+        capacity.shape,
+        efficiency.shape,
+        initial.shape,
+    )
+    initial = np.broadcast_to(initial, shape[:-1] + (1,))
+
+    # Positive for surplus, negative for deficit
+    net = np.subtract(production, consumption, out=np.empty(shape))
+    surplus = net >= 0
+
+    # Surplus is charged with losses, a deficit needs more energy from the storage.
+    shift = np.empty(shape)
+    np.multiply(net, efficiency, out=shift, where=surplus)
+    np.divide(net, efficiency, out=shift, where=~surplus)
+    if np.prod(shape[:-1], dtype=np.int64) >= SEQUENTIAL_MIN_BATCH:
+        stored = _stored_sequential(shift, capacity, initial)
+    else:
+        lower = np.zeros(shape)
+        upper = np.array(np.broadcast_to(capacity, shape))
+        _compose_storage_steps(shift, lower, upper)
+
+        # Apply the composed updates to the initial storage level
+        stored = shift
+        np.add(stored, initial, out=stored)
+        np.maximum(stored, lower, out=stored)
+        np.minimum(stored, upper, out=stored)
+        del lower, upper
+
+    # Storage level before each time step, also for a series without time steps
+    previous = np.concatenate([initial, stored], axis=-1)[..., :-1]
+    change = np.subtract(stored, previous, out=previous)
+
+    energy_buy = np.zeros(shape)
+    energy_sell = np.zeros(shape)
+    self_usage = np.empty(shape)
+
+    # Surplus: the remaining excess after charging the storage is sold
+    charge_energy = np.divide(change, efficiency, out=np.zeros(shape), where=surplus)
+    np.subtract(net, charge_energy, out=energy_sell, where=surplus)
+    np.copyto(self_usage, np.broadcast_to(consumption, shape), where=surplus)
+
+    # Deficit: the remaining deficit after discharging the storage is bought
+    discharge_energy = np.multiply(
+        change, -efficiency, out=charge_energy, where=~surplus
+    )
+    discharge_energy[surplus] = 0.0
+    np.subtract(-net, discharge_energy, out=energy_buy, where=~surplus)
+    np.maximum(energy_buy, 0.0, out=energy_buy)
+    np.add(production, discharge_energy, out=self_usage, where=~surplus)
+
+    return StorageFlows(
+        energy_buy=energy_buy,
+        energy_sell=energy_sell,
+        self_usage=self_usage,
+        stored=stored,
+        final_stored=stored[..., -1] if shape[-1] > 0 else initial[..., 0],
+    )
+
+
 def compute_production_consumption(
-    production_kWh: list[float],
-    consumption_kWh: list[float],
+    production_kWh: list[float] | np.ndarray,
+    consumption_kWh: list[float] | np.ndarray,
     storage_kWh: float = 2.0,
     storage_efficiency: float = 0.9,
 ) -> EnergyFlowData:
@@ -31,70 +288,24 @@ def compute_production_consumption(
             Charge and discharge efficiency of the storage.
             Must be between 0 and 1.
     """
-    # Initialize the lists to store results
-    energy_buy = []
-    energy_sell = []
-    self_usage = []
-
     # Ensure the lengths of both lists are the same
     assert len(production_kWh) == len(
         consumption_kWh
     ), "Production and consumption lists must be of the same length."
 
-    # Initialize current storage state
-    current_storage = 0.0  # Start with empty storage
-
-    for prod, con in zip(production_kWh, consumption_kWh):
-        if prod >= con:
-            # Surplus energy available
-            excess = prod - con
-
-            # Calculate potential energy to charge storage
-            charge_possible = min(
-                excess * storage_efficiency, storage_kWh - current_storage
-            )
-            charge_energy = (
-                charge_possible / storage_efficiency
-            )  # Actual energy taken from surplus
-            current_storage += charge_possible  # Update storage with charged energy
-
-            # Remaining excess after charging storage
-            remaining_excess = excess - charge_energy
-
-            # Energy to sell is the remaining excess
-            _energy_sell = remaining_excess
-            _energy_buy = 0.0  # No need to buy energy
-        else:
-            # Deficit energy needed
-            deficit = con - prod
-
-            # Calculate potential energy to discharge from storage
-            discharge_possible = min(deficit / storage_efficiency, current_storage)
-            discharge_energy = (
-                discharge_possible * storage_efficiency
-            )  # Actual energy provided to cover deficit
-            current_storage -= discharge_possible  # Update storage after discharging
-
-            # Remaining deficit after discharging storage
-            remaining_deficit = deficit - discharge_energy
-
-            # Energy to buy is the remaining deficit
-            _energy_buy = max(remaining_deficit, 0.0)
-            _energy_sell = 0.0  # No excess to sell
-
-        # Self-consumed energy is the minimum of production and consumption
-        _self_usage = min(prod, con) + discharge_energy
-
-        # Append the results to respective lists
-        energy_buy.append(_energy_buy)
-        energy_sell.append(_energy_sell)
-        self_usage.append(_self_usage)
-
-    # Return the results as a tuple of lists
+    production = np.asarray(production_kWh, dtype=np.float64)
+    consumption = np.asarray(consumption_kWh, dtype=np.float64)
+    flows = simulate_storage(
+        production,
+        consumption,
+        storage_kWh=storage_kWh,
+        storage_efficiency=storage_efficiency,
+    )
+
     return EnergyFlowData(
-        energy_buy=energy_buy,
-        energy_sell=energy_sell,
-        self_usage=self_usage,
-        production=production_kWh,
-        consumption=consumption_kWh,
+        energy_buy=flows.energy_buy,
+        energy_sell=flows.energy_sell,
+        self_usage=flows.self_usage,
+        production=production,
+        consumption=consumption,
     )
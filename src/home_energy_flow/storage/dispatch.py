@@ -0,0 +1,375 @@
+from dataclasses import dataclass, fields, replace
+from typing import Protocol
+
+import numpy as np
+
+from home_energy_flow.prices import PriceSeries
+from home_energy_flow.storage.compute_storage import StorageFlows, simulate_storage
+
+# Other storage levels than the greedy one are only chosen if they are cheaper
+# by more than this, so that rounding does not break ties.
+TOLERANCE_EUR = 1e-9
+
+
+class DispatchStrategy(Protocol):
+    """Decides in each time step how much the storage is charged or discharged."""
+
+    def dispatch(
+        self,
+        production_kWh: np.ndarray,
+        consumption_kWh: np.ndarray,
+        prices: PriceSeries,
+        storage_kWh: float | np.ndarray = 2.0,
+        storage_efficiency: float = 0.9,
+        initial_storage_kWh: float | np.ndarray = 0.0,
+    ) -> StorageFlows:
+        """
+        Simulate the storage, with the shapes of simulate_storage.
+
+        Args:
+            prices:
+                The prices of each time step. Strategies that plan ahead use
+                them as a perfect forecast.
+        """
+        ...
+
+
+@dataclass
+class GreedyDispatch:
+    """Charge from all surplus and discharge on every deficit, as simulate_storage."""
+
+    def dispatch(
+        self,
+        production_kWh: np.ndarray,
+        consumption_kWh: np.ndarray,
+        prices: PriceSeries,
+        storage_kWh: float | np.ndarray = 2.0,
+        storage_efficiency: float = 0.9,
+        initial_storage_kWh: float | np.ndarray = 0.0,
+    ) -> StorageFlows:
+        return simulate_storage(
+            production_kWh,
+            consumption_kWh,
+            storage_kWh=storage_kWh,
+            storage_efficiency=storage_efficiency,
+            initial_storage_kWh=initial_storage_kWh,
+        )
+
+
+@dataclass
+class RollingHorizonDispatch:
+    """
+    Schedule the storage by dynamic programming over a rolling forecast horizon.
+
+    The costs of buying minus the revenue of selling from each time step and
+    storage level to the end of a horizon of horizon_steps time steps are
+    computed by a backward dynamic program on levels + 1 discretized storage
+    levels, given the production, consumption and prices of the horizon as a
+    forecast. Between the discretized levels, the costs are interpolated
+    linearly. The first commit_steps time steps are then executed with
+    continuous storage levels, each choosing the level with the lowest costs
+    until the end of the horizon, and the next horizon starts from the
+    reached level.
+
+    At the end of each horizon, the stored energy is credited with its value
+    for the rest of the series: it saves charging the storage from surplus
+    later, so it is worth the lowest remaining sell price divided by the
+    efficiency, but at most the lowest remaining buy price times the
+    efficiency. At the end of the series, it is worth nothing.
+
+    In each time step, the storage may end at the level of GreedyDispatch,
+    at the lowest or highest level reachable with the surplus or deficit, or
+    at any discretized level in between. Ties are resolved in favour of the
+    greedy level, so with flat prices the schedule equals GreedyDispatch,
+    except that it does not charge energy that would be left unused at the
+    end of the series. With varying prices it holds back energy for
+    expensive hours and, if grid_charging is set, charges from the grid when
+    the price difference pays for the losses. Batch entries whose schedule
+    costs more than the greedy one, e.g. from the discretization, get the
+    greedy schedule, so the costs are never higher than with GreedyDispatch.
+
+    All batch entries are optimized at once, with the costs of all state
+    transitions of a time step evaluated as one array operation.
+    """
+
+    # Number of time steps optimized at once.
+    horizon_steps: int = 48
+    # Number of time steps of each schedule executed before optimizing again.
+    commit_steps: int = 24
+    # Number of equal parts the storage capacity is divided into.
+    levels: int = 20
+    # Whether the storage may be charged from the grid.
+    grid_charging: bool = True
+
+    def dispatch(
+        self,
+        production_kWh: np.ndarray,
+        consumption_kWh: np.ndarray,
+        prices: PriceSeries,
+        storage_kWh: float | np.ndarray = 2.0,
+        storage_efficiency: float = 0.9,
+        initial_storage_kWh: float | np.ndarray = 0.0,
+    ) -> StorageFlows:
+        if not 1 <= self.commit_steps <= self.horizon_steps:
+            raise ValueError("commit_steps must be between 1 and horizon_steps")
+        if self.levels < 1:
+            raise ValueError("The storage needs at least one level")
+        if not 0 < storage_efficiency <= 1:
+            raise ValueError("Storage efficiency must be larger than 0 and at most 1.")
+
+        greedy = GreedyDispatch().dispatch(
+            production_kWh,
+            consumption_kWh,
+            prices,
+            storage_kWh=storage_kWh,
+            storage_efficiency=storage_efficiency,
+            initial_storage_kWh=initial_storage_kWh,
+        )
+        shape = greedy.stored.shape
+        num_time_steps = shape[-1]
+        batch_shape = shape[:-1]
+        greedy = replace(greedy, grid_charge=np.zeros(shape))
+        if num_time_steps == 0:
+            return greedy
+        batch_size = int(np.prod(batch_shape, dtype=np.int64))
+
+        def broadcast(array: float | np.ndarray, to: tuple[int, ...]) -> np.ndarray:
+            return np.broadcast_to(np.asarray(array, dtype=np.float64), to)
+
+        consumption = broadcast(consumption_kWh, shape).reshape(
+            batch_size, num_time_steps
+        )
+        production = broadcast(production_kWh, shape).reshape(
+            batch_size, num_time_steps
+        )
+        net = production - consumption
+        capacity = broadcast(storage_kWh, batch_shape).reshape(batch_size)
+        initial = broadcast(initial_storage_kWh, batch_shape).reshape(batch_size)
+        level = initial.copy()
+
+        surplus = np.maximum(net, 0.0)
+        # Change of the storage level when charging all surplus or covering
+        # the whole deficit, as in simulate_storage
+        shift = np.where(net >= 0, net * storage_efficiency, net / storage_efficiency)
+        level_kWh = capacity / self.levels
+        grid_levels = np.arange(self.levels + 1) * level_kWh[:, np.newaxis]
+        efficiency = storage_efficiency
+
+        stored = np.empty_like(net)
+        stored_value = _stored_energy_value(prices, num_time_steps, efficiency)
+        for start in range(0, num_time_steps, self.commit_steps):
+            window = range(start, min(start + self.horizon_steps, num_time_steps))
+            # Costs from each time step and level of the horizon to its end,
+            # where the stored energy is credited with its value
+            values = np.empty((len(window) + 1,) + grid_levels.shape)
+            values[-1] = -grid_levels * stored_value[window.stop]
+            for step in reversed(range(len(window))):
+                t = window[step]
+                candidates = self._candidates(
+                    grid_levels, capacity, shift[:, t], grid_levels
+                )
+                costs = _step_costs(
+                    grid_levels, candidates, net[:, t], prices, t, efficiency
+                )
+                costs += _interpolate(values[step + 1], candidates, level_kWh)
+                values[step] = costs.min(axis=-1)
+
+            # Execute the first time steps from the actual storage levels
+            for step in range(min(self.commit_steps, len(window))):
+                t = window[step]
+                candidates = self._candidates(
+                    level[:, np.newaxis], capacity, shift[:, t], grid_levels
+                )
+                costs = _step_costs(
+                    level[:, np.newaxis], candidates, net[:, t], prices, t, efficiency
+                )
+                costs += _interpolate(values[step + 1], candidates, level_kWh)
+                costs = costs[:, 0]
+                # Keep the greedy level, the first candidate, unless another
+                # level is cheaper by more than rounding
+                best = np.argmin(costs, axis=-1)
+                best_costs = np.take_along_axis(costs, best[:, np.newaxis], axis=-1)
+                best[costs[:, 0] - best_costs[:, 0] <= TOLERANCE_EUR] = 0
+                level = np.take_along_axis(
+                    candidates[:, 0], best[:, np.newaxis], axis=-1
+                )[:, 0]
+                stored[:, t] = level
+
+        # Energy flows of the executed storage levels
+        previous = np.concatenate([initial[:, np.newaxis], stored[:, :-1]], axis=-1)
+        change = stored - previous
+        charge = np.maximum(change, 0.0) / storage_efficiency
+        grid = charge + np.minimum(change, 0.0) * storage_efficiency - net
+        energy_buy = np.maximum(grid, 0.0)
+        grid_charge = np.maximum(charge - surplus, 0.0)
+
+        def batch(array: np.ndarray) -> np.ndarray:
+            return array.reshape(shape)
+
+        planned = StorageFlows(
+            energy_buy=batch(energy_buy),
+            energy_sell=batch(np.maximum(-grid, 0.0)),
+            self_usage=batch(consumption - energy_buy + grid_charge),
+            stored=batch(stored),
+            final_stored=batch(stored)[..., -1],
+            grid_charge=batch(grid_charge),
+        )
+        # The discretized schedule may miss the optimum, so batch entries
+        # where it costs more than the greedy schedule keep the greedy one
+        use_greedy = _net_costs(greedy, prices) < _net_costs(planned, prices)
+
+        def select(greedy_values: np.ndarray, planned_values: np.ndarray) -> np.ndarray:
+            condition = use_greedy.reshape(
+                use_greedy.shape + (1,) * (greedy_values.ndim - use_greedy.ndim)
+            )
+            return np.where(condition, greedy_values, planned_values)
+
+        return StorageFlows(
+            **{
+                field.name: select(
+                    getattr(greedy, field.name), getattr(planned, field.name)
+                )
+                for field in fields(StorageFlows)
+            }
+        )
+
+    def _candidates(
+        self,
+        level: np.ndarray,
+        capacity: np.ndarray,
+        shift: np.ndarray,
+        grid_levels: np.ndarray,
+    ) -> np.ndarray:
+        """
+        The storage levels considered for the end of a time step.
+
+        These are the level of the greedy strategy, the lowest level, the
+        highest level without charging from the grid, and the levels of the
+        grid clipped to the reachable range.
+
+        Args:
+            level:
+                Storage levels at the start of the time step, shape (batch, n).
+            capacity, shift:
+                Capacity and change of the greedy strategy, shape (batch,).
+            grid_levels:
+                The discretized levels, shape (batch, levels + 1).
+
+        Returns:
+            Array of shape (batch, n, levels + 4).
+        """
+        capacity = capacity[:, np.newaxis]
+        shift = shift[:, np.newaxis]
+        lowest = np.maximum(level + np.minimum(shift, 0.0), 0.0)
+        highest_from_surplus = np.minimum(level + np.maximum(shift, 0.0), capacity)
+        highest = (
+            np.broadcast_to(capacity, level.shape)
+            if self.grid_charging
+            else highest_from_surplus
+        )
+        greedy = np.clip(level + shift, 0.0, capacity)
+        return np.concatenate(
+            [
+                greedy[..., np.newaxis],
+                lowest[..., np.newaxis],
+                highest_from_surplus[..., np.newaxis],
+                np.clip(
+                    grid_levels[:, np.newaxis, :],
+                    lowest[..., np.newaxis],
+                    highest[..., np.newaxis],
+                ),
+            ],
+            axis=-1,
+        )
+
+
+def _net_costs(flows: StorageFlows, prices: PriceSeries) -> np.ndarray:
+    """Costs of buying minus revenue of selling over the series, shape (...)."""
+    return (
+        flows.energy_buy @ prices.energy_buy_eur_per_kWh
+        - prices.paid_sell(flows.energy_sell) @ prices.energy_sell_eur_per_kWh
+    )
+
+
+def _stored_energy_value(
+    prices: PriceSeries, num_time_steps: int, storage_efficiency: float
+) -> np.ndarray:
+    """
+    Value of each kWh in the storage after each time step, for the horizon ends.
+
+    Stored energy can at least be sold later, so it is worth the lowest sell
+    price of the remaining time steps times the efficiency, but not more than
+    the lowest remaining buy price. After the last time step it is worth
+    nothing.
+
+    Returns:
+        One value per time step from 0 to num_time_steps.
+    """
+    sell = np.asarray(prices.energy_sell_eur_per_kWh[:num_time_steps], dtype=float)
+    buy = np.asarray(prices.energy_buy_eur_per_kWh[:num_time_steps], dtype=float)
+    value = np.zeros(num_time_steps + 1)
+    # Energy left in the storage saves charging it from surplus later, at the
+    # lowest sell price, but it cannot save more than buying it later
+    value[:-1] = np.minimum(
+        np.minimum.accumulate(sell[::-1])[::-1] / storage_efficiency,
+        np.minimum.accumulate(buy[::-1])[::-1] * storage_efficiency,
+    )
+    return value
+
+
+def _step_costs(
+    level: np.ndarray,
+    candidates: np.ndarray,
+    net: np.ndarray,
+    prices: PriceSeries,
+    t: int,
+    storage_efficiency: float,
+) -> np.ndarray:
+    """
+    Costs of buying minus revenue of selling when moving to the candidates.
+
+    Args:
+        level:
+            Storage levels at the start of the time step, shape (batch, n).
+        candidates:
+            Storage levels at the end of the time step, shape (batch, n, m).
+        net:
+            Production minus consumption of the time step, shape (batch,).
+    """
+    change = candidates - level[..., np.newaxis]
+    grid = (
+        np.maximum(change, 0.0) / storage_efficiency
+        + np.minimum(change, 0.0) * storage_efficiency
+        - net[:, np.newaxis, np.newaxis]
+    )
+    limit = np.inf if prices.paid_sell_limit_kWh is None else prices.paid_sell_limit_kWh
+    costs = np.maximum(grid, 0.0) * prices.energy_buy_eur_per_kWh[t]
+    costs += np.clip(grid, -limit, 0.0) * prices.energy_sell_eur_per_kWh[t]
+    return costs
+
+
+def _interpolate(
+    values: np.ndarray, levels: np.ndarray, level_kWh: np.ndarray
+) -> np.ndarray:
+    """
+    Linear interpolation of the values at the discretized levels.
+
+    Args:
+        values:
+            Values at the discretized levels, shape (batch, levels + 1).
+        levels:
+            Storage levels, shape (batch, ...).
+        level_kWh:
+            Energy per discretized level, shape (batch,).
+    """
+    shape = levels.shape
+    levels = levels.reshape(len(levels), -1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        position = np.where(
+            level_kWh[:, np.newaxis] > 0, levels / level_kWh[:, np.newaxis], 0.0
+        )
+    lower = np.clip(np.floor(position), 0, values.shape[1] - 2).astype(np.intp)
+    fraction = position - lower
+    lower_values = np.take_along_axis(values, lower, axis=1)
+    upper_values = np.take_along_axis(values, lower + 1, axis=1)
+    return (lower_values + fraction * (upper_values - lower_values)).reshape(shape)
@@ -0,0 +1,281 @@
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.plot.datamodels import MonthlyData
+from home_energy_flow.plot.flow_accumulator import FlowAccumulator
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.orientation_index import OrientationIndex
+from home_energy_flow.production.pv_system import PVSystem
+from home_energy_flow.production.time_axis import TimeAxis
+from home_energy_flow.storage import compute_storage
+
+# Number of time steps per chunk: four weeks of hourly data.
+DEFAULT_CHUNK_SIZE = 24 * 7 * 4
+
+
+@dataclass(frozen=True)
+class SimulationChunk:
+    """The simulated energy flows in kWh of consecutive time steps."""
+
+    time: np.ndarray
+    production: np.ndarray
+    regular_consumption: np.ndarray
+    heatpump_consumption: np.ndarray
+    consumption: np.ndarray
+    energy_buy: np.ndarray
+    energy_sell: np.ndarray
+    self_usage: np.ndarray
+    # Energy in the storage at the end of each time step
+    stored: np.ndarray
+
+
+def time_step_hours(time: np.ndarray) -> float:
+    """Duration of the time steps in hours, estimated from the first time steps."""
+    return TimeAxis(np.asarray(time)).step_hours
+
+
+def select_time_range(
+    time: np.ndarray,
+    start: np.datetime64 | None = None,
+    end: np.datetime64 | None = None,
+) -> slice:
+    """The slice of the sorted times with start <= time < end."""
+    first = 0 if start is None else int(np.searchsorted(time, start, side="left"))
+    last = len(time) if end is None else int(np.searchsorted(time, end, side="left"))
+    return slice(first, last)
+
+
+def iter_chunk_slices(time_range: slice, chunk_size: int) -> Iterator[slice]:
+    for start in range(time_range.start, time_range.stop, chunk_size):
+        yield slice(start, min(start + chunk_size, time_range.stop))
+
+
+@dataclass(frozen=True)
+class _ConsumptionScaling:
+    """Scaling of the consumption profiles, computed in a pass before the simulation."""
+
+    first_year: int
+    first_day: int
+    # Scaling factor of the typical consumption weights, per year
+    regular_scaling: np.ndarray
+    # Consumption of the heat pump in kWh, per day
+    heatpump_daily_kWh: np.ndarray
+
+
+def _compute_consumption_scaling(
+    axis: TimeAxis,
+    T2m: np.ndarray,
+    time_range: slice,
+    chunk_size: int,
+    regular_consumption_kWh: float,
+    heatpump_system: HeatPumpSystem,
+) -> _ConsumptionScaling:
+    first_year = int(axis.year[time_range.start])
+    last_year = int(axis.year[time_range.stop - 1])
+    num_years = last_year - first_year + 1
+    # The scaling of a year depends on all its days, also those outside of
+    # the time range
+    scaling_range = slice(
+        axis.year_slice(first_year).start, axis.year_slice(last_year).stop
+    )
+    first_day = int(axis.day_index[scaling_range.start])
+    num_days = int(axis.day_index[scaling_range.stop - 1]) - first_day + 1
+
+    weights_per_year = np.zeros(num_years)
+    temp_diff_per_day = np.zeros(num_days)
+    for chunk in iter_chunk_slices(scaling_range, chunk_size):
+        weights_per_year += np.bincount(
+            axis.year[chunk] - first_year,
+            weights=consumption_profiles.typical_consumption_weights(axis.hour[chunk]),
+            minlength=num_years,
+        )
+        temp_diff_per_day += np.bincount(
+            axis.day_index[chunk] - first_day,
+            weights=np.maximum(heatpump_system.heating_turnoff_temp - T2m[chunk], 0.0),
+            minlength=num_days,
+        )
+
+    # Each calendar year consumes the yearly consumption, also if the data
+    # covers only part of it, as in consumption_profiles
+    regular_scaling = np.divide(
+        regular_consumption_kWh,
+        weights_per_year,
+        out=np.zeros(num_years),
+        where=weights_per_year > 0,
+    )
+    year_of_day = (
+        np.arange(first_day, first_day + num_days)
+        .astype("datetime64[D]")
+        .astype("datetime64[Y]")
+        .astype(np.int64)
+        + 1970
+        - first_year
+    )
+    temp_diff_per_year = np.bincount(
+        year_of_day, weights=temp_diff_per_day, minlength=num_years
+    )
+    heatpump_scaling = np.array(
+        [
+            consumption_profiles.heatpump_scaling_factor(heatpump_system, total)
+            for total in temp_diff_per_year.tolist()
+        ]
+    )
+    return _ConsumptionScaling(
+        first_year=first_year,
+        first_day=first_day,
+        regular_scaling=regular_scaling,
+        heatpump_daily_kWh=temp_diff_per_day * heatpump_scaling[year_of_day],
+    )
+
+
+def simulate_stream(
+    pv_system: PVSystem,
+    datasets: list[MeteoDataset],
+    regular_consumption_kWh: float,
+    heatpump_system: HeatPumpSystem,
+    storage_kWh: float,
+    storage_efficiency: float = 0.9,
+    start: np.datetime64 | None = None,
+    end: np.datetime64 | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    accumulators: Sequence[FlowAccumulator] = (),
+) -> Iterator[SimulationChunk]:
+    """
+    Simulate the energy flow chunk by chunk over any span of the meteo data.
+
+    Production, consumption and storage are computed per chunk of time steps
+    and the storage level carries over from one chunk to the next, so the
+    memory does not grow with the length of the span. The consumption
+    profiles are scaled in a first pass over the time and temperature
+    columns of the calendar years of the span, such that each year consumes
+    the yearly consumption, as in main. If start or end lie within a year,
+    only its simulated part is yielded, with the consumption it has in the
+    whole year. As in main, a year the data covers only partly consumes the
+    whole yearly consumption in the covered part.
+    Data with time steps shorter than an hour, e.g. 15 minutes, is supported.
+
+    Args:
+        pv_system:
+            The PV system.
+        datasets:
+            The meteo data of all orientations, with the same times. Memory
+            mapped columns are only read chunk by chunk.
+        regular_consumption_kWh:
+            Regular consumption per year in kWh.
+        heatpump_system:
+            The heat pump system.
+        storage_kWh:
+            Total storage capacity in kWh.
+        storage_efficiency:
+            Charge and discharge efficiency of the storage.
+        start:
+            First time to simulate, defaults to the start of the data.
+        end:
+            Time after the last time to simulate, defaults to the end of the data.
+        chunk_size:
+            Number of time steps per chunk.
+        accumulators:
+            Accumulators that are updated with each chunk before it is
+            yielded, e.g. to aggregate by month and by hour of the day in the
+            same pass.
+
+    Yields:
+        The simulated energy flows, one SimulationChunk per chunk.
+    """
+    columns = datasets[0].columns
+    axis = columns.axis
+    time_range = select_time_range(columns.time, start, end)
+    if time_range.start >= time_range.stop:
+        return
+    step_hours = axis.step_hours
+    scaling = _compute_consumption_scaling(
+        axis,
+        columns.T2m,
+        time_range,
+        chunk_size,
+        regular_consumption_kWh,
+        heatpump_system,
+    )
+    hours_per_day = consumption_profiles.heating_hours(heatpump_system)
+    index = OrientationIndex(datasets)
+    module_datasets = [
+        datasets[index.dataset_index(module)] for module in pv_system.modules
+    ]
+
+    stored = 0.0
+    for chunk in iter_chunk_slices(time_range, chunk_size):
+        time = columns.time[chunk]
+        for dataset in module_datasets:
+            assert np.array_equal(dataset.columns.time[chunk], time), (
+                "Times of solar data sets do not match"
+            )
+
+        production = compute_production.compute_production_from_irradiance(
+            pv_system,
+            [dataset.columns.G_i[chunk] for dataset in module_datasets],
+            num_time_steps=len(time),
+            time_step_hours=step_hours,
+        )
+
+        hours = axis.hour[chunk]
+        regular_consumption = (
+            consumption_profiles.typical_consumption_weights(hours)
+            * (scaling.regular_scaling[axis.year[chunk] - scaling.first_year])
+        )
+
+        days = axis.day_index[chunk] - scaling.first_day
+        heatpump_consumption = np.zeros(len(time))
+        if hours_per_day > 0:
+            is_heating = consumption_profiles.heating_hour_mask(hours, heatpump_system)
+            heatpump_consumption[is_heating] = (
+                scaling.heatpump_daily_kWh[days[is_heating]]
+                / hours_per_day
+                * step_hours
+            )
+        consumption = regular_consumption + heatpump_consumption
+
+        flows = compute_storage.simulate_storage(
+            production,
+            consumption,
+            storage_kWh=storage_kWh,
+            storage_efficiency=storage_efficiency,
+            initial_storage_kWh=stored,
+        )
+        stored = float(flows.final_stored)
+        simulation_chunk = SimulationChunk(
+            time=time,
+            production=production,
+            regular_consumption=regular_consumption,
+            heatpump_consumption=heatpump_consumption,
+            consumption=consumption,
+            energy_buy=flows.energy_buy,
+            energy_sell=flows.energy_sell,
+            self_usage=flows.self_usage,
+            stored=flows.stored,
+        )
+        for accumulator in accumulators:
+            accumulator.add_chunk(
+                simulation_chunk, ids=axis.bucket_ids(accumulator.bucket)[chunk]
+            )
+        yield simulation_chunk
+
+
+def aggregate_monthly_stream(
+    chunks: Iterable[SimulationChunk],
+) -> dict[int, list[MonthlyData]]:
+    """
+    Sum up the simulated energy flows per month while consuming the chunks.
+
+    Returns:
+        For each calendar year, the monthly data of all series as returned by
+        aggregate_monthly_data.
+    """
+    accumulator = FlowAccumulator(bucket="month")
+    for chunk in chunks:
+        accumulator.add_chunk(chunk)
+    return accumulator.to_monthly_data()
@@ -0,0 +1,242 @@
+import itertools
+import json
+from collections import defaultdict
+from collections.abc import Iterable
+
+import numpy as np
+from pydantic import BaseModel
+
+from home_energy_flow import export
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.consumption.load_profiles import StandardLoadProfile
+from home_energy_flow.instrumentation import stage
+from home_energy_flow.kpis import YearlyKPIs, compute_yearly_kpis_batch
+from home_energy_flow.prices import Prices, PriceSeries, Tariff
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.meteo_catalog import MeteoCatalog
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.orientation_index import OrientationIndex
+from home_energy_flow.production.pv_system import PVSystem
+from home_energy_flow.storage import compute_storage
+from home_energy_flow.storage.dispatch import DispatchStrategy
+
+# Number of PV systems whose production is computed in one batch. Bounds the
+# memory to PRODUCTION_BATCH_SIZE production arrays at a time.
+PRODUCTION_BATCH_SIZE = 256
+
+
+class Scenario(BaseModel):
+    pv_system: PVSystem
+    storage_kWh: float
+    regular_consumption_kWh: float
+    heatpump_system: HeatPumpSystem
+
+
+class ScenarioResult(YearlyKPIs):
+    """The yearly KPIs of one scenario, the index refers to the list of scenarios."""
+
+    scenario_index: int
+
+
+def scenario_grid(
+    pv_systems: Iterable[PVSystem],
+    storage_kWh: Iterable[float],
+    regular_consumption_kWh: Iterable[float],
+    heatpump_systems: Iterable[HeatPumpSystem],
+) -> list[Scenario]:
+    """All combinations of the given PV systems, storages and consumptions."""
+    return [
+        Scenario(
+            pv_system=pv_system,
+            storage_kWh=storage,
+            regular_consumption_kWh=regular_consumption,
+            heatpump_system=heatpump_system,
+        )
+        for pv_system, storage, regular_consumption, heatpump_system in (
+            itertools.product(
+                pv_systems, storage_kWh, regular_consumption_kWh, heatpump_systems
+            )
+        )
+    ]
+
+
+def load_sweep_datasets(
+    scenarios: list[Scenario], year: int, interpolate: bool = False
+) -> list[MeteoDataset]:
+    """
+    Load the meteo data of the orientations of all scenarios from the catalog.
+
+    Each file is loaded once, even if several scenarios use its orientation.
+    See MeteoCatalog.load for interpolate.
+    """
+    modules = [
+        module for scenario in scenarios for module in scenario.pv_system.modules
+    ]
+    return MeteoCatalog.scan().load(
+        PVSystem(modules=modules), year, interpolate=interpolate
+    )
+
+
+def run_sweep(
+    scenarios: list[Scenario],
+    year: int,
+    prices: Tariff | None = None,
+    datasets: list[MeteoDataset] | None = None,
+    interpolate: bool = False,
+    dispatch: DispatchStrategy | None = None,
+    load_profile: StandardLoadProfile | None = None,
+    hourly_writer: export.HourlyWriter | None = None,
+) -> list[ScenarioResult]:
+    """
+    Simulate many scenarios against the meteo data of one year.
+
+    The meteo data is loaded once. The production of every distinct PV system
+    and the consumption of every distinct combination of regular consumption
+    and heat pump are computed once and shared by all scenarios using them.
+    All storage sizes of scenarios with the same production and consumption
+    are simulated in one call of simulate_storage. Nothing is printed or
+    plotted.
+
+    Args:
+        scenarios:
+            The scenarios to simulate, e.g. from scenario_grid.
+        year:
+            The year of the meteo data to simulate.
+        prices:
+            The prices used to compute the gain, defaults to Prices(). Can
+            be any Tariff, e.g. a TimeOfUseTariff.
+        datasets:
+            Meteo data of the orientations of the scenarios, restricted to the
+            year. Loaded with load_sweep_datasets if not given, pass it to
+            reuse it between sweeps.
+        interpolate:
+            Interpolate the irradiance of module orientations without meteo
+            data, e.g. to compare roof layouts, see
+            compute_production.compute_production_batch.
+        dispatch:
+            The strategy deciding when the storage is charged and discharged,
+            e.g. a RollingHorizonDispatch planning with the prices. Defaults
+            to charging from surplus and discharging on deficit, as
+            simulate_storage.
+        load_profile:
+            Standard load profile of the regular consumption, e.g.
+            load_profiles.H0. Defaults to the typical daily profile.
+        hourly_writer:
+            Receives the hourly results of each scenario as soon as its batch
+            is simulated, e.g. an export.ParquetHourlyWriter. Otherwise only
+            the yearly KPIs are kept.
+
+    Returns:
+        One result per scenario, in the order of the scenarios.
+    """
+    if prices is None:
+        prices = Prices()
+    if not scenarios:
+        return []
+    if datasets is None:
+        datasets = load_sweep_datasets(scenarios, year, interpolate)
+
+    columns = datasets[0].columns
+    # The prices of a tariff are looked up once for all scenarios
+    price_series = (
+        prices if isinstance(prices, Prices) else prices.price_series(columns.time)
+    )
+    dispatch_prices = (
+        price_series
+        if isinstance(price_series, PriceSeries)
+        else price_series.price_series(columns.time)
+    )
+    consumption_cache: dict[str, np.ndarray] = {}
+
+    def total_consumption(key: str, scenario: Scenario) -> np.ndarray:
+        if key not in consumption_cache:
+            regular = consumption_profiles.regular_consumption_for_columns(
+                columns,
+                yearly_consumption_kWh=scenario.regular_consumption_kWh,
+                load_profile=load_profile,
+            )
+            heatpump = consumption_profiles.heatpump_consumption_for_columns(
+                columns,
+                heatpump_system=scenario.heatpump_system,
+            )
+            consumption_cache[key] = np.add(regular, heatpump)
+        return consumption_cache[key]
+
+    # Group the scenarios by PV system to compute each production only once,
+    # and within that by consumption to simulate all storage sizes at once.
+    scenarios_per_system: dict[str, dict[str, list[int]]] = defaultdict(
+        lambda: defaultdict(list)
+    )
+    for i, scenario in enumerate(scenarios):
+        consumption_key = consumption_key_of(scenario)
+        scenarios_per_system[scenario.pv_system.model_dump_json()][
+            consumption_key
+        ].append(i)
+    system_keys = list(scenarios_per_system)
+
+    results: list[ScenarioResult | None] = [None] * len(scenarios)
+    index = OrientationIndex(datasets)
+    for start in range(0, len(system_keys), PRODUCTION_BATCH_SIZE):
+        batch_keys = system_keys[start : start + PRODUCTION_BATCH_SIZE]
+        systems = [
+            scenarios[next(iter(scenarios_per_system[key].values()))[0]].pv_system
+            for key in batch_keys
+        ]
+        _, production_batch = compute_production.compute_production_batch(
+            systems, datasets, interpolate, index
+        )
+        for key, production in zip(batch_keys, production_batch):
+            for consumption_key, indices in scenarios_per_system[key].items():
+                consumption = total_consumption(consumption_key, scenarios[indices[0]])
+                storage_kWh = np.array([scenarios[i].storage_kWh for i in indices])
+                if dispatch is None:
+                    flows = compute_storage.simulate_storage(
+                        production, consumption, storage_kWh=storage_kWh
+                    )
+                else:
+                    flows = dispatch.dispatch(
+                        production,
+                        consumption,
+                        dispatch_prices,
+                        storage_kWh=storage_kWh,
+                    )
+                if hourly_writer is not None:
+                    with stage("export", rows=len(indices) * len(columns)):
+                        batch_columns = export.hourly_columns(
+                            production, consumption, flows
+                        )
+                        for j, i in enumerate(indices):
+                            hourly_writer.write(
+                                i,
+                                columns.time,
+                                {
+                                    name: values[j]
+                                    for name, values in batch_columns.items()
+                                },
+                            )
+                batch_kpis = compute_yearly_kpis_batch(
+                    production, consumption, flows, price_series
+                )
+                for i, kpis in zip(indices, batch_kpis):
+                    results[i] = ScenarioResult(scenario_index=i, **kpis.model_dump())
+    return [result for result in results if result is not None]
+
+
+def consumption_key_of(scenario: Scenario) -> str:
+    """Scenarios with the same key have the same consumption profile."""
+    return json.dumps(
+        [
+            scenario.regular_consumption_kWh,
+            scenario.heatpump_system.model_dump(mode="json"),
+        ]
+    )
+
+
+def results_to_columns(results: list[ScenarioResult]) -> dict[str, list]:
+    """Convert the results into a table with one list per KPI, e.g. for pandas."""
+    columns: dict[str, list] = {name: [] for name in ScenarioResult.model_fields}
+    for result in results:
+        for name, value in result.model_dump().items():
+            columns[name].append(value)
+    return columns
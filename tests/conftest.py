@@ -0,0 +1,48 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from home_energy_flow.production import meteo_cache, meteo_load
+from home_energy_flow.production.meteo_columns import MeteoDataset
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+METEO_FILES = [REPO_ROOT / path for path in meteo_load.METEO_FILES]
+
+
+@pytest.fixture(scope="session")
+def datasets() -> list[MeteoDataset]:
+    """The bundled meteo data of all orientations, parsed without the cache."""
+    return [
+        meteo_load.load_meteo_dataset(path, use_cache=False) for path in METEO_FILES
+    ]
+
+
+@pytest.fixture
+def in_repo(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Run in the repository, with the meteo cache in a temporary directory."""
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setenv(meteo_cache.CACHE_DIR_ENV_VARIABLE, str(tmp_path))
+
+
+@pytest.fixture
+def empty_meteo_file(tmp_path: Path) -> Path:
+    """A PVGIS file with the header of the bundled data and no hourly entries."""
+    with open(METEO_FILES[0]) as file:
+        data = json.load(file)
+    data["outputs"]["hourly"] = []
+    path = tmp_path / "empty" / METEO_FILES[0].name
+    path.parent.mkdir()
+    with open(path, "w") as file:
+        json.dump(data, file)
+    return path
+
+
+@pytest.fixture
+def meteo_file(tmp_path: Path) -> Path:
+    """A copy of one bundled PVGIS file, which the test may modify."""
+    path = tmp_path / METEO_FILES[0].name
+    shutil.copy2(METEO_FILES[0], path)
+    return path
@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.meteo_datamodels import TimeSeriesEntry
+
+HEATPUMP_SYSTEMS = [
+    HeatPumpSystem(yearly_electricity_consumption_kWh=5000.0),
+    HeatPumpSystem(
+        yearly_electricity_consumption_kWh=3500.0,
+        heating_turnoff_temp=13.0,
+        heating_times=[(0, 24)],
+    ),
+    HeatPumpSystem(
+        yearly_electricity_consumption_kWh=2000.0, heating_times=[(6, 9), (17, 22)]
+    ),
+]
+
+
+def _reference_heatpump_consumption(
+    entries: list[TimeSeriesEntry], heatpump_system: HeatPumpSystem
+) -> list[float]:
+    """The loop of the list-based generate_heatpump_consumption_profile."""
+    daily_temp_diff: dict[tuple[int, int, int], float] = defaultdict(float)
+    for entry in entries:
+        day_key = (entry.time.year, entry.time.month, entry.time.day)
+        daily_temp_diff[day_key] += max(
+            heatpump_system.heating_turnoff_temp - entry.T2m, 0
+        )
+
+    total_temp_diff = sum(daily_temp_diff.values())
+    scaling_factor = (
+        heatpump_system.yearly_electricity_consumption_kWh / total_temp_diff
+        if total_temp_diff > 0
+        else 0
+    )
+    daily_consumption_kWh = {
+        day: temp_diff * scaling_factor for day, temp_diff in daily_temp_diff.items()
+    }
+
+    heating_hours = sum(end - start for start, end in heatpump_system.heating_times)
+    profile = []
+    for entry in entries:
+        day_key = (entry.time.year, entry.time.month, entry.time.day)
+        is_heating_hour = any(
+            start <= entry.time.hour < end
+            for start, end in heatpump_system.heating_times
+        )
+        if is_heating_hour and heating_hours > 0:
+            profile.append(daily_consumption_kWh.get(day_key, 0) / heating_hours)
+        else:
+            profile.append(0.0)
+    return profile
+
+
+@pytest.mark.parametrize("year", [2020, 2023, 1999])
+def test_heatpump_array_equals_the_loop(
+    datasets: list[MeteoDataset], year: int
+) -> None:
+    # The data has no 1999, which gives a series without time steps
+    columns = datasets[0].columns.select_year(year)
+    entries = columns.to_time_series_entries()
+
+    for heatpump_system in HEATPUMP_SYSTEMS:
+        expected = _reference_heatpump_consumption(entries, heatpump_system)
+        array = consumption_profiles.heatpump_consumption_array(
+            columns.axis, columns.T2m, heatpump_system
+        )
+        batch = consumption_profiles.heatpump_consumption_batch(
+            columns.axis,
+            columns.T2m,
+            heatpump_system,
+            np.array([heatpump_system.heating_turnoff_temp]),
+        )
+
+        assert array.tolist() == expected
+        assert (
+            consumption_profiles.generate_heatpump_consumption_profile(
+                entries, heatpump_system
+            )
+            == expected
+        )
+        np.testing.assert_allclose(batch[0], expected, rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("year", [2020, 2023, 1999])
+def test_typical_array_equals_the_list_profile(
+    datasets: list[MeteoDataset], year: int
+) -> None:
+    columns = datasets[0].columns.select_year(year)
+    entries = columns.to_time_series_entries()
+
+    expected = consumption_profiles.generate_typical_consumption_profile(
+        entries, 1500.0
+    )
+    array = consumption_profiles.typical_consumption_array(columns.axis, 1500.0)
+
+    assert array.tolist() == expected
+    if entries:
+        assert sum(expected) == pytest.approx(1500.0)
@@ -0,0 +1,106 @@
+import numpy as np
+
+from home_energy_flow.prices import Prices, PriceSeries, TimeOfUseTariff
+from home_energy_flow.storage.compute_storage import StorageFlows
+from home_energy_flow.storage.dispatch import GreedyDispatch, RollingHorizonDispatch
+
+CAPACITIES_KWH = np.array([1.0, 2.0, 5.0, 10.0])
+
+
+def _series(days: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Times, production and consumption of a household with a PV system."""
+    rng = np.random.default_rng(seed)
+    hour = np.arange(days * 24) % 24
+    sunshine = rng.uniform(0.2, 1.5, days).repeat(24)
+    production = 3.0 * np.clip(np.sin((hour - 6) / 12 * np.pi), 0.0, None) * sunshine
+    consumption = 0.3 + 0.5 * ((hour >= 17) & (hour <= 22))
+    consumption = consumption + rng.uniform(0.0, 0.3, len(hour))
+    time = np.datetime64("2023-06-01T00") + np.arange(len(hour)).astype(
+        "timedelta64[h]"
+    )
+    return time, production, consumption
+
+
+def _net_costs(flows: StorageFlows, prices: PriceSeries) -> np.ndarray:
+    return (
+        flows.energy_buy @ prices.energy_buy_eur_per_kWh
+        - prices.paid_sell(flows.energy_sell) @ prices.energy_sell_eur_per_kWh
+    )
+
+
+def test_flat_prices_give_the_greedy_schedule() -> None:
+    time, production, consumption = _series(days=14)
+    # End with a night without production, so no energy is left unused
+    production[-12:] = 0.0
+    consumption[-12:] += 1.0
+    prices = Prices().price_series(time)
+
+    greedy = GreedyDispatch().dispatch(
+        production, consumption, prices, storage_kWh=CAPACITIES_KWH
+    )
+    planned = RollingHorizonDispatch().dispatch(
+        production, consumption, prices, storage_kWh=CAPACITIES_KWH
+    )
+
+    assert np.allclose(greedy.final_stored, 0.0)
+    np.testing.assert_allclose(planned.stored, greedy.stored, atol=1e-9)
+    np.testing.assert_allclose(planned.energy_buy, greedy.energy_buy, atol=1e-9)
+
+
+def test_costs_are_never_above_greedy() -> None:
+    tariffs = [
+        Prices(),
+        TimeOfUseTariff([0.22] * 6 + [0.34] * 16 + [0.22] * 2),
+        TimeOfUseTariff([0.22] * 6 + [0.34] * 16 + [0.22] * 2, feed_in_limit_kW=1.0),
+    ]
+    for seed in range(3):
+        time, production, consumption = _series(days=10, seed=seed)
+        for tariff in tariffs:
+            prices = tariff.price_series(time)
+            greedy = GreedyDispatch().dispatch(
+                production, consumption, prices, storage_kWh=CAPACITIES_KWH
+            )
+            for dispatch in [
+                RollingHorizonDispatch(),
+                RollingHorizonDispatch(horizon_steps=24, commit_steps=24),
+                RollingHorizonDispatch(grid_charging=False),
+            ]:
+                planned = dispatch.dispatch(
+                    production, consumption, prices, storage_kWh=CAPACITIES_KWH
+                )
+                assert np.all(
+                    _net_costs(planned, prices) <= _net_costs(greedy, prices) + 1e-9
+                )
+
+
+def test_no_energy_is_charged_for_after_the_end() -> None:
+    time, production, consumption = _series(days=3)
+    # End in the afternoon, after the surplus of the last day
+    time, production, consumption = time[:-8], production[:-8], consumption[:-8]
+    prices = Prices().price_series(time)
+
+    greedy = GreedyDispatch().dispatch(
+        production, consumption, prices, storage_kWh=CAPACITIES_KWH
+    )
+    planned = RollingHorizonDispatch().dispatch(
+        production, consumption, prices, storage_kWh=CAPACITIES_KWH
+    )
+
+    assert np.all(greedy.final_stored > 0.5)
+    np.testing.assert_allclose(planned.final_stored, 0.0, atol=1e-9)
+    assert np.all(_net_costs(planned, prices) < _net_costs(greedy, prices))
+
+
+def test_empty_series() -> None:
+    prices = Prices().price_series(np.array([], dtype="datetime64[h]"))
+
+    flows = RollingHorizonDispatch().dispatch(
+        np.zeros(0),
+        np.zeros(0),
+        prices,
+        storage_kWh=CAPACITIES_KWH,
+        initial_storage_kWh=0.5,
+    )
+
+    assert flows.stored.shape == (len(CAPACITIES_KWH), 0)
+    np.testing.assert_array_equal(flows.final_stored, 0.5)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from home_energy_flow.consumption.load_profiles import H0, load_profile_array
+from home_energy_flow.production.time_axis import TimeAxis
+
+
+def _axis(step_minutes: int, num_steps: int) -> TimeAxis:
+    return TimeAxis(
+        np.datetime64("2023-01-01T00:00")
+        + np.arange(num_steps) * np.timedelta64(step_minutes, "m")
+    )
+
+
+def test_quarter_hours_sum_up_to_the_hours() -> None:
+    hourly = load_profile_array(_axis(60, 8760), H0, 1000.0)
+    quarter_hourly = load_profile_array(_axis(15, 4 * 8760), H0, 1000.0)
+
+    np.testing.assert_allclose(quarter_hourly.reshape(-1, 4).sum(axis=-1), hourly)
+
+
+def test_unsupported_resolution_is_rejected() -> None:
+    with pytest.raises(ValueError, match="steps of 10 minutes"):
+        load_profile_array(_axis(10, 100), H0, 1000.0)
@@ -0,0 +1,73 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+from home_energy_flow.production import meteo_cache, meteo_load
+from home_energy_flow.production.meteo_columns import VALUE_COLUMNS, MeteoDataset
+
+
+def _assert_same_dataset(loaded: MeteoDataset, expected: MeteoDataset) -> None:
+    assert loaded.inputs == expected.inputs
+    for name in ("time",) + VALUE_COLUMNS:
+        np.testing.assert_array_equal(
+            getattr(loaded.columns, name), getattr(expected.columns, name)
+        )
+
+
+def test_cached_columns_equal_the_pydantic_data(
+    meteo_file: Path, tmp_path: Path
+) -> None:
+    cache_dir = tmp_path / "cache"
+    solar_data = meteo_load.load_solar_radiation_data(meteo_file)
+
+    parsed = meteo_load.load_meteo_dataset(meteo_file, cache_dir=cache_dir)
+    cached = meteo_load.load_meteo_dataset(meteo_file, cache_dir=cache_dir)
+
+    assert isinstance(cached.columns.G_i, np.memmap)
+    assert not cached.columns.G_i.flags.writeable
+    _assert_same_dataset(cached, parsed)
+    assert cached.inputs == solar_data.inputs
+    assert cached.columns.to_time_series_entries() == solar_data.outputs.hourly
+    # 2020 is a leap year
+    for year, num_hours in [(2020, 8784), (2023, 8760)]:
+        entries = [
+            entry for entry in solar_data.outputs.hourly if entry.time.year == year
+        ]
+        assert len(entries) == num_hours
+        assert cached.select_year(year).columns.to_time_series_entries() == entries
+
+
+def test_empty_series_round_trip(empty_meteo_file: Path, tmp_path: Path) -> None:
+    cache_dir = tmp_path / "cache"
+
+    parsed = meteo_load.load_meteo_dataset(empty_meteo_file, cache_dir=cache_dir)
+    cached = meteo_cache.read_cache(empty_meteo_file, cache_dir)
+
+    assert cached is not None
+    assert len(cached.columns) == 0
+    _assert_same_dataset(cached, parsed)
+
+
+def test_cache_is_invalidated_by_mtime_and_size(
+    meteo_file: Path, tmp_path: Path
+) -> None:
+    cache_dir = tmp_path / "cache"
+    meteo_load.load_meteo_dataset(meteo_file, cache_dir=cache_dir)
+    assert meteo_cache.read_cache(meteo_file, cache_dir) is not None
+
+    stat = meteo_file.stat()
+    os.utime(meteo_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert meteo_cache.read_cache(meteo_file, cache_dir) is None
+
+    # Rewrite the cache, then change the size but keep the modification time
+    meteo_load.load_meteo_dataset(meteo_file, cache_dir=cache_dir)
+    stat = meteo_file.stat()
+    with open(meteo_file, "a") as file:
+        file.write("\n")
+    os.utime(meteo_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert meteo_file.stat().st_mtime_ns == stat.st_mtime_ns
+    assert meteo_cache.read_cache(meteo_file, cache_dir) is None
+
+    reloaded = meteo_load.load_meteo_dataset(meteo_file, cache_dir=cache_dir)
+    _assert_same_dataset(reloaded, meteo_load.parse_meteo_dataset(meteo_file))
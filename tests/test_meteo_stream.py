@@ -0,0 +1,61 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from home_energy_flow.production import meteo_load, meteo_stream
+from home_energy_flow.production.meteo_columns import VALUE_COLUMNS
+
+
+def test_streamed_columns_equal_the_pydantic_data(meteo_file: Path) -> None:
+    solar_data = meteo_load.load_solar_radiation_data(meteo_file)
+    parsed = meteo_load.parse_meteo_dataset(meteo_file)
+
+    # A small block size makes entries and numbers span several blocks
+    for block_size in (meteo_stream.DEFAULT_BLOCK_SIZE, 997):
+        streamed = meteo_stream.stream_meteo_dataset(meteo_file, block_size)
+
+        assert streamed.inputs == solar_data.inputs
+        assert streamed.columns.to_time_series_entries() == solar_data.outputs.hourly
+        for name in ("time",) + VALUE_COLUMNS:
+            np.testing.assert_array_equal(
+                getattr(streamed.columns, name), getattr(parsed.columns, name)
+            )
+    # 2020 is a leap year
+    for year, num_hours in [(2020, 8784), (2023, 8760)]:
+        assert len(streamed.columns.select_year(year)) == num_hours
+    assert meteo_stream.read_inputs(meteo_file) == solar_data.inputs
+
+
+def test_trusted_lazy_entries_equal_the_pydantic_data(meteo_file: Path) -> None:
+    solar_data = meteo_load.load_solar_radiation_data(meteo_file)
+
+    lazy = meteo_load.load_solar_radiation_data(meteo_file, trusted=True)
+
+    assert lazy.inputs == solar_data.inputs
+    assert len(lazy.outputs.hourly) == len(solar_data.outputs.hourly)
+    assert lazy.outputs.hourly[0] == solar_data.outputs.hourly[0]
+    assert lazy.outputs.hourly[-1] == solar_data.outputs.hourly[-1]
+    assert list(lazy.outputs.hourly) == solar_data.outputs.hourly
+
+
+def test_empty_series(empty_meteo_file: Path) -> None:
+    streamed = meteo_stream.stream_meteo_dataset(empty_meteo_file)
+    parsed = meteo_load.parse_meteo_dataset(empty_meteo_file)
+
+    assert streamed.inputs == parsed.inputs
+    assert len(streamed.columns) == 0
+    assert streamed.columns.time.dtype == parsed.columns.time.dtype
+
+
+def test_schema_of_the_first_entry_is_checked(meteo_file: Path, tmp_path: Path) -> None:
+    with open(meteo_file) as file:
+        data = json.load(file)
+    data["outputs"]["hourly"][0]["G(i)"] = "0.0"
+    path = tmp_path / "invalid.json"
+    with open(path, "w") as file:
+        json.dump(data, file)
+
+    with pytest.raises(TypeError, match="G\\(i\\)"):
+        meteo_stream.stream_meteo_dataset(path)
@@ -0,0 +1,16 @@
+import numpy as np
+
+from home_energy_flow.prices import TimeOfUseTariff
+from home_energy_flow.production.time_axis import TimeAxis
+
+
+def test_feed_in_limit_uses_the_step_length_of_the_time_axis() -> None:
+    time = np.datetime64("2023-06-01T00:00") + np.arange(96) * np.timedelta64(15, "m")
+    # A gap at the start must not change the step length
+    time[0] -= np.timedelta64(1, "h")
+    tariff = TimeOfUseTariff([0.3] * 24, feed_in_limit_kW=0.8)
+
+    prices = tariff.price_series(time)
+
+    assert TimeAxis(time).step_hours == 0.25
+    assert prices.paid_sell_limit_kWh == 0.2
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.datamodels import Azimuth, Slope
+from home_energy_flow.production.meteo_columns import (
+    VALUE_COLUMNS,
+    MeteoColumns,
+    MeteoDataset,
+)
+from home_energy_flow.production.meteo_datamodels import SolarRadiationData
+from home_energy_flow.production.pv_system import Modules, PVSystem
+
+PV_SYSTEM = PVSystem(
+    modules=[
+        Modules(slope=Slope(value=90), azimuth=Azimuth.EAST(), kWP=0.5, n=4),
+        Modules(slope=Slope(value=90), azimuth=Azimuth.WEST(), kWP=0.5, n=4),
+        Modules(slope=Slope(value=30), azimuth=Azimuth.SOUTH(), kWP=0.445, n=3),
+    ],
+    maximum_power_kW=1.2,
+)
+
+
+def _quarter_hourly(dataset: MeteoDataset) -> MeteoDataset:
+    """The dataset with each hour split into four quarter hours of equal values."""
+    columns = dataset.columns
+    offsets = np.arange(4) * np.timedelta64(15, "m")
+    time = (columns.time[:, np.newaxis] + offsets).reshape(-1)
+    values = {name: np.repeat(getattr(columns, name), 4) for name in VALUE_COLUMNS}
+    return MeteoDataset(
+        inputs=dataset.inputs, columns=MeteoColumns(time=time, **values)
+    )
+
+
+def test_sub_hourly_production_is_scaled_by_the_step_length(
+    datasets: list[MeteoDataset],
+) -> None:
+    hourly = [dataset.select_year(2023) for dataset in datasets]
+    quarter_hourly = [_quarter_hourly(dataset) for dataset in hourly]
+
+    _, expected = compute_production.compute_production_array(PV_SYSTEM, hourly)
+    _, array = compute_production.compute_production_array(PV_SYSTEM, quarter_hourly)
+    _, batch = compute_production.compute_production_batch([PV_SYSTEM], quarter_hourly)
+    cached = compute_production.compute_production_cached(PV_SYSTEM, quarter_hourly)
+
+    for production in [array, batch[0], cached]:
+        np.testing.assert_allclose(
+            production.reshape(-1, 4).sum(axis=-1), expected, atol=1e-12
+        )
+
+
+def _reference_production(
+    system: PVSystem, all_solar_data: list[SolarRadiationData]
+) -> list[float]:
+    """The loop of the list-based compute_production."""
+    production_per_module = [
+        compute_production.compute_production_single_module(
+            module,
+            compute_production.solar_data_for_module(
+                module, all_solar_data
+            ).outputs.hourly,
+            system.performance_ratio,
+        )
+        for module in system.modules
+    ]
+    total_production = [
+        sum(production[i] for production in production_per_module)
+        for i in range(len(all_solar_data[0].outputs.hourly))
+    ]
+    if system.maximum_power_kW is not None:
+        total_production = [
+            min(production, system.maximum_power_kW) for production in total_production
+        ]
+    return total_production
+
+
+@pytest.mark.parametrize("year", [2020, 2023, 1999])
+def test_array_production_equals_the_loop(
+    datasets: list[MeteoDataset], year: int
+) -> None:
+    # The data has no 1999, which gives a series without time steps
+    year_datasets = [dataset.select_year(year) for dataset in datasets]
+    solar_data = [dataset.to_solar_radiation_data() for dataset in year_datasets]
+    systems = [
+        PV_SYSTEM,
+        PV_SYSTEM.model_copy(update={"maximum_power_kW": None}),
+        PVSystem(
+            modules=[
+                Modules(slope=Slope(value=45), azimuth=Azimuth.WEST(), kWP=0.4, n=7)
+            ],
+            performance_ratio=0.8,
+        ),
+    ]
+
+    _, batch = compute_production.compute_production_batch(systems, year_datasets)
+    for system, batch_production in zip(systems, batch):
+        expected = _reference_production(system, solar_data)
+        _, array = compute_production.compute_production_array(system, year_datasets)
+        _, production = compute_production.compute_production(system, solar_data)
+        cached = compute_production.compute_production_cached(system, year_datasets)
+
+        assert array.tolist() == expected
+        assert production == expected
+        # The batch and the cached production sum the modules of each
+        # orientation first, which can change the last digits
+        np.testing.assert_allclose(batch_production, expected, rtol=1e-12)
+        np.testing.assert_allclose(cached, expected, rtol=1e-12)
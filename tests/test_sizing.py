@@ -0,0 +1,49 @@
+import numpy as np
+
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.consumption.load_profiles import H0
+from home_energy_flow.production.datamodels import Azimuth, Slope
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.pv_system import Modules
+from home_energy_flow.sizing import SizingSpace, optimize_sizing
+from home_energy_flow.sweep import Scenario, run_sweep
+
+HEATPUMP_SYSTEM = HeatPumpSystem(yearly_electricity_consumption_kWh=3000.0)
+
+
+def test_front_with_a_load_profile_matches_the_sweep(
+    datasets: list[MeteoDataset],
+) -> None:
+    year_datasets = [dataset.select_year(2023) for dataset in datasets]
+    space = SizingSpace(
+        modules=[
+            Modules(slope=Slope(value=90), azimuth=Azimuth.EAST(), kWP=0.5),
+            Modules(slope=Slope(value=90), azimuth=Azimuth.WEST(), kWP=0.5),
+        ],
+        module_counts=[[0, 2, 4], [0, 2, 4]],
+        maximum_power_kW=[None, 0.8],
+        storage_kWh=[0.0, 2.0, 5.0],
+    )
+
+    result = optimize_sizing(
+        space,
+        2000.0,
+        HEATPUMP_SYSTEM,
+        2023,
+        datasets=year_datasets,
+        load_profile=H0,
+    )
+    scenarios = [
+        Scenario(
+            pv_system=candidate.pv_system,
+            storage_kWh=candidate.storage_kWh,
+            regular_consumption_kWh=2000.0,
+            heatpump_system=HEATPUMP_SYSTEM,
+        )
+        for candidate in result.pareto_front
+    ]
+    swept = run_sweep(scenarios, 2023, datasets=year_datasets, load_profile=H0)
+
+    for candidate, expected in zip(result.pareto_front, swept):
+        assert np.isclose(candidate.gain_eur, expected.gain_eur)
+        assert np.isclose(candidate.autarky, expected.autarky)
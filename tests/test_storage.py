@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from home_energy_flow.consumption import consumption_profiles
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.main import main
+from home_energy_flow.production import compute_production
+from home_energy_flow.production.datamodels import Azimuth, Slope
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.pv_system import Modules, PVSystem
+from home_energy_flow.storage import compute_storage
+
+PV_SYSTEM = PVSystem(
+    modules=[Modules(slope=Slope(value=30), azimuth=Azimuth.SOUTH(), kWP=0.445, n=15)],
+    performance_ratio=0.8,
+)
+HEATPUMP_SYSTEM = HeatPumpSystem(
+    yearly_electricity_consumption_kWh=3500.0,
+    heating_turnoff_temp=13.0,
+    heating_times=[(0, 24)],
+)
+CAPACITIES_KWH = [0.0, 2.0, 20.0]
+
+
+def _reference_flows(
+    production: list[float],
+    consumption: list[float],
+    storage_kWh: float,
+    storage_efficiency: float = 0.9,
+) -> tuple[list[float], list[float], list[float]]:
+    """The loop of the list-based compute_production_consumption."""
+    energy_buy = []
+    energy_sell = []
+    self_usage = []
+    current_storage = 0.0
+    for prod, con in zip(production, consumption):
+        if prod >= con:
+            excess = prod - con
+            charge_possible = min(
+                excess * storage_efficiency, storage_kWh - current_storage
+            )
+            current_storage += charge_possible
+            energy_sell.append(excess - charge_possible / storage_efficiency)
+            energy_buy.append(0.0)
+            # Nothing is discharged in a step with surplus
+            discharge_energy = 0.0
+        else:
+            deficit = con - prod
+            discharge_possible = min(deficit / storage_efficiency, current_storage)
+            discharge_energy = discharge_possible * storage_efficiency
+            current_storage -= discharge_possible
+            energy_buy.append(max(deficit - discharge_energy, 0.0))
+            energy_sell.append(0.0)
+        self_usage.append(min(prod, con) + discharge_energy)
+    return energy_buy, energy_sell, self_usage
+
+
+def _household(datasets: list[MeteoDataset], year: int) -> tuple[np.ndarray, ...]:
+    year_datasets = [dataset.select_year(year) for dataset in datasets]
+    columns = year_datasets[0].columns
+    _, production = compute_production.compute_production_array(
+        PV_SYSTEM, year_datasets
+    )
+    consumption = consumption_profiles.typical_consumption_array(
+        columns.axis, 1500.0
+    ) + consumption_profiles.heatpump_consumption_array(
+        columns.axis, columns.T2m, HEATPUMP_SYSTEM
+    )
+    return production, consumption
+
+
+@pytest.mark.parametrize("year", [2020, 2023, 1999])
+def test_kernel_matches_the_loop(datasets: list[MeteoDataset], year: int) -> None:
+    # The data has no 1999, which gives series without time steps
+    production, consumption = _household(datasets, year)
+    # A batch of at least SEQUENTIAL_MIN_BATCH entries loops over the time
+    # steps instead of using the parallel scan
+    batch = np.repeat(CAPACITIES_KWH, compute_storage.SEQUENTIAL_MIN_BATCH)
+
+    scanned = compute_storage.simulate_storage(
+        production, consumption, storage_kWh=np.array(CAPACITIES_KWH)
+    )
+    sequential = compute_storage.simulate_storage(
+        production, consumption, storage_kWh=batch
+    )
+
+    for i, capacity in enumerate(CAPACITIES_KWH):
+        expected = _reference_flows(production.tolist(), consumption.tolist(), capacity)
+        for flows, row in [(scanned, i), (sequential, i * len(batch) // 3)]:
+            for name, values in zip(
+                ("energy_buy", "energy_sell", "self_usage"), expected
+            ):
+                np.testing.assert_allclose(
+                    getattr(flows, name)[row], values, rtol=1e-9, atol=1e-9
+                )
+
+
+def test_surplus_after_a_discharge_uses_only_the_consumption() -> None:
+    flows = compute_storage.compute_production_consumption(
+        [3.0, 0.0, 2.0], [1.0, 1.0, 1.0], storage_kWh=2.0
+    )
+
+    # The former loop added the discharge of the second step to the third
+    np.testing.assert_allclose(flows.self_usage, [1.0, 1.0, 1.0])
+    np.testing.assert_allclose(flows.energy_buy, [0.0, 0.0, 0.0])
+
+
+def test_main_numbers_of_the_example(in_repo: None) -> None:
+    result = main(
+        year=2023,
+        pv_system=PV_SYSTEM,
+        storage_kWh=20.0,
+        regular_consumption_kWh=1500.0,
+        heatpump_system=HEATPUMP_SYSTEM,
+        sinks=[],
+    )
+
+    # Pinned after fixing the self usage of surplus steps, before it was
+    # 1348.09 EUR
+    assert result.kpis.gain_eur == pytest.approx(1244.456, abs=1e-3)
+    assert result.kpis.self_usage_kWh == pytest.approx(2908.379, abs=1e-3)
@@ -0,0 +1,65 @@
+import numpy as np
+
+from home_energy_flow.consumption.consumption_profiles import HeatPumpSystem
+from home_energy_flow.multi_year import run_multi_year
+from home_energy_flow.production.datamodels import Azimuth, Slope
+from home_energy_flow.production.meteo_columns import MeteoDataset
+from home_energy_flow.production.pv_system import Modules, PVSystem
+from home_energy_flow.streaming import simulate_stream
+
+PV_SYSTEM = PVSystem(
+    modules=[
+        Modules(slope=Slope(value=90), azimuth=Azimuth.EAST(), kWP=0.5, n=4),
+        Modules(slope=Slope(value=90), azimuth=Azimuth.WEST(), kWP=0.5, n=4),
+    ],
+    maximum_power_kW=0.8,
+)
+HEATPUMP_SYSTEM = HeatPumpSystem(yearly_electricity_consumption_kWh=3500.0)
+
+
+def _truncated(
+    datasets: list[MeteoDataset], start: str, end: str
+) -> list[MeteoDataset]:
+    time = datasets[0].columns.time
+    index = slice(
+        int(np.searchsorted(time, np.datetime64(start))),
+        int(np.searchsorted(time, np.datetime64(end))),
+    )
+    return [
+        MeteoDataset(inputs=dataset.inputs, columns=dataset.columns.slice(index))
+        for dataset in datasets
+    ]
+
+
+def test_stream_of_a_truncated_dataset_equals_the_array_simulation(
+    datasets: list[MeteoDataset],
+) -> None:
+    # The data covers only the end of 2022 and the start of 2023
+    truncated = _truncated(datasets, "2022-10-01", "2023-04-01")
+
+    chunks = list(
+        simulate_stream(PV_SYSTEM, truncated, 1000.0, HEATPUMP_SYSTEM, storage_kWh=2.0)
+    )
+    multi_year = run_multi_year(
+        PV_SYSTEM,
+        1000.0,
+        HEATPUMP_SYSTEM,
+        2.0,
+        datasets=truncated,
+        carry_over_storage=True,
+    )
+
+    flows = multi_year.energy_flow_data
+    for name, expected in [
+        ("production", flows.production),
+        ("regular_consumption", multi_year.regular_consumption),
+        ("heatpump_consumption", multi_year.heatpump_consumption),
+        ("energy_buy", flows.energy_buy),
+        ("energy_sell", flows.energy_sell),
+        ("self_usage", flows.self_usage),
+    ]:
+        streamed = np.concatenate([getattr(chunk, name) for chunk in chunks])
+        np.testing.assert_allclose(streamed, expected, rtol=1e-9, atol=1e-12)
+    # Each year consumes the whole yearly consumption, also if partly covered
+    for year in (2022, 2023):
+        assert np.isclose(multi_year.kpis[year].consumption_kWh, 4500.0)
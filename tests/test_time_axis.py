@@ -0,0 +1,13 @@
+import numpy as np
+
+from home_energy_flow.production.time_axis import TimeAxis
+
+
+def test_slices_keep_the_step_hours() -> None:
+    time = np.datetime64("2023-01-01T00:00") + np.arange(100) * np.timedelta64(15, "m")
+    axis = TimeAxis(time)
+
+    assert axis.step_hours == 0.25
+    assert axis[5:6].step_hours == 0.25
+    assert axis[0:0].step_hours == 0.25
+    np.testing.assert_array_equal(axis[5:6].hour, axis.hour[5:6])